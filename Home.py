@@ -1,21 +1,27 @@
+from dashboard import timing
+from dashboard.data import load_overall_counts
+from dashboard.regions import get_region, region_selector
+from dashboard.warmup import start_warm_up
 from kailo_beewell_dashboard.images import get_image_path
 from kailo_beewell_dashboard.page_setup import blank_lines, page_footer, page_setup
-import pickle
 import streamlit as st
 
+timing.start_run("Home")
 page_setup("public")
+start_warm_up()
+region_selector()
+region = get_region()
 
 # Import data
-with open("data/survey_data/nd_overall_counts.pkl", "rb") as f:
-    school_counts = pickle.load(f)
+school_counts = load_overall_counts()
 
 # Title and sub-title
 st.title("The #BeeWell Survey")
 st.markdown(
-    """
+    f"""
 <p style='text-align: center; font-weight: bold'>
 This dashboard shares results from the #BeeWell survey<br>delivered by Kailo
-in Northern Devon.</p>
+in {region.name}.</p>
 """,
     unsafe_allow_html=True,
 )
@@ -25,8 +31,8 @@ st.image(get_image_path("home_image_3_transparent.png"), use_column_width=True)
 
 # Introduction
 st.markdown(f"""In the academic year 2023-24, {school_counts['total_pupils']}
-pupils from {school_counts['total_schools']} schools across North Devon and
-Torridge took part in the #BeeWell survey delivered by Kailo. There were
+pupils from {school_counts['total_schools']} schools across {region.places}
+took part in the #BeeWell survey delivered by Kailo. There were
 two versions of the survey:
 * Standard #BeeWell survey - completed by {school_counts['standard_pupils']}
 pupils in Years 8 and 10 at {school_counts['standard_schools']} mainstream
@@ -60,4 +66,5 @@ what pupils could expect from taking part in the survey. For more information,
 see the 'About' page of the dashboard.""")
 st.video("https://youtu.be/jmYH7F2Bd4Q")
 
-page_footer("schools in Northern Devon")
+page_footer(region.footer)
+timing.end_run()
@@ -0,0 +1,107 @@
+'''
+Benchmark aggregation of scores for every site and group, comparing the loop
+over sites and groups in results_by_site_and_group() (from
+kailo_beewell_dashboard) with the vectorised
+aggregate_scores_by_site_and_group().
+
+Larger datasets are made by resampling pupils from the synthetic standard
+survey data and assigning them to a random site. Times are for aggregating
+by the standard groups (year group, gender, FSM and SEN), then hiding
+results when n<10.
+
+Run from the root of the repository:
+    python -m benchmarks.aggregate_scores
+'''
+import time
+
+from kailo_beewell_dashboard.synthesise_aggregate import (
+    aggregate_scores, results_by_site_and_group)
+import numpy as np
+import pandas as pd
+
+from create_and_process_data.aggregate import (
+    aggregate_scores_by_site_and_group)
+from dashboard.data import survey_path
+
+# Number of pupils and sites to benchmark
+SIZES = [(800, 30), (10_000, 100), (100_000, 300)]
+
+
+def synthetic_pupils(data, n_pupils, n_sites, seed=42):
+    '''
+    Create larger dataset by resampling pupils and assigning random sites.
+
+    Parameters
+    ----------
+    data : dataframe
+        Pupil-level survey responses to sample from
+    n_pupils : integer
+        Number of pupils
+    n_sites : integer
+        Number of sites
+    seed : integer
+        Random seed
+
+    Returns
+    -------
+    dataframe
+        Pupil-level survey responses with 'site' column
+    '''
+    rng = np.random.default_rng(seed)
+    pupils = data.iloc[rng.integers(len(data), size=n_pupils)]
+    sites = np.array([f'Site {i:04d}' for i in range(n_sites)])
+    return pupils.assign(site=sites[rng.integers(n_sites, size=n_pupils)])
+
+
+def aggregate_loop(data):
+    '''
+    Aggregate with results_by_site_and_group(), as in the notebooks.
+
+    Parameters
+    ----------
+    data : dataframe
+        Pupil-level survey responses with 'site' column
+
+    Returns
+    -------
+    dataframe
+        Aggregated scores
+    '''
+    no_pupils = aggregate_scores(data)
+    no_pupils['mean'] = np.nan
+    no_pupils['count'] = 0
+    agg = results_by_site_and_group(
+        data=data, agg_func=aggregate_scores, no_pupils=no_pupils,
+        group_type='standard', site_col='site')
+    agg.loc[agg['count'] < 10, ['mean', 'count']] = np.nan
+    return agg
+
+
+def main():
+    standard = pd.read_csv(survey_path('standard_synthetic_data_raw.csv'))
+
+    print(f'{"pupils":>8}{"sites":>7}{"loop s":>10}{"vectorised s":>14}'
+          f'{"speed-up":>10}')
+    for n_pupils, n_sites in SIZES:
+        data = synthetic_pupils(standard, n_pupils, n_sites)
+
+        start = time.perf_counter()
+        loop = aggregate_loop(data)
+        loop_seconds = time.perf_counter() - start
+
+        start = time.perf_counter()
+        vectorised = aggregate_scores_by_site_and_group(
+            data, group_type='standard', site_col='site')
+        vectorised_seconds = time.perf_counter() - start
+
+        # Check both give the same result
+        pd.testing.assert_frame_equal(loop.reset_index(drop=True), vectorised,
+                                      check_dtype=False)
+
+        print(f'{n_pupils:>8}{n_sites:>7}{loop_seconds:>10.2f}'
+              f'{vectorised_seconds:>14.3f}'
+              f'{loop_seconds / vectorised_seconds:>9.0f}x')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,101 @@
+'''
+Benchmark finding the MSOA containing a point (dashboard/lookup.py),
+comparing the spatial index with testing the boundary of every MSOA in turn.
+
+Points are chosen at random within (and just outside) the area covered by
+the MSOAs. Times are the mean per lookup, and both are checked to find the
+same MSOA for every point. The time to build the index (done once when the
+boundaries are loaded) is also shown.
+
+Run from the root of the repository:
+    python -m benchmarks.area_lookup
+'''
+import json
+import time
+
+import numpy as np
+
+from benchmarks.rag_ratings import mean_time
+from dashboard.data import area_path, paths
+from dashboard.lookup import contains_point, create_area_index, find_msoa
+
+POINTS = 10_000
+
+
+def find_msoa_scan(index, lon, lat):
+    '''
+    Find the MSOA containing a point by testing every MSOA in turn.
+
+    Parameters
+    ----------
+    index : AreaIndex
+        Spatial index (only the boundaries are used)
+    lon : float
+        Longitude of the point
+    lat : float
+        Latitude of the point
+
+    Returns
+    -------
+    string
+        Name of the MSOA, or None if the point is not in any of the MSOAs
+    '''
+    for area, msoa in enumerate(index.msoas):
+        edges = index.edges[
+            index.edge_offsets[area]:index.edge_offsets[area + 1]]
+        if contains_point(edges, lon, lat):
+            return str(msoa)
+    return None
+
+
+def lookup_time(func, index, points):
+    '''
+    Find mean time taken to look up each point.
+
+    Parameters
+    ----------
+    func : function
+        Lookup function, taking the index, longitude and latitude
+    index : AreaIndex
+        Spatial index
+    points : array
+        Longitude and latitude of each point
+
+    Returns
+    -------
+    float
+        Mean time per point in seconds
+    '''
+    start = time.perf_counter()
+    for lon, lat in points:
+        func(index, lon, lat)
+    return (time.perf_counter() - start) / len(points)
+
+
+def main():
+    with open(area_path(paths.geojson)) as f:
+        geojson = json.load(f)
+    index = create_area_index(geojson)
+
+    # Random points, including a margin outside the MSOAs
+    rng = np.random.default_rng(42)
+    corner = index.origin + index.cell_size * index.cells
+    margin = (corner - index.origin) * 0.05
+    points = rng.uniform(index.origin - margin, corner + margin,
+                         size=(POINTS, 2))
+
+    # Check both find the same MSOA
+    for lon, lat in points:
+        assert find_msoa(index, lon, lat) == find_msoa_scan(index, lon, lat)
+
+    build = mean_time(lambda: create_area_index(geojson))
+    scan = lookup_time(find_msoa_scan, index, points)
+    indexed = lookup_time(find_msoa, index, points)
+    print(f'{"MSOAs":>7}{"edges":>8}{"build ms":>10}{"scan us":>10}'
+          f'{"index us":>10}{"speed-up":>10}')
+    print(f'{len(index.msoas):>7}{len(index.edges):>8}{build*1e3:>10.2f}'
+          f'{scan*1e6:>10.1f}{indexed*1e6:>10.1f}{scan / indexed:>9.1f}x')
+
+
+if __name__ == '__main__':
+    main()
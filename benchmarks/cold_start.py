@@ -0,0 +1,91 @@
+'''
+Benchmark time to first render of each page on a newly started server,
+without and with the warm-up of the shared caches (dashboard/warmup.py).
+
+* 'no warm-up' - the page is the first to be opened, with start_warm_up()
+replaced by a function that does nothing (as before the warm-up was added)
+* 'after warm-up' - the home page is opened first (starting the warm-up) and
+the warm-up finishes before the page is opened
+
+Each measurement is made in a new process, so nothing is already imported or
+cached. Pages are run with Streamlit's AppTest, and times are for the first
+run of the page (including importing the modules it uses).
+
+Run from the root of the repository:
+    python -m benchmarks.cold_start
+'''
+from concurrent.futures import ProcessPoolExecutor
+import multiprocessing
+import os
+import time
+from unittest import mock
+
+from streamlit.testing.v1 import AppTest
+
+PAGES = ['Home.py', 'pages/1_Standard survey.py', 'pages/2_Symbol survey.py',
+         'pages/3_Who took part.py', 'pages/4_Download PDF reports.py']
+TIMEOUT = 120
+
+
+def first_render(page, warm):
+    '''
+    Find time taken for the first run of a page. This is run in a new
+    process.
+
+    Parameters
+    ----------
+    page : string
+        Path to page, from the root of the repository
+    warm : boolean
+        Whether to open the home page and wait for the warm-up to finish
+        before opening the page
+
+    Returns
+    -------
+    seconds : float
+        Time taken for the first run of the page
+    warm_up : float
+        Time from opening the home page until the warm-up finished (or NaN)
+    '''
+    from dashboard import warmup
+
+    warm_up = float('nan')
+    if warm:
+        start = time.perf_counter()
+        AppTest.from_file(os.path.abspath('Home.py'),
+                          default_timeout=TIMEOUT).run()
+        warmup.start_warm_up().join()
+        warm_up = time.perf_counter() - start
+        patch = mock.patch.object(warmup, 'start_warm_up',
+                                  warmup.start_warm_up)
+    else:
+        patch = mock.patch.object(warmup, 'start_warm_up', lambda: None)
+
+    with patch:
+        app = AppTest.from_file(os.path.abspath(page), default_timeout=TIMEOUT)
+        start = time.perf_counter()
+        app.run()
+        seconds = time.perf_counter() - start
+    if app.exception:
+        raise RuntimeError(f'{page}: {app.exception[0].message}')
+    return seconds, warm_up
+
+
+def main():
+    print(f'{"page":<34}{"no warm-up s":>14}{"after warm-up s":>17}'
+          f'{"warm-up s":>11}')
+    for page in PAGES:
+        times = []
+        for warm in [False, True]:
+            with ProcessPoolExecutor(
+                    max_workers=1,
+                    mp_context=multiprocessing.get_context('spawn')
+                    ) as executor:
+                times.append(executor.submit(first_render, page, warm)
+                             .result())
+        (cold, _), (warm, warm_up) = times
+        print(f'{page:<34}{cold:>14.2f}{warm:>17.2f}{warm_up:>11.2f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,468 @@
+'''
+Load test of the dashboard, finding how many users at the same time one
+instance of the dashboard can serve.
+
+Sessions are simulated with Streamlit's AppTest (so no server or network is
+needed), each following a scripted flow through the pages: opening the home
+page, then (chosen at random for each session) some of:
+
+* 'areas' - the standard survey area map for several topics, the summary for
+several MSOAs, and the heatmap of all topics and areas sorted by a topic
+* 'characteristics' - the standard survey results by pupil characteristics
+for several topics and groups, then the symbol survey results by group
+* 'who took part' - the standard and symbol survey samples
+* 'reports' - the download page, requesting the PDF reports if they have not
+been rendered
+
+Many sessions are run at the same time in threads of one process, sharing the
+cached data as the sessions of one dashboard instance do. AppTest replaces
+global Streamlit state (the runtime) for each run of a page, so runs from
+different sessions cannot overlap, and each waits for any other run to finish.
+As the pages spend most of their time running Python code, which holds the
+GIL, this is close to how the sessions of one instance share its CPU. The time
+for each run of a page is recorded (including interactions, which rerun the
+page, and the time waiting for other sessions), and the results are:
+
+* throughput - page runs per second
+* latency - median (p50), 95th (p95) and 99th (p99) percentile of the time for
+each run, overall and for each step of the flows
+* peak RSS - the most memory used by the process (and any report rendering
+processes it started) while the sessions were running
+
+Each number of concurrent sessions is tested in a new process, after the
+caches have been warmed up (see dashboard/warmup.py), so the results are for
+an instance that has already served its first user. Results are saved as JSON
+(by default to .cache/load_test/<commit>.json), and can be compared with
+results saved for an earlier commit using --compare.
+
+Run from the root of the repository:
+    python -m benchmarks.load_test
+    python -m benchmarks.load_test --sessions 50 --concurrency 1 10 25
+    python -m benchmarks.load_test --compare .cache/load_test/<commit>.json
+'''
+import argparse
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+import datetime
+import json
+import multiprocessing
+import os
+import platform
+import random
+import subprocess
+import threading
+import time
+
+import numpy as np
+import psutil
+from streamlit.testing.v1 import AppTest
+
+PAGES = {
+    'home': 'Home.py',
+    'standard': 'pages/1_Standard survey.py',
+    'symbol': 'pages/2_Symbol survey.py',
+    'who_took_part': 'pages/3_Who took part.py',
+    'download': 'pages/4_Download PDF reports.py'}
+FLOWS = ['areas', 'characteristics', 'who took part', 'reports']
+TIMEOUT = 300
+
+# Percentiles of latency reported
+PERCENTILES = [50, 95, 99]
+
+# Seconds between measurements of memory use
+RSS_INTERVAL = 0.05
+
+OUTPUT_DIR = '.cache/load_test'
+
+# Held during each run of a page (see above)
+_run_lock = threading.Lock()
+
+
+class Session:
+    '''
+    Simulated user, recording the time taken by each run of a page.
+    '''
+    def __init__(self):
+        self.timings = []
+        self.errors = []
+
+    def run(self, step, action):
+        '''
+        Run a page (or an interaction with it, which reruns the page), and
+        record the time taken.
+
+        Parameters
+        ----------
+        step : string
+            Name of the step of the flow (e.g. 'standard: area map')
+        action : function
+            Function with no arguments returning the AppTest after running
+
+        Returns
+        -------
+        AppTest
+            Page after running
+        '''
+        start = time.perf_counter()
+        with _run_lock:
+            at = action()
+        self.timings.append((step, time.perf_counter() - start))
+        if at.exception:
+            self.errors.append((step, at.exception[0].message))
+        return at
+
+    def open(self, page, step):
+        '''
+        Open a page.
+
+        Parameters
+        ----------
+        page : string
+            Name of page in PAGES
+        step : string
+            Name of the step of the flow
+
+        Returns
+        -------
+        AppTest
+            Page after running
+        '''
+        at = AppTest.from_file(os.path.abspath(PAGES[page]),
+                               default_timeout=TIMEOUT)
+        return self.run(step, at.run)
+
+
+def areas_flow(session, rng):
+    '''
+    View the standard survey area map for several topics, the summary for
+    several MSOAs, and the heatmap of all topics and areas.
+
+    Parameters
+    ----------
+    session : Session
+        Simulated user
+    rng : random.Random
+        Random number generator, for choosing topics and MSOAs
+    '''
+    at = session.open('standard', 'standard: open')
+    for topic in rng.sample(at.selectbox(key='topic_map').options, 3):
+        at = session.run('standard: area map', at.selectbox(
+            key='topic_map').select(topic).run)
+
+    at = session.run('standard: switch tab',
+                     at.button(key='btn_msoa').click().run)
+    for msoa in rng.sample(at.selectbox[0].options, 3):
+        at = session.run('standard: MSOA summary',
+                         at.selectbox[0].select(msoa).run)
+
+    at = session.run('standard: switch tab',
+                     at.button(key='btn_matrix').click().run)
+    topic = rng.choice(at.selectbox(key='matrix_sort').options[1:])
+    session.run('standard: heatmap',
+                at.selectbox(key='matrix_sort').select(topic).run)
+
+
+def characteristics_flow(session, rng):
+    '''
+    View the standard survey results by pupil characteristics for several
+    topics and groups, then the symbol survey results by group.
+
+    Parameters
+    ----------
+    session : Session
+        Simulated user
+    rng : random.Random
+        Random number generator, for choosing topics and groups
+    '''
+    at = session.open('standard', 'standard: open')
+    at = session.run('standard: switch tab',
+                     at.button(key='btn_char').click().run)
+    for topic in rng.sample(at.selectbox(key='topic_bar').options, 2):
+        at = session.run('standard: bar charts', at.selectbox(
+            key='topic_bar').select(topic).run)
+        group = rng.choice(at.selectbox[1].options[1:])
+        at = session.run('standard: bar charts',
+                         at.selectbox[1].select(group).run)
+
+    at = session.open('symbol', 'symbol: open')
+    session.run('symbol: bar charts', at.selectbox[0].select(
+        rng.choice(at.selectbox[0].options[1:])).run)
+
+
+def who_took_part_flow(session, rng):
+    '''
+    View the standard and symbol survey samples.
+
+    Parameters
+    ----------
+    session : Session
+        Simulated user
+    rng : random.Random
+        Random number generator (not used, as the flow is always the same)
+    '''
+    at = session.open('who_took_part', 'who took part: open')
+    session.run('who took part: switch survey',
+                at.button(key='btn_sym').click().run)
+
+
+def reports_flow(session, rng):
+    '''
+    Open the download page, requesting the PDF reports if they have not been
+    rendered (which adds them to the queue shared by every session).
+
+    Parameters
+    ----------
+    session : Session
+        Simulated user
+    rng : random.Random
+        Random number generator (not used, as the flow is always the same)
+    '''
+    at = session.open('download', 'download: open')
+    for report_type in ['standard', 'symbol']:
+        key = f'generate_{report_type}'
+        if any(button.key == key for button in at.button):
+            at = session.run('download: request report',
+                             at.button(key=key).click().run)
+
+
+FLOW_FUNCTIONS = {
+    'areas': areas_flow,
+    'characteristics': characteristics_flow,
+    'who took part': who_took_part_flow,
+    'reports': reports_flow}
+
+
+def simulate_session(seed):
+    '''
+    Simulate one user, who opens the home page then follows one or two
+    flows chosen at random.
+
+    Parameters
+    ----------
+    seed : integer
+        Random seed for this session
+
+    Returns
+    -------
+    Session
+        Time taken by each run of a page, and any errors
+    '''
+    rng = random.Random(seed)
+    session = Session()
+    session.open('home', 'home: open')
+    for flow in rng.sample(FLOWS, rng.randint(1, 2)):
+        FLOW_FUNCTIONS[flow](session, rng)
+    return session
+
+
+def peak_rss(stop, result):
+    '''
+    Measure the memory used by this process and its child processes until
+    told to stop. This is run in a thread.
+
+    Parameters
+    ----------
+    stop : threading.Event
+        Set when the measurement should stop
+    result : list
+        Peak resident memory in bytes is appended to this
+    '''
+    process = psutil.Process()
+    peak = 0
+    while not stop.wait(RSS_INTERVAL):
+        rss = process.memory_info().rss
+        for child in process.children(recursive=True):
+            try:
+                rss += child.memory_info().rss
+            except psutil.NoSuchProcess:
+                pass
+        peak = max(peak, rss)
+    result.append(peak)
+
+
+def latency(seconds):
+    '''
+    Summarise latency of page runs.
+
+    Parameters
+    ----------
+    seconds : list
+        Time taken by each run
+
+    Returns
+    -------
+    dictionary
+        Number of runs, and each percentile in PERCENTILES in milliseconds
+    '''
+    summary = {'runs': len(seconds)}
+    for percentile in PERCENTILES:
+        summary[f'p{percentile}_ms'] = round(
+            float(np.percentile(seconds, percentile)) * 1e3, 2)
+    return summary
+
+
+def load_test(concurrency, sessions, seed):
+    '''
+    Run sessions with the given number at the same time. This is run in a
+    new process for each level of concurrency.
+
+    Parameters
+    ----------
+    concurrency : integer
+        Number of sessions running at the same time
+    sessions : integer
+        Total number of sessions
+    seed : integer
+        Random seed (each session has its own seed, so the same sessions
+        are run at each level of concurrency)
+
+    Returns
+    -------
+    dictionary
+        Results for this level of concurrency
+    '''
+    from dashboard import warmup
+    from dashboard.reports import get_report_queue
+
+    # Warm up the caches (as for an instance that has served its first user)
+    AppTest.from_file(os.path.abspath(PAGES['home']),
+                      default_timeout=TIMEOUT).run()
+    warmup.start_warm_up().join()
+
+    stop = threading.Event()
+    rss = []
+    sampler = threading.Thread(target=peak_rss, args=(stop, rss))
+    sampler.start()
+    start = time.perf_counter()
+    try:
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            results = list(executor.map(
+                simulate_session, [seed + i for i in range(sessions)]))
+        seconds = time.perf_counter() - start
+    finally:
+        stop.set()
+        sampler.join()
+        # Stop the report rendering processes, so this process can exit
+        get_report_queue().shutdown()
+
+    timings = [timing for session in results for timing in session.timings]
+    errors = [error for session in results for error in session.errors]
+    steps = sorted({step for step, _ in timings})
+    return {
+        'concurrency': concurrency,
+        'sessions': sessions,
+        'seconds': round(seconds, 3),
+        'throughput_runs_per_s': round(len(timings) / seconds, 3),
+        'latency': latency([elapsed for _, elapsed in timings]),
+        'steps': {step: latency([elapsed for name, elapsed in timings
+                                 if name == step])
+                  for step in steps},
+        'peak_rss_mb': round(rss[0] / 1e6, 1),
+        'errors': len(errors),
+        'first_errors': [f'{step}: {message}'
+                         for step, message in errors[:5]]}
+
+
+def git_commit():
+    '''
+    Get the current commit of the repository.
+
+    Returns
+    -------
+    string
+        Short commit hash (with '-dirty' if there are uncommitted changes),
+        or 'unknown' if not in a git repository
+    '''
+    try:
+        commit = subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], capture_output=True,
+            text=True, check=True).stdout.strip()
+        dirty = subprocess.run(
+            ['git', 'status', '--porcelain', '--untracked-files=no'],
+            capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return 'unknown'
+    return f'{commit}-dirty' if dirty else commit
+
+
+def print_results(results, previous=None):
+    '''
+    Print table of results, with the change from previous results (if
+    given) for the same level of concurrency.
+
+    Parameters
+    ----------
+    results : dictionary
+        Results from main()
+    previous : dictionary
+        Results saved for an earlier commit, to compare with
+    '''
+    before = {level['concurrency']: level
+              for level in (previous or {}).get('levels', [])}
+    print(f'{"sessions at once":>16}{"runs/s":>9}{"p50 ms":>9}{"p95 ms":>9}'
+          f'{"p99 ms":>9}{"peak MB":>9}{"errors":>8}')
+    for level in results['levels']:
+        values = [level['throughput_runs_per_s'],
+                  level['latency']['p50_ms'], level['latency']['p95_ms'],
+                  level['latency']['p99_ms'], level['peak_rss_mb']]
+        print(f'{level["concurrency"]:>16}{values[0]:>9.2f}{values[1]:>9.0f}'
+              f'{values[2]:>9.0f}{values[3]:>9.0f}{values[4]:>9.0f}'
+              f'{level["errors"]:>8}')
+        old = before.get(level['concurrency'])
+        if old is not None:
+            old_values = [old['throughput_runs_per_s'],
+                          old['latency']['p50_ms'], old['latency']['p95_ms'],
+                          old['latency']['p99_ms'], old['peak_rss_mb']]
+            change = ''.join(
+                f'{(new / prev - 1) * 100 if prev else 0:>+8.0f}%'
+                for new, prev in zip(values, old_values))
+            print(f'{"vs " + previous["commit"]:>16}{change}')
+        for message in level['first_errors']:
+            print(f'{"":>16}{message}')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--sessions', type=int, default=20,
+                        help='Number of sessions at each level of concurrency')
+    parser.add_argument('--concurrency', type=int, nargs='+',
+                        default=[1, 5, 10],
+                        help='Numbers of sessions to run at the same time')
+    parser.add_argument('--seed', type=int, default=42, help='Random seed')
+    parser.add_argument('--output', default=None,
+                        help='Path to save results (default: '
+                        f'{OUTPUT_DIR}/<commit>.json)')
+    parser.add_argument('--compare', default=None,
+                        help='Results saved for an earlier commit')
+    args = parser.parse_args()
+
+    commit = git_commit()
+    results = {
+        'commit': commit,
+        'time': datetime.datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'cpus': os.cpu_count(),
+        'sessions': args.sessions,
+        'seed': args.seed,
+        'levels': []}
+    for concurrency in args.concurrency:
+        with ProcessPoolExecutor(
+                max_workers=1,
+                mp_context=multiprocessing.get_context('spawn')) as executor:
+            results['levels'].append(executor.submit(
+                load_test, concurrency, args.sessions, args.seed).result())
+
+    output = args.output or os.path.join(OUTPUT_DIR, f'{commit}.json')
+    os.makedirs(os.path.dirname(output) or '.', exist_ok=True)
+    with open(output, 'w') as f:
+        json.dump(results, f, indent=2)
+
+    previous = None
+    if args.compare is not None:
+        with open(args.compare) as f:
+            previous = json.load(f)
+    print_results(results, previous)
+    print(f'\nSaved to {output}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,93 @@
+'''
+Benchmark the heatmap of RAG ratings for every MSOA and topic on the
+standard survey page, comparing sorting and filtering the scores table with
+pandas each time the page runs, with using the RAG matrix created once when
+the scores are loaded (dashboard/rag.py and dashboard/heatmap.py).
+
+Larger datasets are made by resampling pupils from the synthetic standard
+survey data and assigning them to a random area (as in rag_ratings.py). Times
+are the mean over repeated runs, for sorting by one topic and showing only
+areas rated below or above average for it. 'figure' is the time to create the
+heatmap from the sorted matrix, which is the same for both. The areas chosen
+by both are checked to be identical.
+
+Run from the root of the repository:
+    python -m benchmarks.rag_matrix
+'''
+from kailo_beewell_dashboard.topic_labels import topic_name_dict
+import numpy as np
+import pandas as pd
+
+from benchmarks.aggregate_scores import synthetic_pupils
+from benchmarks.rag_ratings import mean_time
+from create_and_process_data.aggregate import (
+    aggregate_scores_by_site_and_group, create_rag_ratings)
+from dashboard.data import survey_path
+from dashboard.heatmap import create_rag_heatmap, sort_areas
+from dashboard.rag import RAG_CODES, create_rag_matrix
+
+# Number of pupils and areas to benchmark
+SIZES = [(800, 23), (10_000, 300), (100_000, 3_000)]
+TOPIC = 'sleep_score'
+RATINGS = ['below', 'above']
+
+
+def sort_table(scores, topic, ratings):
+    '''
+    Sort and filter the scores table with pandas, then reshape it into a
+    table with a row for each MSOA and a column for each topic.
+
+    Parameters
+    ----------
+    scores : dataframe
+        Scores with RAG ratings
+    topic : string
+        Topic to sort and filter by
+    ratings : list
+        RAG ratings to show
+
+    Returns
+    -------
+    dataframe
+        RAG rating for each topic in the chosen MSOAs, in order
+    '''
+    chosen = scores[(scores['variable'] == topic) &
+                    (scores['rag'].isin(ratings))]
+    msoas = chosen.sort_values('mean', ascending=False, kind='stable')['msoa']
+    return (scores[scores['msoa'].isin(msoas)]
+            .pivot(index='msoa', columns='variable', values='rag')
+            .reindex(msoas))
+
+
+def main():
+    standard = pd.read_csv(survey_path('standard_synthetic_data_raw.csv'))
+    standard = standard.filter(regex='_score$')
+
+    print(f'{"areas":>7}{"rows":>9}{"create ms":>11}{"pandas ms":>11}'
+          f'{"matrix ms":>11}{"figure ms":>11}')
+    for n_pupils, n_areas in SIZES:
+        pupils = synthetic_pupils(standard, n_pupils, n_areas)
+        scores = create_rag_ratings(aggregate_scores_by_site_and_group(
+            pupils.rename(columns={'site': 'msoa'}), group_type='none',
+            site_col='msoa'))
+        scores['variable_lab'] = scores['variable'].map(topic_name_dict)
+
+        matrix = create_rag_matrix(scores)
+        topic = list(matrix.topics).index(TOPIC)
+        codes = [RAG_CODES[rag] for rag in RATINGS]
+
+        # Check both choose the same areas in the same order
+        rows = sort_areas(matrix, topic, ratings=codes)
+        assert np.array_equal(matrix.msoas[rows],
+                              sort_table(scores, TOPIC, RATINGS).index)
+
+        create = mean_time(lambda: create_rag_matrix(scores))
+        table = mean_time(lambda: sort_table(scores, TOPIC, RATINGS))
+        arrays = mean_time(lambda: sort_areas(matrix, topic, ratings=codes))
+        figure = mean_time(lambda: create_rag_heatmap(matrix, rows))
+        print(f'{n_areas:>7}{len(scores):>9}{create*1e3:>11.1f}'
+              f'{table*1e3:>11.2f}{arrays*1e3:>11.3f}{figure*1e3:>11.1f}')
+
+
+if __name__ == '__main__':
+    main()
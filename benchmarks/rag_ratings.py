@@ -0,0 +1,79 @@
+'''
+Benchmark RAG ratings, comparing create_rag_ratings() from
+kailo_beewell_dashboard with the array-based version in
+create_and_process_data/aggregate.py.
+
+Larger datasets are made by resampling pupils from the synthetic standard
+survey data and assigning them to a random area, then finding the mean score
+for each area and topic (as for the area map). Times are for creating the RAG
+ratings from these scores, and are the mean over repeated runs. The results
+from both are checked to be identical.
+
+Run from the root of the repository:
+    python -m benchmarks.rag_ratings
+'''
+import time
+
+from kailo_beewell_dashboard.synthesise_scores import (
+    create_rag_ratings as create_rag_ratings_package)
+import pandas as pd
+
+from benchmarks.aggregate_scores import synthetic_pupils
+from create_and_process_data.aggregate import (
+    aggregate_scores_by_site_and_group, create_rag_ratings)
+from dashboard.data import survey_path
+
+# Number of pupils and areas to benchmark
+SIZES = [(800, 30), (10_000, 300), (100_000, 1_000), (1_000_000, 3_000)]
+REPEATS = 5
+
+
+def mean_time(func, repeats=REPEATS):
+    '''
+    Find mean time taken to run function.
+
+    Parameters
+    ----------
+    func : function
+        Function with no arguments
+    repeats : integer
+        Number of times to run the function
+
+    Returns
+    -------
+    float
+        Mean time in seconds
+    '''
+    start = time.perf_counter()
+    for _ in range(repeats):
+        func()
+    return (time.perf_counter() - start) / repeats
+
+
+def main():
+    # Only the score columns are needed (keeps the larger datasets small)
+    standard = pd.read_csv(survey_path('standard_synthetic_data_raw.csv'))
+    standard = standard.filter(regex='_score$')
+
+    print(f'{"pupils":>9}{"areas":>7}{"rows":>9}{"package ms":>12}'
+          f'{"arrays ms":>11}{"speed-up":>10}')
+    for n_pupils, n_areas in SIZES:
+        pupils = synthetic_pupils(standard, n_pupils, n_areas)
+        scores = aggregate_scores_by_site_and_group(
+            pupils.rename(columns={'site': 'msoa'}), group_type='none',
+            site_col='msoa')
+
+        # Check both give the same result
+        pd.testing.assert_frame_equal(create_rag_ratings_package(scores),
+                                      create_rag_ratings(scores),
+                                      check_exact=True)
+
+        package = mean_time(lambda: create_rag_ratings_package(scores))
+        arrays = mean_time(lambda: create_rag_ratings(scores))
+        print(f'{n_pupils:>9}{n_areas:>7}{len(scores):>9}'
+              f'{package*1e3:>12.1f}{arrays*1e3:>11.1f}'
+              f'{package / arrays:>9.1f}x')
+
+
+if __name__ == '__main__':
+    main()
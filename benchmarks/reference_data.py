@@ -0,0 +1,44 @@
+'''
+Benchmark loading the area reference spreadsheets
+(create_and_process_data/reference.py), comparing reading each sheet from
+the spreadsheet with loading it from the cache.
+
+Reading from the spreadsheet is run once (it is only done when the
+spreadsheet changes). Loading from the cache, including checking the hashes
+of the spreadsheet, and creating the LSOA and MSOA lookups from the cached
+sheets, are the mean over repeated runs. The cached sheets are checked to be
+the same as those read from the spreadsheets.
+
+Run from the root of the repository:
+    python -m benchmarks.reference_data
+'''
+import time
+
+import pandas as pd
+
+from benchmarks.rag_ratings import mean_time
+from create_and_process_data.reference import (
+    LOOKUPS, SHEETS, load_reference, load_sheet, read_sheet)
+
+
+def main():
+    print(f'{"table":<14}{"rows":>8}{"read s":>9}{"cached ms":>11}')
+    for name, spec in SHEETS.items():
+        start = time.perf_counter()
+        data = read_sheet(spec)
+        read = time.perf_counter() - start
+
+        # Check the cache has the same table
+        pd.testing.assert_frame_equal(load_sheet(name), data)
+
+        cached = mean_time(lambda: load_sheet(name))
+        print(f'{name:<14}{len(data):>8}{read:>9.2f}{cached*1e3:>11.2f}')
+
+    for name in LOOKUPS:
+        lookup = load_reference(name)
+        cached = mean_time(lambda: load_reference(name))
+        print(f'{name:<14}{len(lookup):>8}{"":>9}{cached*1e3:>11.2f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,69 @@
+'''
+Benchmark creating the HTML for the standard survey PDF report, comparing
+exporting each figure as it is drawn (as in kailo_beewell_dashboard) with
+collecting the figures and exporting them in parallel (dashboard/figures.py),
+with an empty (cold) and full (warm) cache of exported images.
+
+Times are for creating the HTML with every figure embedded - rendering the
+HTML to PDF with weasyprint takes the same time whichever way the figures
+were exported. The cache is a temporary folder, so the cache used by the
+dashboard is not changed.
+
+Run from the root of the repository:
+    python -m benchmarks.report_figures
+'''
+import os
+import tempfile
+import time
+
+from dashboard import figures
+from dashboard.reports import (
+    create_report_html, create_static_report, load_report_data)
+
+REPORT_TYPE = 'standard'
+
+
+def timed(func):
+    '''
+    Find time taken to run function.
+
+    Parameters
+    ----------
+    func : function
+        Function with no arguments, returning the report HTML
+
+    Returns
+    -------
+    seconds : float
+        Time taken in seconds
+    html : string
+        Report HTML
+    '''
+    start = time.perf_counter()
+    html = func()
+    return time.perf_counter() - start, html
+
+
+def main():
+    data = load_report_data(REPORT_TYPE)
+    workers = os.cpu_count()
+
+    with tempfile.TemporaryDirectory() as cache_dir:
+        figures.CACHE_DIR = cache_dir
+        results = [
+            ('one at a time (PNG)', timed(
+                lambda: create_report_html(REPORT_TYPE, data))),
+            ('parallel, cold cache', timed(
+                lambda: create_static_report(REPORT_TYPE, data, workers))),
+            ('parallel, warm cache', timed(
+                lambda: create_static_report(REPORT_TYPE, data, workers)))]
+        n_images = len(os.listdir(cache_dir))
+
+    print(f'{REPORT_TYPE} report: {n_images} figures, {workers} worker(s)')
+    print(f'{"export":<22}{"seconds":>9}{"HTML MB":>9}')
+    for name, (seconds, html) in results:
+        print(f'{name:<22}{seconds:>9.1f}{len(html) / 1e6:>9.2f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,195 @@
+'''
+Memory benchmark comparing how the Download PDF reports page serves the
+reports to many sessions, each of which has generated and downloaded both
+reports.
+
+* 'session_state' - the original approach, where each session rendered the
+reports, read the PDFs back into st.session_state and passed those bytes to
+the download buttons
+* 'file' - each run of the page reads the rendered PDF from disk and passes
+it to the download buttons
+* 'deferred' - the current approach, where the download buttons are given a
+function to read the PDF, which is only called when clicked
+
+Sessions are simulated with Streamlit's own MediaFileManager (which holds the
+files for the download buttons, storing identical files once), with a
+dictionary standing in for st.session_state. Each approach is run in a new
+process, and memory is measured as the increase in resident memory, and as
+the memory still allocated (using tracemalloc). Both include the single copy
+of each report held by the MediaFileManager once downloaded.
+
+The reports must have been rendered (which needs weasyprint) - they are
+taken from the survey data folder, or rendered to the report cache if not
+there.
+
+Run from the root of the repository:
+    python -m benchmarks.report_memory
+'''
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+import gc
+import multiprocessing
+import os
+import tracemalloc
+from unittest import mock
+
+import psutil
+from streamlit.runtime import media_file_manager
+from streamlit.runtime.memory_media_file_storage import MemoryMediaFileStorage
+
+from dashboard.reports import (
+    REPORTS, prebuilt_path, read_report, render_report, report_path)
+
+N_SESSIONS = 100
+
+
+def session_state_approach(manager, paths):
+    '''
+    Simulate one run of the page under the original approach.
+
+    Parameters
+    ----------
+    manager : MediaFileManager
+        Holds the files for the download buttons
+    paths : dictionary
+        Path to the PDF for each report type
+
+    Returns
+    -------
+    session : dictionary
+        Stand-in for st.session_state
+    '''
+    session = {}
+    for report_type, path in paths.items():
+        session[f'pdf_report_{report_type}'] = read_report(path)
+        manager.add(session[f'pdf_report_{report_type}'], 'application/pdf',
+                    f'download_{report_type}',
+                    file_name=REPORTS[report_type].file_name,
+                    is_for_static_download=True)
+    return session
+
+
+def file_approach(manager, paths):
+    '''
+    Simulate one run of the page when the download buttons were given the
+    file.
+
+    Parameters
+    ----------
+    manager : MediaFileManager
+        Holds the files for the download buttons
+    paths : dictionary
+        Path to the PDF for each report type
+
+    Returns
+    -------
+    session : dictionary
+        Stand-in for st.session_state
+    '''
+    for report_type, path in paths.items():
+        with open(path, 'rb') as f:
+            manager.add(f.read(), 'application/pdf',
+                        f'download_{report_type}',
+                        file_name=REPORTS[report_type].file_name,
+                        is_for_static_download=True)
+    return {}
+
+
+def deferred_approach(manager, paths):
+    '''
+    Simulate one run of the page under the current approach, then clicking
+    both download buttons.
+
+    Parameters
+    ----------
+    manager : MediaFileManager
+        Holds the files for the download buttons
+    paths : dictionary
+        Path to the PDF for each report type
+
+    Returns
+    -------
+    session : dictionary
+        Stand-in for st.session_state
+    '''
+    for report_type, path in paths.items():
+        file_id = manager.add_deferred(
+            partial(read_report, path), 'application/pdf',
+            f'download_{report_type}',
+            file_name=REPORTS[report_type].file_name,
+            element_id=f'download_{report_type}')
+        manager.execute_deferred(file_id)
+    return {}
+
+
+APPROACHES = {
+    'session_state': session_state_approach,
+    'file': file_approach,
+    'deferred': deferred_approach}
+
+
+def measure(name, paths, n_sessions=N_SESSIONS):
+    '''
+    Measure memory held after simulating the given number of sessions. This
+    is run in a new process for each approach.
+
+    Parameters
+    ----------
+    name : string
+        Name of approach in APPROACHES
+    paths : dictionary
+        Path to the PDF for each report type
+    n_sessions : integer
+        Number of sessions to simulate
+
+    Returns
+    -------
+    rss : integer
+        Increase in resident memory in bytes
+    traced : integer
+        Bytes allocated and still held
+    '''
+    approach = APPROACHES[name]
+    manager = media_file_manager.MediaFileManager(
+        MemoryMediaFileStorage('/media'))
+    process = psutil.Process()
+
+    gc.collect()
+    rss_before = process.memory_info().rss
+    tracemalloc.start()
+    sessions = []
+    for i in range(n_sessions):
+        with mock.patch.object(media_file_manager, '_get_session_id',
+                               return_value=f'session_{i}'):
+            sessions.append(approach(manager, paths))
+    gc.collect()
+    traced, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return process.memory_info().rss - rss_before, traced
+
+
+def main():
+    # Get the rendered reports, rendering them if needed
+    paths = {}
+    for report_type in REPORTS:
+        paths[report_type] = prebuilt_path(report_type)
+        if paths[report_type] is None:
+            paths[report_type] = report_path(report_type)
+            if not os.path.exists(paths[report_type]):
+                render_report(report_type, paths[report_type])
+    size = sum(os.path.getsize(path) for path in paths.values())
+    print(f'Reports: {size/1e6:.2f} MB in total\n')
+
+    print(f'{"approach":<15}{"sessions":>10}{"RSS MB":>10}{"held MB":>10}'
+          f'{"per session KB":>17}')
+    for name in APPROACHES:
+        with ProcessPoolExecutor(
+                max_workers=1,
+                mp_context=multiprocessing.get_context('spawn')) as executor:
+            rss, traced = executor.submit(measure, name, paths).result()
+        print(f'{name:<15}{N_SESSIONS:>10}{rss/1e6:>10.2f}{traced/1e6:>10.2f}'
+              f'{traced/N_SESSIONS/1e3:>17.2f}')
+
+
+if __name__ == '__main__':
+    main()
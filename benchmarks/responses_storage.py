@@ -0,0 +1,83 @@
+'''
+Benchmark loading and first render of the standard survey responses, from the
+CSV (where responses are strings of lists, parsed with literal_eval on every
+call to get_chosen_result) and from parquet (where they are stored as arrays).
+
+Times are the mean over repeated runs of:
+* load - reading the file
+* extract - get_chosen_result() for every topic and group
+* first render - load, then get_chosen_result() and create_bar_charts() for
+the default topic for all pupils (as on first opening the page)
+
+Run from the root of the repository:
+    python -m benchmarks.responses_storage
+'''
+import time
+
+from kailo_beewell_dashboard.explore_results import (
+    create_bar_charts, get_chosen_result as get_chosen_result_csv)
+import pandas as pd
+
+from dashboard.data import paths, survey_path
+from dashboard.responses import (
+    get_chosen_result as get_chosen_result_parquet)
+
+GROUPS = ['For all pupils', 'By year group', 'By gender', 'By FSM', 'By SEN']
+REPEATS = 5
+
+CSV = survey_path(paths.standard_responses.replace('.parquet', '.csv'))
+PARQUET = survey_path(paths.standard_responses)
+
+
+def mean_time(func, repeats=REPEATS):
+    '''
+    Find mean time taken to run function.
+
+    Parameters
+    ----------
+    func : function
+        Function with no arguments
+    repeats : integer
+        Number of times to run the function
+
+    Returns
+    -------
+    float
+        Mean time in seconds
+    '''
+    start = time.perf_counter()
+    for _ in range(repeats):
+        func()
+    return (time.perf_counter() - start) / repeats
+
+
+def main():
+    formats = {
+        'csv': (lambda: pd.read_csv(CSV), get_chosen_result_csv),
+        'parquet': (lambda: pd.read_parquet(PARQUET),
+                    get_chosen_result_parquet)}
+
+    print(f'{"format":<10}{"load ms":>10}{"extract ms":>13}'
+          f'{"first render ms":>18}')
+    for name, (load, get_chosen_result) in formats.items():
+        df = load()
+        topics = df['group'].unique()
+
+        def extract_all():
+            for topic in topics:
+                for group in GROUPS:
+                    get_chosen_result(topic, group, df, None, 'standard')
+
+        def first_render():
+            df = load()
+            chosen_result = get_chosen_result(
+                topics[0], 'For all pupils', df, None, 'standard')
+            create_bar_charts(topics[0], chosen_result)
+
+        print(f'{name:<10}{mean_time(load)*1e3:>10.1f}'
+              f'{mean_time(extract_all)*1e3:>13.1f}'
+              f'{mean_time(first_render)*1e3:>18.1f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,110 @@
+'''
+Memory benchmark comparing how the Standard survey page holds its read-only
+data (MSOA scores and GeoJSON) across concurrent sessions.
+
+* 'session_state' - the previous approach, where each session read its own
+copy of the scores (twice, as scores_rag and msoa_df) and the GeoJSON into
+st.session_state (with the original, unsimplified boundaries)
+* 'shared' - the current approach, where every session uses the same objects
+from the cached loaders in dashboard.data
+
+Each session is simulated by a dictionary standing in for st.session_state,
+and memory is measured with tracemalloc.
+
+Run from the root of the repository:
+    python -m benchmarks.session_memory
+'''
+import gc
+import json
+import tracemalloc
+
+import pandas as pd
+
+from dashboard.data import (
+    area_path, load_geojson, load_standard_scores, paths, survey_path)
+
+SESSION_COUNTS = [1, 50, 500]
+
+# Boundaries loaded by the previous approach (before they were simplified)
+ORIGINAL_GEOJSON = 'geojson/combined_nd.geojson'
+
+
+def session_state_approach():
+    '''
+    Simulate the data held by one session under the previous approach.
+
+    Returns
+    -------
+    session : dictionary
+        Stand-in for st.session_state
+    '''
+    session = {}
+    session['scores_rag'] = pd.read_csv(survey_path(paths.standard_scores))
+    with open(area_path(ORIGINAL_GEOJSON)) as f:
+        session['geojson_nd'] = json.load(f)
+    session['msoa_df'] = pd.read_csv(survey_path(paths.standard_scores))
+    return session
+
+
+def shared_approach():
+    '''
+    Simulate the data held by one session under the current approach, where
+    the page only holds references to the shared objects.
+
+    Returns
+    -------
+    session : dictionary
+        Stand-in for the objects a session refers to
+    '''
+    return {'df_scores': load_standard_scores(),
+            'geojson': load_geojson()}
+
+
+def measure(approach, n_sessions):
+    '''
+    Measure memory held after simulating the given number of sessions.
+
+    Parameters
+    ----------
+    approach : function
+        Function returning the data held by a single session
+    n_sessions : integer
+        Number of sessions to simulate
+
+    Returns
+    -------
+    total : integer
+        Bytes allocated and still held by the sessions
+    '''
+    gc.collect()
+    tracemalloc.start()
+    sessions = [approach() for _ in range(n_sessions)]
+    total, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del sessions
+    gc.collect()
+    return total
+
+
+def main():
+    # Populate the shared cache first - this is paid once per process, so is
+    # reported separately rather than counted against any session
+    gc.collect()
+    tracemalloc.start()
+    shared_approach()
+    shared_once, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f'Shared cache (once per process): {shared_once/1e6:.2f} MB\n')
+
+    print(f'{"approach":<15}{"sessions":>10}{"total MB":>12}'
+          f'{"per session KB":>17}')
+    for approach in [session_state_approach, shared_approach]:
+        name = approach.__name__.replace('_approach', '')
+        for n in SESSION_COUNTS:
+            total = measure(approach, n)
+            print(f'{name:<15}{n:>10}{total/1e6:>12.2f}'
+                  f'{total/n/1e3:>17.2f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,135 @@
+'''
+Benchmark the functions which shape the scores for the standard survey page
+(dashboard/rag.py and dashboard/summary.py), to see how each scales with the
+number of MSOAs and topics.
+
+Larger tables are made by copying the shipped scores table (with RAG
+ratings), renaming the MSOAs and/or topics in each copy, to give 1x, 10x and
+100x the MSOAs, and 10x and 100x the topics. Times are the mean over repeated
+runs, for:
+
+* index - create_msoa_rag_index(), run once when the scores are loaded
+* colours - get_rag_colour_scheme() for the rating of every row
+* descriptions - create_topic_descriptions(), run once when the scores are
+loaded, with the time for the dictionary previously made on every run of the
+page for comparison (checked to give the same result)
+* summary - the HTML for the summary of topics for one MSOA (as shown by
+display_rag_dict(), without the Streamlit elements), run each time the page
+runs
+
+Run from the root of the repository:
+    python -m benchmarks.standard_page
+'''
+import pandas as pd
+
+from benchmarks.rag_ratings import mean_time
+from dashboard.data import paths, survey_path
+from dashboard.rag import create_msoa_rag_index, get_rag_colour_scheme
+from dashboard.summary import create_topic_descriptions, rag_container_html
+
+# Number of copies of the MSOAs and of the topics
+SIZES = [(1, 1), (10, 1), (100, 1), (1, 10), (1, 100)]
+
+
+def scale_scores(scores, msoa_copies, topic_copies):
+    '''
+    Create larger scores table by copying the MSOAs and topics.
+
+    Parameters
+    ----------
+    scores : dataframe
+        Scores with RAG ratings
+    msoa_copies : integer
+        Number of copies of each MSOA
+    topic_copies : integer
+        Number of copies of each topic
+
+    Returns
+    -------
+    dataframe
+        Scores for msoa_copies times the MSOAs and topic_copies times the
+        topics (the first copy of each keeping its original name)
+    '''
+    copies = []
+    for i in range(msoa_copies):
+        for j in range(topic_copies):
+            copy = scores.copy()
+            if i > 0:
+                copy['msoa'] = copy['msoa'] + f' ({i})'
+            if j > 0:
+                copy['variable'] = copy['variable'] + f'_{j}'
+                copy['variable_lab'] = copy['variable_lab'] + f' ({j})'
+            copies.append(copy)
+    return pd.concat(copies, ignore_index=True)
+
+
+def page_descriptions(scores):
+    '''
+    Create dictionary of topic descriptions, as previously done on every run
+    of the standard survey page.
+
+    Parameters
+    ----------
+    scores : dataframe
+        Scores with RAG ratings
+
+    Returns
+    -------
+    dictionary
+        Description of each topic
+    '''
+    return (scores[['variable', 'description']]
+            .drop_duplicates()
+            .set_index('variable')
+            .to_dict()['description'])
+
+
+def summary_html(records):
+    '''
+    Create the HTML for the RAG rating of each topic for an MSOA.
+
+    Parameters
+    ----------
+    records : tuple
+        Records for an MSOA from create_msoa_rag_index()
+
+    Returns
+    -------
+    list
+        HTML for the box showing each rating
+    '''
+    return [rag_container_html(entry['rag']['rag_text'],
+                               entry['rag']['bg_colour'],
+                               entry['rag']['font_colour'])
+            for entry in records]
+
+
+def main():
+    shipped = pd.read_csv(survey_path(paths.standard_scores))
+
+    print(f'{"MSOAs":>7}{"topics":>8}{"rows":>9}{"index ms":>10}'
+          f'{"colours ms":>12}{"page desc ms":>14}{"desc ms":>9}'
+          f'{"summary ms":>12}')
+    for msoa_copies, topic_copies in SIZES:
+        scores = scale_scores(shipped, msoa_copies, topic_copies)
+        index = create_msoa_rag_index(scores)
+        records = next(iter(index.values()))
+
+        # Check descriptions are the same as those previously made by the page
+        assert dict(create_topic_descriptions(scores)) == (
+            page_descriptions(scores))
+
+        index_time = mean_time(lambda: create_msoa_rag_index(scores))
+        colours = mean_time(
+            lambda: [get_rag_colour_scheme(rag) for rag in scores['rag']])
+        page = mean_time(lambda: page_descriptions(scores))
+        descriptions = mean_time(lambda: create_topic_descriptions(scores))
+        summary = mean_time(lambda: summary_html(records))
+        print(f'{scores["msoa"].nunique():>7}'
+              f'{scores["variable"].nunique():>8}{len(scores):>9}'
+              f'{index_time*1e3:>10.2f}{colours*1e3:>12.2f}{page*1e3:>14.2f}'
+              f'{descriptions*1e3:>9.2f}{summary*1e3:>12.3f}')
+
+
+if __name__ == '__main__':
+    main()
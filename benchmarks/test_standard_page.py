@@ -0,0 +1,64 @@
+'''
+Benchmark the functions which shape the scores for the standard survey page
+(dashboard/rag.py and dashboard/summary.py) with pytest-benchmark, so that
+runs can be saved and compared to find regressions.
+
+The tables are made as in benchmarks/standard_page.py, copying the shipped
+scores table to give 1x, 10x and 100x the MSOAs, and 10x and 100x the
+topics. Each benchmark also checks the result.
+
+Run from the root of the repository:
+    python -m pytest benchmarks/test_standard_page.py
+'''
+import pandas as pd
+import pytest
+
+from benchmarks.standard_page import (
+    SIZES, page_descriptions, scale_scores, summary_html)
+from dashboard.data import paths, survey_path
+from dashboard.rag import create_msoa_rag_index
+from dashboard.summary import create_topic_descriptions, rag_container_html
+
+
+@pytest.fixture(scope='module')
+def shipped():
+    '''Scores with RAG ratings, as shipped in the survey data folder'''
+    return pd.read_csv(survey_path(paths.standard_scores))
+
+
+@pytest.fixture(params=SIZES,
+                ids=[f'{msoas}x_msoas-{topics}x_topics'
+                     for msoas, topics in SIZES])
+def scores(request, shipped):
+    '''Scores copied to give more MSOAs and/or topics'''
+    return scale_scores(shipped, *request.param)
+
+
+@pytest.mark.benchmark(group='index')
+def test_create_msoa_rag_index(benchmark, scores):
+    index = benchmark(create_msoa_rag_index, scores)
+    assert len(index) == scores['msoa'].nunique()
+    assert sum(len(records) for records in index.values()) == len(scores)
+
+
+@pytest.mark.benchmark(group='descriptions')
+def test_create_topic_descriptions(benchmark, scores):
+    descriptions = benchmark(create_topic_descriptions, scores)
+    assert dict(descriptions) == page_descriptions(scores)
+
+
+@pytest.mark.benchmark(group='summary')
+def test_summary_html(benchmark, scores):
+    records = next(iter(create_msoa_rag_index(scores).values()))
+    html = benchmark(summary_html, records)
+    assert len(html) == len(records)
+    for entry, box in zip(records, html):
+        assert entry['rag']['rag_text'] in box
+
+
+@pytest.mark.benchmark(group='container')
+def test_rag_container_html(benchmark):
+    html = benchmark(rag_container_html, 'Below average', '#FFB3B3', '#000')
+    assert html == ('<div style="background-color:#FFB3B3;color:#000;'
+                    'padding:10px;border-radius:5px;text-align:center;">'
+                    'Below average</div>')
@@ -0,0 +1,194 @@
+'''
+Vectorised aggregation of pupil-level scores, and RAG ratings.
+
+aggregate_scores_by_site_and_group() gives the same result as using
+results_by_site_and_group() with aggregate_scores() from
+kailo_beewell_dashboard, followed by hiding results when n<10, but without
+looping over each site and group. The pupil-level data is grouped once, by
+site and every pupil characteristic used in the groups, to find the sum and
+count of each score. The results for each group are then found by adding up
+these (much smaller) sums and counts.
+
+create_rag_ratings() gives identical results to create_rag_ratings() from
+kailo_beewell_dashboard, but finds the weighted mean and standard deviation
+for every topic (and group) at once using arrays, rather than applying a
+function to each.
+'''
+import numpy as np
+import pandas as pd
+
+# Groups to aggregate by, as the column and the values of that column to
+# filter to (in addition to 'All' pupils)
+GROUPS = {
+    'standard': [
+        ('year_group_lab', ['Year 8', 'Year 10']),
+        ('gender_lab', ['Girl', 'Boy']),
+        ('fsm_lab', ['FSM', 'Non-FSM']),
+        ('sen_lab', ['SEN', 'Non-SEN'])],
+    'symbol': [
+        ('year_group_lab', ['Year 7', 'Year 8', 'Year 9', 'Year 10',
+                            'Year 11']),
+        ('gender_lab', ['Girl', 'Boy']),
+        ('fsm_lab', ['FSM', 'Non-FSM'])],
+    'none': []}
+
+# RAG ratings, with 'nan' (as a string, as in the CSV files) for no rating
+RAG_RATINGS = np.array(['below', 'average', 'above', 'nan'], dtype=object)
+
+
+def aggregate_scores_by_site_and_group(
+        data, group_type='standard', site_col='school_lab', min_count=10):
+    '''
+    Find the mean and count of each score for every site and group. Every
+    combination of site and group is included, with a count of 0 (or NaN if
+    hidden) when there are no pupils.
+
+    Parameters
+    ----------
+    data : dataframe
+        Pupil-level survey responses, with their site and demographics, and
+        the score columns (ending '_score')
+    group_type : string
+        Links to the type of demographic groupings performed. Either
+        'standard', 'symbol' or 'none' - default is standard.
+    site_col : string
+        Name of column with site - e.g. 'school_lab' (default), 'msoa'.
+    min_count : integer
+        Results with fewer pupils than this are hidden (mean and count set to
+        NaN) - default 10. Set to 0 to keep all results.
+
+    Returns
+    -------
+    result : dataframe
+        Dataframe with mean and count for each score, site and group (in the
+        same order as results_by_site_and_group())
+    '''
+    score_col = [col for col in data.columns if col.endswith('_score')]
+    group_cols = [col for col, _ in GROUPS[group_type]]
+    groups = [(None, 'All')] + [(col, value)
+                                for col, values in GROUPS[group_type]
+                                for value in values]
+
+    # Find sum and count of each score for every combination of site and
+    # pupil characteristics (the only pass over the pupil-level data)
+    data = data[data[site_col].notna()]
+    grouped = data.groupby([site_col] + group_cols, dropna=False,
+                           sort=False)[score_col]
+    cell_sum = grouped.sum()
+    cell_count = grouped.count()
+
+    # Add up the cells within each group, for every site - reindexing so that
+    # sites with no pupils in a group have a count of 0
+    sites = np.sort(data[site_col].unique())
+    shape = (len(sites), len(groups), len(score_col))
+    total = np.zeros(shape)
+    count = np.zeros(shape)
+    for i, (col, value) in enumerate(groups):
+        if col is None:
+            mask = slice(None)
+        else:
+            mask = cell_sum.index.get_level_values(col) == value
+        total[:, i] = (cell_sum[mask].groupby(level=site_col).sum()
+                       .reindex(sites, fill_value=0).to_numpy())
+        count[:, i] = (cell_count[mask].groupby(level=site_col).sum()
+                       .reindex(sites, fill_value=0).to_numpy())
+
+    # Find means (NaN if no pupils), and hide results when count is too low
+    with np.errstate(invalid='ignore'):
+        mean = total / count
+    hide = count < min_count
+    mean[hide] = np.nan
+    count[hide] = np.nan
+
+    # Reshape into a row per site, group and score
+    result = pd.DataFrame({
+        'variable': np.tile(score_col, len(sites) * len(groups)),
+        'mean': mean.ravel(),
+        'count': count.ravel() if min_count else count.ravel().astype(int),
+        site_col: np.repeat(sites, len(groups) * len(score_col))})
+    group_index = np.tile(np.repeat(np.arange(len(groups)), len(score_col)),
+                          len(sites))
+    for group_col in group_cols:
+        labels = np.array([value if col == group_col else 'All'
+                           for col, value in groups], dtype=object)
+        result[group_col] = labels[group_index]
+    return result
+
+
+def create_rag_ratings(df):
+    '''
+    Generate RAG ratings (above, average, below) based on scores, comparing
+    each site to the mean and standard deviation across sites (weighted by
+    the number of pupils at each site).
+
+    Parameters
+    ----------
+    df : dataframe
+        Contains scores by site ('msoa' or 'school_lab'), and potentially by
+        pupil group too - as from aggregate_scores_by_site_and_group()
+
+    Returns
+    -------
+    dataframe
+        Dataframe with scores by site, with additional columns providing RAG
+        ratings and descriptives of the score distribution that were used to
+        generate the RAG
+    '''
+    # Columns that scores are grouped by - i.e. just 'variable' for area
+    # maps, or 'variable' plus the demographic columns
+    score_groups = [col for col in df.columns
+                    if col not in ['mean', 'count', 'msoa', 'school_lab']]
+    rag = df.reset_index(drop=True)
+
+    # Number each group, then sort the rows with results (non-NaN) by group
+    # (rows where a grouping column is NaN have no group, as in groupby())
+    codes = rag.groupby(score_groups).ngroup().fillna(-1).to_numpy(int)
+    n_codes = codes.max() + 1
+    has_group = codes >= 0
+    use = has_group & (rag['mean'].notna() & rag['count'].notna()).to_numpy()
+    order = np.flatnonzero(use)[np.argsort(codes[use], kind='stable')]
+    values = rag['mean'].to_numpy()[order]
+    counts = rag['count'].to_numpy()[order]
+    sizes = np.bincount(codes[order], minlength=n_codes)
+    starts = np.cumsum(sizes) - sizes
+
+    # Find weighted mean and SD for every group - groups with the same number
+    # of sites are stacked into a 2D array, so each row is summed in the same
+    # way as by np.average(), giving identical results
+    stats = np.full((n_codes, 4), np.nan)
+    for size in np.unique(sizes[sizes > 0]):
+        group = np.flatnonzero(sizes == size)
+        index = starts[group, np.newaxis] + np.arange(size)
+        group_values = values[index]
+        group_counts = counts[index]
+        total = group_counts.sum(axis=1)
+        average = (group_values * group_counts).sum(axis=1) / total
+        variance = (((group_values - average[:, np.newaxis])**2)
+                    * group_counts).sum(axis=1) / total
+        stats[group] = np.column_stack(
+            [total, np.full(len(group), size), average, np.sqrt(variance)])
+
+    # Get the weighted mean and SD for each row, and find 1 SD above and
+    # below the mean
+    row_stats = np.full((len(rag), 4), np.nan)
+    row_stats[has_group] = stats[codes[has_group]]
+    lower = row_stats[:, 2] - row_stats[:, 3]
+    upper = row_stats[:, 2] + row_stats[:, 3]
+
+    # Create RAG rating based on whether scores were past the lower and upper
+    # boundaries (where more than one applies, the first in the list of
+    # RAG_RATINGS is used, and rows without a score have no rating)
+    mean = rag['mean'].to_numpy()
+    band = np.full(len(rag), 3)
+    band[mean >= upper] = 2
+    band[(mean > lower) & (mean < upper)] = 1
+    band[mean <= lower] = 0
+
+    return pd.concat([rag, pd.DataFrame({
+        'total_pupils': row_stats[:, 0],
+        'group_n': row_stats[:, 1],
+        'group_wt_mean': row_stats[:, 2],
+        'group_wt_std': row_stats[:, 3],
+        'lower': lower,
+        'upper': upper,
+        'rag': RAG_RATINGS[band]})], axis=1)
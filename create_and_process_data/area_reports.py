@@ -0,0 +1,408 @@
+'''
+Create a PDF report for every MSOA in a region (dashboard/regions.py).
+
+Each report has a summary of the results for that area - the score and RAG
+rating for each topic - followed by the results for the whole region (the
+bar charts of responses to each question, as in the standard survey
+report). Reports by school can be added in the same way once there is
+aggregate data by school. Choose the region with --region (default is
+Northern Devon) - the reports for each region are saved to their own folder.
+
+Content shared by every report - the logo, illustration, page styling and the
+charts for the whole region - is created once. The charts are exported once
+(using the figure cache from dashboard/figures.py) and linked to rather than
+embedded, so each process loads each image once and reuses it for every
+report it renders. Reports are rendered in a pool of processes, one per CPU
+by default.
+
+The job can be stopped and run again: each report is written to a temporary
+file and then moved into place, and a manifest in the output folder records
+the version of the data and code that each report was made from. Reports
+which are already up to date are skipped.
+
+Run from the root of the repository:
+    python -m create_and_process_data.area_reports
+'''
+import argparse
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from dataclasses import dataclass
+import glob
+import hashlib
+import json
+import os
+import re
+import sys
+import time
+
+from kailo_beewell_dashboard.reuse_text import caution_comparing
+from kailo_beewell_dashboard.static_report import (
+    illustration_html, logo_html, structure_report)
+from kailo_beewell_dashboard.summary_rag import create_rag_container
+from markdown import markdown
+import pandas as pd
+
+from create_and_process_data.pipeline import hash_files, write_temp
+from dashboard import figures
+from dashboard.rag import get_rag_colour_scheme
+from dashboard.regions import DEFAULT_REGION, REGIONS, get_region
+from dashboard.reports import (
+    explore_results_content, load_report_data, report_version)
+
+
+@dataclass(frozen=True)
+class Paths:
+    '''Stores paths to data and files'''
+    # Folder for the reports of each region, with the key of the region
+    output_dir = 'reports/{region}/msoa'
+    manifest = '.reports_manifest.json'
+
+
+paths = Paths()
+
+# Markers for the title and content in the shared report HTML
+TITLE = '<!--title-->'
+CONTENT = '<!--content-->'
+
+# Images loaded by weasyprint, reused for every report rendered by a process
+_image_cache = {}
+
+
+@dataclass(frozen=True)
+class SharedContent:
+    '''
+    HTML shared by every report, created once.
+
+    Attributes
+    ----------
+    area : string
+        Name of the region, as used in the text of the reports
+    document : string
+        HTML document with the page styling, with TITLE and CONTENT markers
+    logo : string
+        Logo for the title page
+    illustration : string
+        Illustration for the title page
+    explore_results : string
+        Bar charts of responses from across the region, linking to the
+        exported images
+    '''
+    area: str
+    document: str
+    logo: str
+    illustration: str
+    explore_results: str
+
+
+def area_filename(msoa):
+    '''
+    Get name of the PDF file for an area.
+
+    Parameters
+    ----------
+    msoa : string
+        Name of the MSOA (e.g. 'North Devon 001')
+
+    Returns
+    -------
+    string
+        Filename (e.g. 'north_devon_001.pdf')
+    '''
+    return re.sub(r'[^a-z0-9]+', '_', msoa.lower()).strip('_') + '.pdf'
+
+
+def reports_version(region=None):
+    '''
+    Get version of the area reports - a hash of the data and code used to
+    make the standard survey report, and of this module.
+
+    Parameters
+    ----------
+    region : string
+        Key of the region (from dashboard/regions.py) - default is the
+        default region
+
+    Returns
+    -------
+    string
+        Version of the reports
+    '''
+    sha = hashlib.sha256(report_version('standard', region).encode())
+    sha.update(hash_files([__file__]).encode())
+    return sha.hexdigest()[:16]
+
+
+def create_shared_content(data, region=None, workers=None):
+    '''
+    Create the HTML shared by every report, exporting the images for the
+    charts for the whole region (if not already in the figure cache).
+
+    Parameters
+    ----------
+    data : dictionary
+        Datasets for the standard survey report, from load_report_data()
+    region : string
+        Key of the region (from dashboard/regions.py) - default is the
+        default region
+    workers : integer
+        Number of processes exporting images (default: number of CPUs)
+
+    Returns
+    -------
+    SharedContent
+        HTML shared by every report
+    '''
+    with figures.collect_figures() as report_figures:
+        content = explore_results_content('standard', data, [])
+    explore_results = figures.embed_figures(
+        ''.join(content), report_figures, workers=workers, inline=False)
+    return SharedContent(
+        area=get_region(region).name,
+        document=structure_report(TITLE, [CONTENT]),
+        logo=logo_html(),
+        illustration=illustration_html(),
+        explore_results=explore_results)
+
+
+def area_summary(msoa, scores, area):
+    '''
+    Create HTML for the summary of results for an area, with the score and
+    RAG rating for each topic.
+
+    Parameters
+    ----------
+    msoa : string
+        Name of the MSOA
+    scores : dataframe
+        Scores with RAG ratings for the MSOA
+    area : string
+        Name of the region
+
+    Returns
+    -------
+    string
+        HTML for the summary
+    '''
+    # Only include topics (excluding scores without a label, which are parts
+    # of other topics)
+    scores = scores[scores['variable_lab'].notna()]
+    rows = []
+    for row in scores.itertuples():
+        scheme = get_rag_colour_scheme(row.rag)
+        rag_box = create_rag_container(
+            scheme['rag_text'], scheme['bg_colour'], scheme['font_colour'],
+            output='pdf')
+        if pd.notna(row.mean):
+            score = f'''
+<p style='text-align:center;'>{row.mean:.1f}<br>({area}:
+{row.group_wt_mean:.1f})</p>'''
+        else:
+            score = "<p style='text-align:center;'>-</p>"
+        rows.append(f'''
+<hr>
+<div class='row'>
+    <div class='column3'>
+        <p style='text-align:center;'>{row.variable_lab}</p>
+    </div>
+    <div class='column3'>{score}</div>
+    <div class='column3'>{rag_box}</div>
+</div>''')
+
+    return f'''
+<h1 id='summary' style='page-break-before:always;'>Summary for {msoa}</h1>
+<p>For each topic, an overall score has been calculated for young people in
+{msoa}, and compared with the scores for other areas of {area}. The score is
+shown with the average across {area} (weighted by the number of pupils in
+each area). Results are not shown for topics where fewer than 10 young people
+answered all of the questions.</p>
+<div class='row'>
+    <div class='column3'>
+        <p style='text-align:center; font-weight:bold;'>Topic</p>
+    </div>
+    <div class='column3'>
+        <p style='text-align:center; font-weight:bold;'>Score</p>
+    </div>
+    <div class='column3'>
+        <p style='text-align:center; font-weight:bold;'>Compared with other
+        areas</p>
+    </div>
+</div>
+{''.join(rows)}
+<h2>Comparing between areas</h2>
+{markdown(caution_comparing('area'))}'''
+
+
+def create_area_report(msoa, scores, shared):
+    '''
+    Create HTML for the report for an area.
+
+    Parameters
+    ----------
+    msoa : string
+        Name of the MSOA
+    scores : dataframe
+        Scores with RAG ratings for the MSOA
+    shared : SharedContent
+        HTML shared by every report
+
+    Returns
+    -------
+    string
+        HTML for the report
+    '''
+    content = f'''
+{shared.logo}
+<div class='section_container'>
+    <h1 style='text-align:center;'>#BeeWell - {msoa}</h1>
+    <p style='text-align:center; font-weight:bold;'>Thank you for taking part
+    in the #BeeWell survey delivered by Kailo.</p>
+    <p>This report has results from young people living in {msoa}, along
+    with results from across {shared.area}. These can also be explored using
+    the interactive dashboard.</p>
+</div>
+{shared.illustration}
+{area_summary(msoa, scores, shared.area)}
+<h1 id='explore_results' style='page-break-before:always;'>Results across
+{shared.area}</h1>
+{shared.explore_results}'''
+    return (shared.document.replace(TITLE, f'#BeeWell - {msoa}')
+            .replace(CONTENT, content))
+
+
+def render_area_report(html, path):
+    '''
+    Render report to PDF and save it. This is run in the worker processes.
+
+    Parameters
+    ----------
+    html : string
+        HTML for the report
+    path : string
+        Path to save the PDF to
+
+    Returns
+    -------
+    float
+        Time taken to render the report in seconds
+    '''
+    # Imported here so weasyprint is only loaded by the worker processes
+    import weasyprint
+
+    start = time.perf_counter()
+    pdf = weasyprint.HTML(string=html).write_pdf(cache=_image_cache)
+    os.replace(write_temp(pdf, path), path)
+    return time.perf_counter() - start
+
+
+def load_manifest(output_dir):
+    '''
+    Load record of the version of each report.
+
+    Parameters
+    ----------
+    output_dir : string
+        Folder with reports
+
+    Returns
+    -------
+    dictionary
+        Version of each report filename (empty if there is no manifest yet)
+    '''
+    path = os.path.join(output_dir, paths.manifest)
+    if not os.path.exists(path):
+        return {}
+    with open(path) as f:
+        return json.load(f)
+
+
+def save_manifest(manifest, output_dir):
+    '''
+    Save record of the version of each report.
+
+    Parameters
+    ----------
+    manifest : dictionary
+        Version of each report filename
+    output_dir : string
+        Folder with reports
+    '''
+    path = os.path.join(output_dir, paths.manifest)
+    os.replace(write_temp(manifest, path), path)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--region', default=DEFAULT_REGION,
+                        choices=REGIONS,
+                        help='Region to create reports for (default: '
+                        '%(default)s)')
+    parser.add_argument('--output-dir', default=None,
+                        help='Folder to save reports to (default: '
+                        f'{paths.output_dir})')
+    parser.add_argument('--workers', type=int, default=None,
+                        help='Number of processes (default: number of CPUs)')
+    parser.add_argument('--msoa', action='append',
+                        help='MSOA to create report for (default: all) - '
+                        'can be used more than once')
+    parser.add_argument('--force', action='store_true',
+                        help='Recreate reports that are up to date')
+    args = parser.parse_args()
+    output_dir = (args.output_dir or
+                  paths.output_dir.format(region=args.region))
+
+    start = time.perf_counter()
+    os.makedirs(output_dir, exist_ok=True)
+
+    # Remove temporary files left if the job was stopped part-way through
+    for temp_path in glob.glob(os.path.join(output_dir, '.*.pdf.*')):
+        os.remove(temp_path)
+
+    # Find reports that are missing or out of date
+    data = load_report_data('standard', args.region)
+    scores = data['standard_scores']
+    version = reports_version(args.region)
+    manifest = load_manifest(output_dir)
+    msoas = args.msoa or sorted(scores['msoa'].unique())
+    to_run = [
+        msoa for msoa in msoas
+        if args.force or manifest.get(area_filename(msoa)) != version or
+        not os.path.exists(os.path.join(output_dir, area_filename(msoa)))]
+    print(f'{len(msoas) - len(to_run)} of {len(msoas)} reports up to date')
+    if not to_run:
+        return
+
+    shared = create_shared_content(data, args.region, args.workers)
+    print(f'{"shared content":<24}{time.perf_counter() - start:>8.2f}s')
+
+    # Render reports, recording each in the manifest as soon as it is saved
+    # (so finished reports are not rendered again if the job is stopped)
+    with ProcessPoolExecutor(max_workers=args.workers) as executor:
+        pending = {}
+        for msoa in to_run:
+            html = create_area_report(
+                msoa, scores[scores['msoa'] == msoa], shared)
+            path = os.path.join(output_dir, area_filename(msoa))
+            pending[executor.submit(render_area_report, html, path)] = msoa
+        # A report that fails to render is not recorded, and the rest of
+        # the reports are still rendered
+        failed = []
+        while pending:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                msoa = pending.pop(future)
+                try:
+                    seconds = future.result()
+                except Exception as error:
+                    failed.append(msoa)
+                    print(f'{msoa:<24}  failed: {error!r}')
+                    continue
+                manifest[area_filename(msoa)] = version
+                save_manifest(manifest, output_dir)
+                print(f'{msoa:<24}{seconds:>8.2f}s')
+    print(f'{"total":<24}{time.perf_counter() - start:>8.2f}s')
+    if failed:
+        sys.exit(f'Failed to render {len(failed)} of {len(to_run)} reports: '
+                 f'{", ".join(failed)}')
+
+
+if __name__ == '__main__':
+    main()
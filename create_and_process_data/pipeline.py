@@ -0,0 +1,669 @@
+'''
+Create all the data used by the dashboard from the raw synthetic survey data.
+
+This replaces running the notebooks in this folder one after another. Each
+raw dataset is loaded once, the stages (create_and_process_data/stages.py)
+are run in a pool of processes - with each stage starting as soon as the
+datasets it needs are available - and the outputs are only saved once every
+stage has finished. Each output is written to a temporary file and then
+moved into place, so the dashboard never reads a partly-written file.
+
+If a stage creating data fails, nothing is saved. If a stage rendering a PDF
+report fails (e.g. as weasyprint cannot find the libraries it needs), the
+data outputs are still saved, and the pipeline then exits with an error -
+the dashboard renders any missing reports itself. Use --skip-reports to not
+render the reports at all.
+
+Only stages whose inputs have changed since they were last run are rerun. A
+manifest saved alongside the outputs records, for each output, a hash of
+every input used to create it - the raw data files, outputs of earlier
+stages, and the code of the stage (including the modules it uses from
+kailo_beewell_dashboard, such as the label dictionaries). Use --dry-run to
+see which outputs would be rebuilt and why, or --force to rebuild them all.
+
+The data for each region (dashboard/regions.py) is read from, and saved to,
+that region's folders. Choose the region with --region (default is Northern
+Devon).
+
+Run from the root of the repository:
+    python -m create_and_process_data.pipeline
+'''
+import argparse
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from dataclasses import dataclass
+import glob
+import hashlib
+import inspect
+import io
+import json
+import os
+import pickle
+import sys
+import tempfile
+import time
+
+import geopandas as gpd
+import numpy as np
+import pandas as pd
+
+from create_and_process_data import reference, stages
+from dashboard.regions import DEFAULT_REGION, REGIONS, get_region
+
+
+@dataclass(frozen=True)
+class Paths:
+    '''
+    Stores names of data and files, within the survey data and area data
+    folders of each region
+    '''
+    # Raw data
+    standard = 'standard_synthetic_data_raw.csv'
+    symbol = 'symbol_synthetic_data_raw.csv'
+    shp_nd = 'shapefile_nd/shp_nd.shp'
+    imd = 'imd2019_msoa_level_data.csv'
+
+    # Outputs
+    standard_msoa = 'standard_synthetic_data_raw_msoa.csv'
+    standard_scores = 'standard_area_aggregate_scores_rag.csv'
+    standard_area_scores = 'standard_area_scores_imd_ruc.parquet'
+    standard_responses_csv = 'standard_nd_aggregate_responses.csv'
+    standard_responses = 'standard_nd_aggregate_responses.parquet'
+    standard_demographic = 'standard_nd_aggregate_demographic.csv'
+    standard_cube = 'standard_nd_response_cube.npz'
+    symbol_responses_csv = 'symbol_nd_aggregate_responses.csv'
+    symbol_responses = 'symbol_nd_aggregate_responses.parquet'
+    symbol_demographic = 'symbol_nd_aggregate_demographic.csv'
+    overall_counts = 'nd_overall_counts.pkl'
+    standard_report = 'standard_nd_report.pdf'
+    symbol_report = 'symbol_nd_report.pdf'
+
+    # Hashes of the inputs used to create each output
+    manifest = '.pipeline_manifest.json'
+
+
+paths = Paths()
+
+# Raw datasets in the area data folder (the rest are in the survey data folder)
+AREA_DATA = ('shp_nd', 'imd')
+
+# Raw datasets from the area reference spreadsheets, read via the cache in
+# create_and_process_data/reference.py, with their name there (these cover
+# all of England, so are shared by every region)
+REFERENCE = {'ruc': 'ruc_msoa',
+             'lsoa_lookup': 'lsoa_lookup',
+             'msoa_lookup': 'msoa_lookup'}
+
+# Packages with functions used by the stages, whose code is part of the inputs
+PACKAGES = ('kailo_beewell_dashboard', 'create_and_process_data', 'dashboard')
+
+
+@dataclass(frozen=True)
+class Stage:
+    '''
+    Step of the pipeline.
+
+    Attributes
+    ----------
+    func : function
+        Function from stages.py, with an argument for each input
+    inputs : tuple
+        Names of datasets needed (raw data, or outputs of other stages)
+    outputs : tuple
+        Names of datasets created
+    na_rep : string
+        How missing values are written when outputs are saved as CSV
+    report : boolean
+        Whether the stage renders a PDF report (which the other outputs
+        are saved without, if it fails)
+    '''
+    func: object
+    inputs: tuple
+    outputs: tuple
+    na_rep: str = 'NULL'
+    report: bool = False
+
+    @property
+    def name(self):
+        return self.func.__name__
+
+
+STAGES = (
+    Stage(stages.assign_msoa, ('standard', 'shp_nd'), ('standard_msoa',),
+          na_rep=''),
+    Stage(stages.standard_scores, ('standard_msoa',), ('standard_scores',)),
+    Stage(stages.standard_area_scores,
+          ('standard_scores', 'shp_nd', 'imd', 'ruc'),
+          ('standard_area_scores',)),
+    Stage(stages.standard_responses, ('standard_msoa',),
+          ('standard_responses_csv', 'standard_responses')),
+    Stage(stages.standard_demographic, ('standard',),
+          ('standard_demographic',)),
+    Stage(stages.standard_cube, ('standard_msoa', 'standard_responses'),
+          ('standard_cube',)),
+    Stage(stages.symbol_responses, ('symbol',),
+          ('symbol_responses_csv', 'symbol_responses')),
+    Stage(stages.symbol_demographic, ('symbol',), ('symbol_demographic',)),
+    Stage(stages.overall_counts, ('standard', 'symbol'), ('overall_counts',)),
+    Stage(stages.standard_report,
+          ('overall_counts', 'standard_scores', 'standard_responses',
+           'standard_demographic'), ('standard_report',), report=True),
+    Stage(stages.symbol_report,
+          ('overall_counts', 'symbol_responses', 'symbol_demographic'),
+          ('symbol_report',), report=True),
+)
+
+# Names of datasets created by a stage (rather than raw data)
+CREATED = {name: stage for stage in STAGES for name in stage.outputs}
+
+
+def raw_files(name, region=None):
+    '''
+    Find the files for one of the raw datasets.
+
+    Parameters
+    ----------
+    name : string
+        Name of dataset - 'standard', 'symbol', 'shp_nd', 'imd', or one of
+        REFERENCE
+    region : string
+        Key of the region (from dashboard/regions.py) - default is the
+        default region
+
+    Returns
+    -------
+    list
+        Paths to files (for the shapefile, this includes every file that
+        makes up the shapefile, e.g. .shp, .dbf, .prj, and for the reference
+        data, the spreadsheets it is read from)
+    '''
+    if name in REFERENCE:
+        return reference.source_files(REFERENCE[name])
+    region = get_region(region)
+    folder = region.area_data if name in AREA_DATA else region.survey_data
+    path = os.path.join(folder, getattr(paths, name))
+    if name == 'shp_nd':
+        return sorted(glob.glob(f'{os.path.splitext(path)[0]}.*'))
+    return [path]
+
+
+def output_path(name, output_dir):
+    '''
+    Get path to an output of the pipeline.
+
+    Parameters
+    ----------
+    name : string
+        Name of dataset created by a stage
+    output_dir : string
+        Folder with outputs
+
+    Returns
+    -------
+    string
+        Path to the output
+    '''
+    return os.path.join(output_dir, getattr(paths, name))
+
+
+def load_dataset(name, output_dir, region=None):
+    '''
+    Load a raw dataset, or a previously saved output of a stage.
+
+    Parameters
+    ----------
+    name : string
+        Name of dataset
+    output_dir : string
+        Folder with outputs
+    region : string
+        Key of the region (from dashboard/regions.py) with the raw data -
+        default is the default region
+
+    Returns
+    -------
+    dataframe or dictionary
+        Dataset (for the shapefile, just the MSOA codes and names, as the
+        boundaries are not needed by any stage)
+    '''
+    if name == 'shp_nd':
+        return gpd.read_file(
+            os.path.join(get_region(region).area_data, paths.shp_nd),
+            columns=['MSOA21CD', 'MSOA21NM'], ignore_geometry=True)
+    if name in REFERENCE:
+        return reference.load_reference(REFERENCE[name])
+    if name not in CREATED:
+        return pd.read_csv(raw_files(name, region)[0])
+    path = output_path(name, output_dir)
+    if path.endswith('.csv'):
+        return pd.read_csv(path)
+    elif path.endswith('.parquet'):
+        return pd.read_parquet(path)
+    elif path.endswith('.npz'):
+        with np.load(path) as npz:
+            return {name: npz[name] for name in npz.files}
+    with open(path, 'rb') as f:
+        return pickle.load(f)
+
+
+def hash_files(files):
+    '''
+    Create hash of the content of one or more files.
+
+    Parameters
+    ----------
+    files : list
+        Paths to files
+
+    Returns
+    -------
+    string
+        SHA-256 hash
+    '''
+    sha = hashlib.sha256()
+    for path in files:
+        sha.update(os.path.basename(path).encode())
+        with open(path, 'rb') as f:
+            for chunk in iter(lambda: f.read(2**20), b''):
+                sha.update(chunk)
+    return sha.hexdigest()
+
+
+def hash_code(stage):
+    '''
+    Create hash of the code used by a stage - the stage function, any other
+    functions from stages.py that it calls, and every other module from
+    kailo_beewell_dashboard, this folder or the dashboard folder that it
+    uses (directly, or via other modules from those packages).
+
+    Parameters
+    ----------
+    stage : Stage
+        Stage of the pipeline
+
+    Returns
+    -------
+    string
+        SHA-256 hash
+    '''
+    func = stage.func
+    sources = [inspect.getsource(func)]
+    modules = {}
+    used = [func.__globals__[name] for name in func.__code__.co_names
+            if name in func.__globals__]
+    while used:
+        obj = used.pop()
+        module = inspect.getmodule(obj)
+        if module is stages and inspect.isfunction(obj) and obj is not func:
+            sources.append(inspect.getsource(obj))
+        elif (module is not None and module is not stages and
+              module.__name__.startswith(PACKAGES) and
+              module.__name__ not in modules):
+            modules[module.__name__] = module
+            used.extend(vars(module).values())
+    sources += [inspect.getsource(modules[name]) for name in sorted(modules)]
+    return hashlib.sha256('\n'.join(sources).encode()).hexdigest()
+
+
+def input_hashes(stage, output_dir, region=None):
+    '''
+    Find hashes of the current inputs to a stage.
+
+    Parameters
+    ----------
+    stage : Stage
+        Stage of the pipeline
+    output_dir : string
+        Folder with outputs (for inputs created by other stages)
+    region : string
+        Key of the region (from dashboard/regions.py) with the raw data -
+        default is the default region
+
+    Returns
+    -------
+    dictionary
+        Hash of the code ('code') and of each input dataset
+    '''
+    hashes = {'code': hash_code(stage)}
+    for name in stage.inputs:
+        if name in CREATED:
+            hashes[name] = hash_files([output_path(name, output_dir)])
+        else:
+            hashes[name] = hash_files(raw_files(name, region))
+    return hashes
+
+
+def load_manifest(output_dir):
+    '''
+    Load record of the inputs used to create each output.
+
+    Parameters
+    ----------
+    output_dir : string
+        Folder with outputs
+
+    Returns
+    -------
+    dictionary
+        Input hashes for each output filename (empty if there is no
+        manifest yet)
+    '''
+    path = os.path.join(output_dir, paths.manifest)
+    if not os.path.exists(path):
+        return {}
+    with open(path) as f:
+        return json.load(f)
+
+
+def plan_stages(output_dir, region=None, force=False, skip_reports=False):
+    '''
+    Decide which stages need to be run, by comparing the current inputs to
+    those recorded in the manifest.
+
+    Parameters
+    ----------
+    output_dir : string
+        Folder with outputs
+    region : string
+        Key of the region (from dashboard/regions.py) with the raw data -
+        default is the default region
+    force : boolean
+        Whether to run every stage regardless of whether inputs have changed
+    skip_reports : boolean
+        Whether to not run the stages rendering PDF reports
+
+    Returns
+    -------
+    plan : dictionary
+        For each stage name, the reason it needs to be run, or None if its
+        outputs are up to date
+    '''
+    manifest = load_manifest(output_dir)
+    plan = {}
+    for stage in STAGES:
+        rebuilt = [name for name in stage.inputs
+                   if name in CREATED and plan[CREATED[name].name]]
+        missing = [getattr(paths, name) for name in stage.outputs
+                   if not os.path.exists(output_path(name, output_dir))]
+        if skip_reports and stage.report:
+            plan[stage.name] = None
+        elif force:
+            plan[stage.name] = 'forced'
+        elif rebuilt:
+            plan[stage.name] = f'input rebuilt: {", ".join(rebuilt)}'
+        elif missing:
+            plan[stage.name] = f'output missing: {", ".join(missing)}'
+        else:
+            hashes = input_hashes(stage, output_dir, region)
+            previous = [manifest.get(getattr(paths, name), {})
+                        for name in stage.outputs]
+            changed = sorted({key for key, value in hashes.items()
+                              for recorded in previous
+                              if recorded.get(key) != value})
+            if changed:
+                plan[stage.name] = f'input changed: {", ".join(changed)}'
+            else:
+                plan[stage.name] = None
+    return plan
+
+
+def run_stage(stage, data, region=None):
+    '''
+    Run a stage in a worker process.
+
+    Parameters
+    ----------
+    stage : Stage
+        Stage to run
+    data : dictionary
+        Input datasets for the stage
+    region : string
+        Key of the region (from dashboard/regions.py), passed to stages
+        which use its settings (e.g. its name in the report text) - default
+        is the default region
+
+    Returns
+    -------
+    outputs : dictionary
+        Datasets created by the stage
+    seconds : float
+        Time taken
+    '''
+    start = time.perf_counter()
+    kwargs = ({'region': region}
+              if 'region' in inspect.signature(stage.func).parameters else {})
+    outputs = stage.func(*[data[name] for name in stage.inputs], **kwargs)
+    return outputs, time.perf_counter() - start
+
+
+def as_loaded(data, na_rep):
+    '''
+    Get a dataset as it will be when the saved CSV file is loaded (e.g. with
+    lists stored as strings).
+
+    Parameters
+    ----------
+    data : dataframe
+        Dataset saved as CSV
+    na_rep : string
+        Missing value representation for CSV
+
+    Returns
+    -------
+    dataframe
+        Dataset after saving to CSV and loading again
+    '''
+    buffer = io.StringIO()
+    data.to_csv(buffer, index=False, na_rep=na_rep)
+    buffer.seek(0)
+    return pd.read_csv(buffer)
+
+
+def run_stages(to_run, output_dir, region=None, workers=None):
+    '''
+    Run the chosen stages, starting each one as soon as its inputs are
+    available.
+
+    Parameters
+    ----------
+    to_run : list
+        Stages to run
+    output_dir : string
+        Folder with outputs (inputs created by stages that are not being
+        run are loaded from here)
+    region : string
+        Key of the region (from dashboard/regions.py) with the raw data -
+        default is the default region
+    workers : integer
+        Number of processes (default None, which uses the number of CPUs)
+
+    Returns
+    -------
+    datasets : dictionary
+        Every dataset used or created
+    failed : dictionary
+        Error from each stage rendering a report that failed (by stage
+        name), whose outputs are not in datasets
+    '''
+    created = {name for stage in to_run for name in stage.outputs}
+    datasets = {}
+    failed = {}
+    # Outputs saved as CSV, as later stages get them when loaded from file
+    loaded = {}
+    pending = list(to_run)
+    running = {}
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        while pending or running:
+            # Submit every stage whose inputs are ready, loading raw data
+            # (or saved outputs of stages not being run) on first use
+            for stage in list(pending):
+                if all(name in datasets or name not in created
+                       for name in stage.inputs):
+                    for name in stage.inputs:
+                        if name not in datasets:
+                            datasets[name] = load_dataset(
+                                name, output_dir, region)
+                    data = {name: loaded.get(name, datasets[name])
+                            for name in stage.inputs}
+                    running[executor.submit(
+                        run_stage, stage, data, region)] = stage
+                    pending.remove(stage)
+
+            # Wait for a stage to finish, and store its outputs (raising any
+            # error from a stage creating data, which cancels the rest of the
+            # pipeline - reports are not used by any other stage, so the
+            # pipeline carries on without a report that failed)
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                stage = running.pop(future)
+                try:
+                    outputs, seconds = future.result()
+                except Exception as error:
+                    if not stage.report:
+                        raise
+                    failed[stage.name] = error
+                    print(f'{stage.name:<24}  failed: {error!r}')
+                    continue
+                datasets.update(outputs)
+                # Pass outputs saved as CSV to later stages as they would be
+                # loaded, so results are the same whether or not the stage
+                # that created them was rerun
+                for name in outputs:
+                    if getattr(paths, name).endswith('.csv'):
+                        loaded[name] = as_loaded(outputs[name], stage.na_rep)
+                print(f'{stage.name:<24}{seconds:>8.2f}s')
+    return datasets, failed
+
+
+def write_temp(data, path, na_rep='NULL'):
+    '''
+    Save dataset to a temporary file in the same folder as its destination.
+
+    Parameters
+    ----------
+    data : dataframe, dictionary or bytes
+        Dataset to save
+    path : string
+        Destination - the extension determines the format (.csv, .parquet,
+        .json, .npz (for a dictionary of arrays), .pdf or .pkl)
+    na_rep : string
+        Missing value representation for CSV
+
+    Returns
+    -------
+    string
+        Path to the temporary file
+    '''
+    folder, filename = os.path.split(path)
+    fd, temp_path = tempfile.mkstemp(dir=folder, prefix=f'.{filename}.')
+    with os.fdopen(fd, 'wb') as f:
+        if path.endswith('.csv'):
+            data.to_csv(f, index=False, na_rep=na_rep)
+        elif path.endswith('.parquet'):
+            data.to_parquet(f, index=False)
+        elif path.endswith('.json'):
+            f.write(json.dumps(data, indent=2, sort_keys=True).encode())
+        elif path.endswith('.npz'):
+            np.savez_compressed(f, **data)
+        elif path.endswith('.pdf'):
+            f.write(data)
+        else:
+            pickle.dump(data, f)
+    # Temporary files are only readable by owner, so use usual permissions
+    os.chmod(temp_path, 0o644)
+    return temp_path
+
+
+def save_outputs(datasets, to_run, output_dir, region=None):
+    '''
+    Save the outputs of the stages that were run, replacing the existing
+    files only once all have been written, then record the inputs used to
+    create them in the manifest.
+
+    Parameters
+    ----------
+    datasets : dictionary
+        Datasets from run_stages()
+    to_run : list
+        Stages that were run
+    output_dir : string
+        Folder to save outputs to
+    region : string
+        Key of the region (from dashboard/regions.py) with the raw data -
+        default is the default region
+    '''
+    os.makedirs(output_dir, exist_ok=True)
+    temp_paths = {}
+    try:
+        for stage in to_run:
+            for name in stage.outputs:
+                path = output_path(name, output_dir)
+                temp_paths[path] = write_temp(datasets[name], path,
+                                              stage.na_rep)
+    except BaseException:
+        for temp_path in temp_paths.values():
+            os.remove(temp_path)
+        raise
+    for path, temp_path in temp_paths.items():
+        os.replace(temp_path, path)
+
+    # Record inputs (found after saving, so hashes of inputs created by
+    # other stages are for the new versions)
+    manifest = load_manifest(output_dir)
+    for stage in to_run:
+        hashes = input_hashes(stage, output_dir, region)
+        for name in stage.outputs:
+            manifest[getattr(paths, name)] = hashes
+    manifest_path = os.path.join(output_dir, paths.manifest)
+    os.replace(write_temp(manifest, manifest_path), manifest_path)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--region', default=DEFAULT_REGION,
+                        choices=REGIONS,
+                        help='Region to create the data for (default: '
+                        '%(default)s)')
+    parser.add_argument('--output-dir', default=None,
+                        help='Folder to save outputs to (default: survey '
+                        'data folder of the region)')
+    parser.add_argument('--workers', type=int, default=None,
+                        help='Number of processes (default: number of CPUs)')
+    parser.add_argument('--dry-run', action='store_true',
+                        help='Show which outputs would be rebuilt and why')
+    parser.add_argument('--force', action='store_true',
+                        help='Rebuild every output')
+    parser.add_argument('--skip-reports', action='store_true',
+                        help='Do not render the PDF reports')
+    args = parser.parse_args()
+    output_dir = args.output_dir or get_region(args.region).survey_data
+
+    start = time.perf_counter()
+    plan = plan_stages(output_dir, args.region, force=args.force,
+                       skip_reports=args.skip_reports)
+    for stage in STAGES:
+        for name in stage.outputs:
+            if args.skip_reports and stage.report:
+                reason = 'skipped'
+            else:
+                reason = plan[stage.name] or 'up to date'
+            print(f'{getattr(paths, name):<44}{reason}')
+    if args.dry_run:
+        return
+
+    to_run = [stage for stage in STAGES if plan[stage.name]]
+    failed = {}
+    if to_run:
+        print()
+        datasets, failed = run_stages(to_run, output_dir, args.region,
+                                      args.workers)
+        save_outputs(datasets, [stage for stage in to_run
+                                if stage.name not in failed],
+                     output_dir, args.region)
+    print(f'{"total":<24}{time.perf_counter() - start:>8.2f}s')
+    if failed:
+        sys.exit(f'Failed to render {", ".join(failed)} - the other '
+                 'outputs were saved')
+
+
+if __name__ == '__main__':
+    main()
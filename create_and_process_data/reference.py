@@ -0,0 +1,483 @@
+'''
+Reference data on areas in England, from the large spreadsheets in the area
+data folder - the Index of Multiple Deprivation 2019 for each LSOA
+(imd_2019_lsoa.xlsx) and the Rural Urban Classification 2011 for small area
+geographies (rural_urban_classification_2011_small_area_geographies.ods).
+
+Reading these with pd.read_excel() is slow (over a minute and a half for the
+ODS file, which holds every output area in England and Wales) and needs
+openpyxl and odfpy. Instead, each sheet is read once, by streaming through
+the XML inside the file and keeping only the columns that are declared below
+(with their types), and saved to a parquet file in a cache on disk. The
+parquet file records a hash of the spreadsheet, the declaration and the code
+of this module, so it is only read again from the spreadsheet if any of them
+have changed.
+
+The tables are combined into lookups from each LSOA to its MSOA and local
+authority, and from each MSOA to its local authority, indexed by the 2011
+codes. These are used by the data pipeline (create_and_process_data/
+pipeline.py), or can be loaded directly:
+    from create_and_process_data.reference import load_reference
+    lsoas = load_reference('lsoa_lookup')
+'''
+from dataclasses import asdict, dataclass
+import hashlib
+import json
+import os
+import re
+import tempfile
+import xml.etree.ElementTree as ET
+import zipfile
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+# Folders with the spreadsheets, and to save converted sheets to
+AREA_DATA = 'data/area_data'
+CACHE_DIR = '.cache/reference'
+
+# Key in the parquet metadata for the hashes of the source of each sheet
+METADATA_KEY = b'reference_source'
+
+# XML namespaces used in XLSX and ODS files
+XLSX = '{http://schemas.openxmlformats.org/spreadsheetml/2006/main}'
+XLSX_REL = ('{http://schemas.openxmlformats.org/officeDocument/2006/'
+            'relationships}')
+PACKAGE_REL = '{http://schemas.openxmlformats.org/package/2006/relationships}'
+ODS_TABLE = '{urn:oasis:names:tc:opendocument:xmlns:table:1.0}'
+ODS_OFFICE = '{urn:oasis:names:tc:opendocument:xmlns:office:1.0}'
+ODS_TEXT = '{urn:oasis:names:tc:opendocument:xmlns:text:1.0}'
+
+
+@dataclass(frozen=True)
+class Sheet:
+    '''
+    Table read from a sheet of one of the spreadsheets.
+
+    Attributes
+    ----------
+    file : string
+        Spreadsheet (.xlsx or .ods) in the area data folder
+    sheet : string
+        Name of sheet
+    header : integer
+        Row with the column names (from 0), with the table in the rows below
+    columns : dictionary
+        Columns kept, with their new name and type (e.g. 'int8', 'category')
+    '''
+    file: str
+    sheet: str
+    header: int
+    columns: dict
+
+
+IMD_LSOA = 'imd_2019_lsoa.xlsx'
+RUC_SMALL_AREAS = 'rural_urban_classification_2011_small_area_geographies.ods'
+
+SHEETS = {
+    'imd_lsoa': Sheet(IMD_LSOA, 'IMD2019', 0, {
+        'LSOA code (2011)': ('lsoa_code', 'str'),
+        'LSOA name (2011)': ('lsoa', 'str'),
+        'Local Authority District code (2019)': ('la_code', 'category'),
+        'Local Authority District name (2019)': ('local_authority',
+                                                 'category'),
+        'Index of Multiple Deprivation (IMD) Rank': ('imd_rank', 'int32'),
+        'Index of Multiple Deprivation (IMD) Decile': ('imd_decile', 'int8')}),
+    'ruc_lsoa': Sheet(RUC_SMALL_AREAS, 'LSOA11', 2, {
+        'Lower Super Output Area 2011 Code': ('lsoa_code', 'str'),
+        'Rural Urban Classification 2011 (10 fold)': ('ruc_class',
+                                                      'category'),
+        'Rural Urban Classification 2011 (2 fold)': ('ruc_2', 'category')}),
+    'ruc_msoa': Sheet(RUC_SMALL_AREAS, 'MSOA11', 2, {
+        'Middle Super Output Area 2011 Code': ('msoa_code', 'str'),
+        'Middle Super Output Area 2011 Name': ('msoa', 'str'),
+        'Rural Urban Classification 2011 (10 fold)': ('ruc_class',
+                                                      'category'),
+        'Rural Urban Classification 2011 (2 fold)': ('ruc_2', 'category')})}
+
+# Sheets combined to make each lookup
+LOOKUPS = {'lsoa_lookup': ('imd_lsoa', 'ruc_lsoa', 'ruc_msoa'),
+           'msoa_lookup': ('imd_lsoa', 'ruc_lsoa', 'ruc_msoa')}
+
+
+def column_index(ref):
+    '''
+    Get the position of the column of a cell in an XLSX sheet.
+
+    Parameters
+    ----------
+    ref : string
+        Cell reference (e.g. 'AB12')
+
+    Returns
+    -------
+    integer
+        Position of the column, from 0
+    '''
+    index = 0
+    for letter in re.match('[A-Z]+', ref).group():
+        index = index * 26 + ord(letter) - ord('A') + 1
+    return index - 1
+
+
+def iter_xlsx_rows(path, sheet):
+    '''
+    Read the rows of a sheet of an XLSX file, one at a time.
+
+    Parameters
+    ----------
+    path : string
+        Path to the file
+    sheet : string
+        Name of sheet
+
+    Yields
+    ------
+    list
+        Value of each cell in the row (string, float, or None if empty)
+    '''
+    with zipfile.ZipFile(path) as xlsx:
+        # Find the file with the sheet
+        workbook = ET.fromstring(xlsx.read('xl/workbook.xml'))
+        rel_id = next(el.get(f'{XLSX_REL}id')
+                      for el in workbook.iter(f'{XLSX}sheet')
+                      if el.get('name') == sheet)
+        rels = ET.fromstring(xlsx.read('xl/_rels/workbook.xml.rels'))
+        target = next(el.get('Target')
+                      for el in rels.iter(f'{PACKAGE_REL}Relationship')
+                      if el.get('Id') == rel_id)
+
+        # Text is stored once for the whole workbook, and given by position
+        shared = []
+        if 'xl/sharedStrings.xml' in xlsx.namelist():
+            with xlsx.open('xl/sharedStrings.xml') as f:
+                for _, el in ET.iterparse(f):
+                    if el.tag == f'{XLSX}si':
+                        shared.append(''.join(
+                            t.text or '' for t in el.iter(f'{XLSX}t')))
+                        el.clear()
+
+        with xlsx.open(f'xl/{target.lstrip("/").removeprefix("xl/")}') as f:
+            for _, el in ET.iterparse(f):
+                if el.tag != f'{XLSX}row':
+                    continue
+                # Empty cells are left out, so place each by its reference
+                row = []
+                for cell in el.iter(f'{XLSX}c'):
+                    cell_type = cell.get('t')
+                    if cell_type == 'inlineStr':
+                        value = ''.join(t.text or ''
+                                        for t in cell.iter(f'{XLSX}t'))
+                    else:
+                        value = cell.findtext(f'{XLSX}v')
+                        if value is None:
+                            continue
+                        if cell_type == 's':
+                            value = shared[int(value)]
+                        elif cell_type not in ('str', 'e'):
+                            value = float(value)
+                    index = column_index(cell.get('r'))
+                    row.extend([None] * (index + 1 - len(row)))
+                    row[index] = value
+                yield row
+                el.clear()
+
+
+def iter_ods_rows(path, sheet):
+    '''
+    Read the rows of a sheet of an ODS file, one at a time.
+
+    Parameters
+    ----------
+    path : string
+        Path to the file
+    sheet : string
+        Name of sheet
+
+    Yields
+    ------
+    list
+        Value of each cell in the row (string, float, or None if empty)
+    '''
+    in_sheet = False
+    with zipfile.ZipFile(path) as ods, ods.open('content.xml') as f:
+        for event, el in ET.iterparse(f, events=('start', 'end')):
+            if el.tag == f'{ODS_TABLE}table':
+                if event == 'start':
+                    in_sheet = el.get(f'{ODS_TABLE}name') == sheet
+                elif in_sheet:
+                    # Later sheets are not needed
+                    return
+                else:
+                    el.clear()
+            elif (event == 'end' and in_sheet and
+                  el.tag == f'{ODS_TABLE}table-row'):
+                row = []
+                # Identical cells next to each other are stored once, with
+                # the number of repeats - empty cells are only added before
+                # a cell with a value, as the last cell of each row is
+                # usually repeated up to the last column of the sheet
+                empty = 0
+                for cell in el:
+                    if cell.tag not in (f'{ODS_TABLE}table-cell',
+                                        f'{ODS_TABLE}covered-table-cell'):
+                        continue
+                    repeat = int(cell.get(
+                        f'{ODS_TABLE}number-columns-repeated', 1))
+                    value_type = cell.get(f'{ODS_OFFICE}value-type')
+                    if value_type is None:
+                        empty += repeat
+                        continue
+                    if value_type in ('float', 'percentage', 'currency'):
+                        value = float(cell.get(f'{ODS_OFFICE}value'))
+                    else:
+                        value = '\n'.join(''.join(p.itertext())
+                                          for p in cell.iter(f'{ODS_TEXT}p'))
+                    row.extend([None] * empty + [value] * repeat)
+                    empty = 0
+                yield row
+                el.clear()
+            elif event == 'end' and not in_sheet:
+                el.clear()
+
+
+def read_sheet(spec):
+    '''
+    Read the declared columns of a sheet from the spreadsheet.
+
+    Parameters
+    ----------
+    spec : Sheet
+        Sheet to read
+
+    Returns
+    -------
+    dataframe
+        Table, with the new column names and types, non-breaking spaces in
+        text replaced by spaces, and spaces at the start and end removed
+    '''
+    path = os.path.join(AREA_DATA, spec.file)
+    iter_rows = iter_ods_rows if path.endswith('.ods') else iter_xlsx_rows
+    rows = iter_rows(path, spec.sheet)
+    for _ in range(spec.header):
+        next(rows)
+    header = [value.strip() if isinstance(value, str) else value
+              for value in next(rows)]
+    missing = [col for col in spec.columns if col not in header]
+    if missing:
+        raise ValueError(f'Columns not found in sheet {spec.sheet} of '
+                         f'{spec.file}: {", ".join(missing)}')
+    positions = [header.index(col) for col in spec.columns]
+
+    values = {col: [] for col in spec.columns}
+    for row in rows:
+        row = [row[i] if i < len(row) else None for i in positions]
+        # Stop at the first empty row, after the end of the table
+        if all(value is None or value == '' for value in row):
+            break
+        for col, value in zip(spec.columns, row):
+            if isinstance(value, str):
+                value = value.replace('\xa0', ' ').strip()
+            values[col].append(value)
+
+    return pd.DataFrame({
+        name: pd.Series(values[col], dtype=object).astype(dtype)
+        for col, (name, dtype) in spec.columns.items()})
+
+
+def source_hashes(spec):
+    '''
+    Create hashes of the spreadsheet and declaration of a sheet, and of the
+    code that reads it, which are stored with the converted sheet in the
+    cache.
+
+    Parameters
+    ----------
+    spec : Sheet
+        Sheet
+
+    Returns
+    -------
+    dictionary
+        SHA-256 hash of the spreadsheet ('file'), the declaration ('sheet')
+        and this module ('code')
+    '''
+    sha = hashlib.sha256()
+    with open(os.path.join(AREA_DATA, spec.file), 'rb') as f:
+        for chunk in iter(lambda: f.read(2**20), b''):
+            sha.update(chunk)
+    declaration = json.dumps(asdict(spec), sort_keys=True).encode()
+    with open(__file__, 'rb') as f:
+        code = f.read()
+    return {'file': sha.hexdigest(),
+            'sheet': hashlib.sha256(declaration).hexdigest(),
+            'code': hashlib.sha256(code).hexdigest()}
+
+
+def cache_path(name):
+    '''
+    Get path to the converted sheet in the cache.
+
+    Parameters
+    ----------
+    name : string
+        Name of sheet, from SHEETS
+
+    Returns
+    -------
+    string
+        Path (the file may not have been created yet)
+    '''
+    return os.path.join(CACHE_DIR, f'{name}.parquet')
+
+
+def load_sheet(name):
+    '''
+    Load a sheet from the cache, first converting it from the spreadsheet if
+    it has not been converted, or if the spreadsheet, declaration or code
+    have changed since it was.
+
+    Parameters
+    ----------
+    name : string
+        Name of sheet, from SHEETS
+
+    Returns
+    -------
+    dataframe
+        Table from the sheet
+    '''
+    spec = SHEETS[name]
+    hashes = source_hashes(spec)
+    path = cache_path(name)
+    if os.path.exists(path):
+        metadata = pq.read_schema(path).metadata or {}
+        if json.loads(metadata.get(METADATA_KEY, b'{}')) == hashes:
+            return pd.read_parquet(path)
+
+    data = read_sheet(spec)
+    table = pa.Table.from_pandas(data, preserve_index=False)
+    table = table.replace_schema_metadata(
+        {**table.schema.metadata, METADATA_KEY: json.dumps(hashes)})
+
+    # Write to temporary file, then move into place, so a partly-written
+    # file is never used
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    fd, temp_path = tempfile.mkstemp(dir=CACHE_DIR, suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            pq.write_table(table, f)
+        os.chmod(temp_path, 0o644)
+        os.replace(temp_path, path)
+    except BaseException:
+        os.remove(temp_path)
+        raise
+    return data
+
+
+def create_lsoa_lookup(imd_lsoa, ruc_lsoa, ruc_msoa):
+    '''
+    Create lookup from each LSOA in England to its MSOA and local authority,
+    with its deprivation and rurality.
+
+    The MSOA is found from the LSOA name, which is the name of the MSOA with
+    a letter added (e.g. 'North Devon 001A' is in 'North Devon 001').
+
+    Parameters
+    ----------
+    imd_lsoa : dataframe
+        Index of Multiple Deprivation 2019 for each LSOA (from SHEETS)
+    ruc_lsoa : dataframe
+        Rural Urban Classification 2011 for each LSOA
+    ruc_msoa : dataframe
+        Rural Urban Classification 2011 for each MSOA
+
+    Returns
+    -------
+    dataframe
+        Lookup indexed by the 2011 LSOA code
+    '''
+    lsoas = imd_lsoa.merge(ruc_lsoa, on='lsoa_code', how='left',
+                           validate='one_to_one')
+    lsoas['msoa'] = lsoas['lsoa'].str[:-1]
+    lsoas = lsoas.merge(ruc_msoa[['msoa_code', 'msoa']], on='msoa',
+                        how='left', validate='many_to_one')
+    missing = lsoas.loc[lsoas[['msoa_code', 'ruc_class']].isna().any(axis=1),
+                        'lsoa']
+    if len(missing) > 0:
+        raise ValueError('No MSOA or rurality found for LSOAs: '
+                         f'{", ".join(missing)}')
+    return lsoas.set_index('lsoa_code')[
+        ['lsoa', 'msoa_code', 'msoa', 'la_code', 'local_authority',
+         'imd_rank', 'imd_decile', 'ruc_class', 'ruc_2']]
+
+
+def create_msoa_lookup(lsoa_lookup):
+    '''
+    Create lookup from each MSOA in England to its local authority.
+
+    Parameters
+    ----------
+    lsoa_lookup : dataframe
+        Lookup for each LSOA, from create_lsoa_lookup()
+
+    Returns
+    -------
+    dataframe
+        Lookup indexed by the 2011 MSOA code, with the number of LSOAs in
+        each MSOA
+    '''
+    msoas = lsoa_lookup.groupby('msoa_code', observed=True).agg(
+        msoa=('msoa', 'first'),
+        la_code=('la_code', 'first'),
+        local_authority=('local_authority', 'first'),
+        la_count=('la_code', 'nunique'),
+        lsoas=('lsoa', 'size'))
+    split = msoas.index[msoas['la_count'] > 1]
+    if len(split) > 0:
+        raise ValueError('MSOAs in more than one local authority: '
+                         f'{", ".join(split)}')
+    return msoas.drop(columns='la_count')
+
+
+def source_files(name):
+    '''
+    Find the spreadsheets used for a sheet or lookup.
+
+    Parameters
+    ----------
+    name : string
+        Name of sheet (from SHEETS) or lookup (from LOOKUPS)
+
+    Returns
+    -------
+    list
+        Paths to the spreadsheets
+    '''
+    sheets = LOOKUPS.get(name, (name,))
+    return sorted({os.path.join(AREA_DATA, SHEETS[sheet].file)
+                   for sheet in sheets})
+
+
+def load_reference(name):
+    '''
+    Load a sheet or lookup.
+
+    Parameters
+    ----------
+    name : string
+        Name of sheet (from SHEETS) or lookup (from LOOKUPS)
+
+    Returns
+    -------
+    dataframe
+        Table from the sheet, or lookup
+    '''
+    if name not in LOOKUPS:
+        return load_sheet(name)
+    lsoa_lookup = create_lsoa_lookup(
+        *[load_sheet(sheet) for sheet in LOOKUPS[name]])
+    if name == 'msoa_lookup':
+        return create_msoa_lookup(lsoa_lookup)
+    return lsoa_lookup
@@ -0,0 +1,187 @@
+'''
+Create simplified MSOA boundaries for the dashboard maps.
+
+The boundaries are embedded in every choropleth sent to the browser, so this
+reduces them to the detail needed at the zoom levels used on the dashboard:
+
+* Geometries are simplified as a coverage, so neighbouring MSOAs keep shared
+boundaries (no gaps or overlaps are introduced between them)
+* Coordinates are rounded to a set number of decimal places
+* Only the MSOA name is kept (as 'MSOA11NM', which the maps use as the
+featureidkey)
+
+It then reports the size of the map payload and the time taken to create and
+serialise a map, with the original and the simplified boundaries.
+
+The boundaries are read from, and saved to, the area data folder of the
+region chosen with --region (default is Northern Devon - see
+dashboard/regions.py).
+
+Run from the root of the repository:
+    python -m create_and_process_data.simplify_geometry
+'''
+import argparse
+from dataclasses import dataclass
+import json
+import os
+import time
+
+import geopandas as gpd
+import plotly.io as pio
+import shapely
+
+from dashboard.data import load_standard_scores
+from dashboard.regions import DEFAULT_REGION, REGIONS, get_region
+
+
+@dataclass(frozen=True)
+class Paths:
+    '''Stores paths to files, within the area data folder of each region'''
+    shp_nd = 'shapefile_nd/shp_nd.shp'
+    original = 'geojson/combined_nd.geojson'
+    simplified = 'geojson/msoa_nd_simplified.geojson'
+
+
+paths = Paths()
+
+
+def round_coords(coords, precision):
+    '''
+    Round nested lists of coordinates to the chosen number of decimal places.
+
+    Parameters
+    ----------
+    coords : list or tuple
+        Coordinates from a GeoJSON geometry (nested to any depth)
+    precision : integer
+        Number of decimal places
+
+    Returns
+    -------
+    list
+        Rounded coordinates
+    '''
+    if isinstance(coords[0], (float, int)):
+        return [round(value, precision) for value in coords]
+    return [round_coords(part, precision) for part in coords]
+
+
+def simplify_msoas(shp, name_col='MSOA21NM', tolerance=50, precision=4):
+    '''
+    Simplify MSOA boundaries and convert to compact GeoJSON.
+
+    Parameters
+    ----------
+    shp : geodataframe
+        MSOA boundaries in a projected coordinate system with units of metres
+        (e.g. British National Grid, as in the ONS shapefiles)
+    name_col : string
+        Column with the MSOA names
+    tolerance : float
+        Simplification tolerance in metres - roughly, how far a removed
+        vertex can be from the simplified boundary
+    precision : integer
+        Number of decimal places to keep for longitude and latitude (4 is
+        roughly 10 metres)
+
+    Returns
+    -------
+    geojson : dictionary
+        FeatureCollection with the simplified boundaries in WGS84
+    '''
+    # Simplify as a coverage, which preserves the boundaries shared between
+    # neighbouring MSOAs
+    simplified = shapely.coverage_simplify(shp.geometry.values, tolerance)
+    shp = shp[[name_col]].set_geometry(
+        gpd.GeoSeries(simplified, index=shp.index, crs=shp.crs))
+
+    # Convert to longitude and latitude, as required by the maps, then snap
+    # to the chosen precision (which, unlike just rounding the coordinates,
+    # repairs any self-intersections this would create)
+    shp = shp.to_crs(epsg=4326)
+    shp.geometry = shapely.set_precision(shp.geometry.values, 10**-precision)
+
+    features = []
+    for name, geometry in zip(shp[name_col], shp.geometry):
+        geometry = shapely.geometry.mapping(geometry)
+        features.append({
+            'type': 'Feature',
+            'properties': {'MSOA11NM': name},
+            'geometry': {
+                'type': geometry['type'],
+                'coordinates': round_coords(geometry['coordinates'],
+                                            precision)}})
+    return {'type': 'FeatureCollection', 'features': features}
+
+
+def time_map(geojson, region=None, repeats=5):
+    '''
+    Time creation and serialisation of an area map with the given
+    boundaries (as done by the dashboard for the first view of a topic).
+
+    Parameters
+    ----------
+    geojson : dictionary
+        MSOA boundaries
+    region : string
+        Key of the region (from dashboard/regions.py) - default is the
+        default region
+    repeats : integer
+        Number of times to repeat, with the mean time returned
+
+    Returns
+    -------
+    seconds : float
+        Mean time to create and serialise the map
+    payload : integer
+        Size of the serialised map in bytes
+    '''
+    # Imported here as the maps module imports streamlit
+    from dashboard.maps import create_area_map
+
+    df_scores = load_standard_scores(region)
+    topic_lab = df_scores['variable_lab'].iloc[0]
+    start = time.perf_counter()
+    for _ in range(repeats):
+        fig = create_area_map(df_scores, geojson, topic_lab,
+                              get_region(region))
+        spec = pio.to_json(fig.to_dict(), validate=False)
+    seconds = (time.perf_counter() - start) / repeats
+    return seconds, len(spec)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--region', default=DEFAULT_REGION,
+                        choices=REGIONS,
+                        help='Region to simplify the boundaries for '
+                        '(default: %(default)s)')
+    parser.add_argument('--tolerance', type=float, default=50,
+                        help='Simplification tolerance in metres')
+    parser.add_argument('--precision', type=int, default=4,
+                        help='Decimal places for longitude and latitude')
+    args = parser.parse_args()
+
+    # Simplify the shapefile of the region and save compact GeoJSON
+    area_data = get_region(args.region).area_data
+    shp = gpd.read_file(os.path.join(area_data, paths.shp_nd))
+    geojson = simplify_msoas(shp, tolerance=args.tolerance,
+                             precision=args.precision)
+    simplified_path = os.path.join(area_data, paths.simplified)
+    with open(simplified_path, 'w') as f:
+        json.dump(geojson, f, separators=(',', ':'))
+
+    # Compare with the original GeoJSON
+    original_path = os.path.join(area_data, paths.original)
+    with open(original_path) as f:
+        original = json.load(f)
+    print(f'{"":<12}{"file KB":>10}{"map KB":>10}{"map seconds":>14}')
+    for label, path, data in [('original', original_path, original),
+                              ('simplified', simplified_path, geojson)]:
+        seconds, payload = time_map(data, args.region)
+        print(f'{label:<12}{os.path.getsize(path)/1e3:>10.1f}'
+              f'{payload/1e3:>10.1f}{seconds:>14.3f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,480 @@
+'''
+Stages of the data pipeline (create_and_process_data/pipeline.py), each
+equivalent to one of the notebooks in this folder. Each function takes the
+input datasets as arguments and returns a dictionary of the datasets it
+creates, with keys matching the dataset names in the pipeline. Stages which
+use the settings of the region (e.g. its name) also take the key of the
+region, as the 'region' argument.
+'''
+import random
+
+from kailo_beewell_dashboard.response_labels import (
+    create_response_label_dict, create_symbol_response_label_dict)
+from kailo_beewell_dashboard.synthesise_aggregate import (
+    aggregate_proportions)
+from kailo_beewell_dashboard.synthesise_demographic import (
+    add_standard_demographic_groups,
+    add_standard_demographic_response_labels,
+    add_symbol_demographic_response_labels)
+from kailo_beewell_dashboard.synthesise_responses import (
+    add_standard_response_labels, add_standard_topic_groups,
+    add_symbol_response_labels, aggregate_standard_responses,
+    aggregate_symbol_responses)
+from kailo_beewell_dashboard.topic_labels import (
+    topic_name_dict, topic_description_dict)
+import numpy as np
+import pandas as pd
+
+from create_and_process_data.aggregate import (
+    aggregate_scores_by_site_and_group, create_rag_ratings)
+from dashboard.cube import create_cube
+from dashboard.regions import get_region
+from dashboard.reports import create_pdf
+
+# MSOAs set to n<10 in the synthetic scores, to demonstrate how these appear
+SMALL_MSOAS = ['North Devon 013', 'North Devon 014', 'Torridge 007']
+
+# Columns used from the Index of Multiple Deprivation 2019 (for 2011 MSOAs),
+# with their new names
+IMD_COLUMNS = {'MSOAC': 'msoa_code',
+               'MSOADECILE': 'imd_decile',
+               'MSOAQUINTILE': 'imd_quintile'}
+
+# Groups of each area characteristic, in order (IMD runs from the most
+# deprived, 1, to the least deprived). IMD groups are stored as strings, as
+# categories of integers are read back from parquet as integers.
+AREA_CATEGORIES = {
+    'imd_quintile': [str(group) for group in range(1, 6)],
+    'imd_decile': [str(group) for group in range(1, 11)],
+    'ruc_2': ['Urban', 'Rural'],
+    'ruc_class': ['Urban major conurbation',
+                  'Urban minor conurbation',
+                  'Urban city and town',
+                  'Urban city and town in a sparse setting',
+                  'Rural town and fringe',
+                  'Rural town and fringe in a sparse setting',
+                  'Rural village and dispersed',
+                  'Rural village and dispersed in a sparse setting']}
+
+
+def assign_msoa(standard, shp_nd):
+    '''
+    Add a random MSOA for each pupil in the synthetic standard survey data
+    (1_modify_synthetic_data.ipynb).
+
+    Parameters
+    ----------
+    standard : dataframe
+        Pupil-level standard survey responses
+    shp_nd : dataframe
+        MSOAs in the region (only the 'MSOA21NM' column is used)
+
+    Returns
+    -------
+    dictionary
+        Pupil-level responses with 'msoa' column
+    '''
+    standard = standard.copy()
+
+    # Randomly choose an MSOA for each pupil
+    random.seed(42)
+    standard['msoa'] = random.choices(list(shp_nd['MSOA21NM']),
+                                      k=len(standard.index))
+
+    # Randomly drop a few (seeded, unlike the notebook, so reruns match)
+    standard['msoa'] = standard['msoa'].sample(n=len(standard) - 25,
+                                               random_state=42)
+
+    return {'standard_msoa': standard}
+
+
+def standard_scores(standard_msoa):
+    '''
+    Find the mean score for each topic in each MSOA, then add RAG ratings
+    (standard/2_aggregate_scores.ipynb).
+
+    Parameters
+    ----------
+    standard_msoa : dataframe
+        Pupil-level standard survey responses with 'msoa' column
+
+    Returns
+    -------
+    dictionary
+        Aggregate scores with RAG ratings
+    '''
+    # Aggregate for each MSOA, hiding results when n<10
+    agg = aggregate_scores_by_site_and_group(
+        standard_msoa, group_type='none', site_col='msoa', min_count=10)
+
+    # Set some MSOA to n<10
+    agg.loc[agg['msoa'].isin(SMALL_MSOAS), ['mean', 'count']] = np.nan
+
+    # Add RAG ratings
+    rag = create_rag_ratings(agg)
+
+    # Add names and descriptions for the topics
+    rag['variable_lab'] = rag['variable'].map(topic_name_dict)
+    rag['description'] = rag['variable'].map(topic_description_dict)
+
+    return {'standard_scores': rag}
+
+
+def standard_area_scores(standard_scores, shp_nd, imd, ruc):
+    '''
+    Add the deprivation (IMD 2019 decile and quintile) and rurality (Rural
+    Urban Classification 2011) of each MSOA to the scores, as ordered
+    categorical columns (matched_msoas.ipynb).
+
+    The scores use 2021 MSOAs, and the IMD and classification use 2011
+    MSOAs. These are matched on the MSOA code (from the 2021 boundaries)
+    rather than the name, as MSOAs whose boundaries did not change in 2021
+    kept their 2011 code, even where their name changed. MSOAs which were
+    split or merged in 2021 have new codes, and would need a lookup from
+    2011 to 2021 MSOAs (which is not in the area data) - so this only
+    supports regions where no MSOA changed, such as Northern Devon, and
+    raises an error naming any changed MSOAs.
+
+    Parameters
+    ----------
+    standard_scores : dataframe
+        Aggregate scores with RAG ratings
+    shp_nd : dataframe
+        MSOAs in the region, with their 2021 codes ('MSOA21CD') and names
+        ('MSOA21NM')
+    imd : dataframe
+        Index of Multiple Deprivation 2019 for every MSOA in England
+    ruc : dataframe
+        Rural Urban Classification 2011 for every MSOA in England and Wales
+        (from create_and_process_data/reference.py)
+
+    Returns
+    -------
+    dictionary
+        Aggregate scores with RAG ratings and area characteristics
+    '''
+    codes = shp_nd.rename(columns={'MSOA21NM': 'msoa',
+                                   'MSOA21CD': 'msoa_code'})
+    codes = codes.loc[codes['msoa'].isin(standard_scores['msoa']),
+                      ['msoa', 'msoa_code']]
+    changed = codes.loc[~codes['msoa_code'].isin(ruc['msoa_code']), 'msoa']
+    if len(changed) > 0:
+        raise ValueError('No 2011 MSOA with the same code (as split or '
+                         'merged in 2021, which needs a lookup from 2011 '
+                         f'to 2021 MSOAs) for MSOAs: {", ".join(changed)}')
+
+    imd = imd.rename(columns=IMD_COLUMNS)[list(IMD_COLUMNS.values())]
+    areas = (codes
+             .merge(ruc.drop(columns='msoa'), on='msoa_code', how='left',
+                    validate='one_to_one')
+             .merge(imd, on='msoa_code', how='left', validate='one_to_one'))
+    scores = standard_scores.merge(areas.drop(columns='msoa_code'),
+                                   on='msoa', how='left',
+                                   validate='many_to_one')
+
+    for col in ['imd_decile', 'imd_quintile']:
+        scores[col] = scores[col].astype('Int64').astype(str)
+    scores = scores.astype({
+        col: pd.CategoricalDtype(categories, ordered=True)
+        for col, categories in AREA_CATEGORIES.items()})
+
+    # MSOAs without a match, or with a group that is not one of the
+    # categories, are missing
+    missing = scores.loc[scores[list(AREA_CATEGORIES)].isna().any(axis=1),
+                         'msoa'].unique()
+    if len(missing) > 0:
+        raise ValueError('No deprivation or rurality found for MSOAs: '
+                         f'{", ".join(missing)}')
+    return {'standard_area_scores': scores}
+
+
+def standard_responses(standard_msoa, region=None):
+    '''
+    Find the proportion giving each response to each question
+    (standard/3_aggregate_responses.ipynb).
+
+    Parameters
+    ----------
+    standard_msoa : dataframe
+        Pupil-level standard survey responses
+    region : string
+        Key of the region (from dashboard/regions.py) - default is the
+        default region
+
+    Returns
+    -------
+    dictionary
+        Aggregate responses, saved as both CSV and parquet
+    '''
+    # Aggregate for the whole region
+    data = standard_msoa.assign(site=get_region(region).name)
+    result = aggregate_standard_responses(df=data, site_col='site')
+
+    # Add groups and labels for each measure
+    result = add_standard_topic_groups(result)
+    result = add_standard_response_labels(result)
+
+    return {'standard_responses_csv': result,
+            'standard_responses': result}
+
+
+def standard_cube(standard_msoa, standard_responses):
+    '''
+    Count the pupils giving each response to each question for every
+    combination of year group, gender, FSM and SEN, so results can be viewed
+    for any combination of characteristics (dashboard/cube.py).
+
+    Parameters
+    ----------
+    standard_msoa : dataframe
+        Pupil-level standard survey responses
+    standard_responses : dataframe
+        Aggregate responses, with the questions and response categories
+
+    Returns
+    -------
+    dictionary
+        Cube of responses, saved as compressed numpy arrays
+    '''
+    return {'standard_cube': create_cube(standard_msoa, standard_responses)}
+
+
+def drop_n_true(boolean_list, n):
+    '''
+    Drop specified number of 'True' from a list of booleans.
+
+    Parameters
+    ----------
+    boolean_list : list
+        List of True and False values
+    n : integer
+        Number of True to be replaced with False
+
+    Returns
+    -------
+    boolean_list : list
+        Modified list of booleans
+    '''
+    counter = 0
+    to_remove = sum(boolean_list) - n
+    # Loop through values of list
+    for i in range(len(boolean_list)):
+        # If list item is True
+        if boolean_list[i]:
+            # Increment counter, and set to False if counter is greater than n
+            counter += 1
+            if counter > to_remove:
+                boolean_list[i] = False
+    return boolean_list
+
+
+def standard_demographic(standard):
+    '''
+    Find the proportion giving each response to each demographic question
+    (standard/4_aggregate_demographics.ipynb).
+
+    Parameters
+    ----------
+    standard : dataframe
+        Pupil-level standard survey responses
+
+    Returns
+    -------
+    dictionary
+        Aggregate demographics
+    '''
+    data = standard.copy()
+
+    # Modify some responses to be n<10
+    # Keep 5 responses for category 3
+    mask = (data['school'] == 1) & (data['transgender'] == 3)
+    mask = drop_n_true(mask, 5)
+    data.loc[mask, 'transgender'] = np.nan
+    # Keep 1 response for category 4
+    mask = (data['school'] == 1) & (data['transgender'] == 4)
+    mask = drop_n_true(mask, 1)
+    data.loc[mask, 'transgender'] = np.nan
+    # Remove all responses for category 5
+    mask = (data['school'] == 1) & (data['transgender'] == 5)
+    data.loc[mask, 'transgender'] = np.nan
+
+    # Make list of columns that we want to gather responses from
+    survey_col = ['gender', 'transgender', 'sexual_orientation',
+                  'neurodivergent', 'birth_parent1', 'birth_parent2',
+                  'birth_you', 'young_carer', 'care_experience']
+    council_col = ['year_group', 'fsm', 'sen', 'ethnicity',
+                   'english_additional']
+    response_col = survey_col + council_col
+
+    # Import dictionary which has response options for each variable, adding
+    # 'NaN': 'No response' for survey columns, and 'NaN': 'No data' for the
+    # council columns
+    labels = create_response_label_dict()
+    for col in survey_col:
+        labels[col].update({np.nan: 'No response'})
+    for col in council_col:
+        labels[col].update({np.nan: 'No data'})
+
+    # Aggregate whole dataframe for each of the response col provided
+    result = aggregate_proportions(data=data, response_col=response_col,
+                                   labels=labels, hide_low_response=True)
+
+    # Add labels and groups
+    result = add_standard_demographic_groups(result)
+    result = add_standard_demographic_response_labels(result)
+
+    return {'standard_demographic': result}
+
+
+def symbol_responses(symbol, region=None):
+    '''
+    Find the proportion giving each response to each question
+    (symbol/1_aggregate_responses.ipynb).
+
+    Parameters
+    ----------
+    symbol : dataframe
+        Pupil-level symbol survey responses
+    region : string
+        Key of the region (from dashboard/regions.py) - default is the
+        default region
+
+    Returns
+    -------
+    dictionary
+        Aggregate responses, saved as both CSV and parquet
+    '''
+    # Aggregate for the whole region
+    data = symbol.assign(site=get_region(region).name)
+    result = aggregate_symbol_responses(df=data, site_col='site')
+
+    # Add labels for each measure
+    result = add_symbol_response_labels(result)
+
+    return {'symbol_responses_csv': result,
+            'symbol_responses': result}
+
+
+def symbol_demographic(symbol):
+    '''
+    Find the proportion giving each response to each demographic question
+    (symbol/2_aggregate_demographics.ipynb).
+
+    Parameters
+    ----------
+    symbol : dataframe
+        Pupil-level symbol survey responses
+
+    Returns
+    -------
+    dictionary
+        Aggregate demographics
+    '''
+    # Make list of demographic columns
+    response_col = ['gender', 'year_group', 'fsm', 'sen', 'ethnicity',
+                    'english_additional']
+
+    # Import dictionary which has response options for each variable, adding
+    # 'NaN': 'No data'
+    labels = create_symbol_response_label_dict()
+    for col in response_col:
+        labels[col].update({np.nan: 'No data'})
+
+    # Aggregate whole dataframe for each of the response col provided
+    result = aggregate_proportions(data=symbol, response_col=response_col,
+                                   labels=labels, hide_low_response=True)
+
+    # Add labels for each measure
+    result = add_symbol_demographic_response_labels(result)
+
+    return {'symbol_demographic': result}
+
+
+def overall_counts(standard, symbol):
+    '''
+    Count the pupils and schools that took part in each survey
+    (overall_counts.ipynb).
+
+    Parameters
+    ----------
+    standard : dataframe
+        Pupil-level standard survey responses
+    symbol : dataframe
+        Pupil-level symbol survey responses
+
+    Returns
+    -------
+    dictionary
+        Dictionary of counts
+    '''
+    counts = {
+        'standard_pupils': len(standard),
+        'standard_schools': len(standard.school_lab.unique()),
+        'symbol_pupils': len(symbol),
+        'symbol_schools': len(symbol.school_lab.unique())}
+    counts['total_pupils'] = (counts['standard_pupils'] +
+                              counts['symbol_pupils'])
+    counts['total_schools'] = (counts['standard_schools'] +
+                               counts['symbol_schools'])
+    return {'overall_counts': counts}
+
+
+def standard_report(overall_counts, standard_scores, standard_responses,
+                    standard_demographic, region=None):
+    '''
+    Render the standard survey PDF report, so the dashboard can serve it
+    without rendering it.
+
+    Parameters
+    ----------
+    overall_counts : dictionary
+        Counts of pupils and schools
+    standard_scores : dataframe
+        Aggregate scores with RAG ratings
+    standard_responses : dataframe
+        Aggregate responses
+    standard_demographic : dataframe
+        Aggregate demographics
+    region : string
+        Key of the region (from dashboard/regions.py) - default is the
+        default region
+
+    Returns
+    -------
+    dictionary
+        PDF report
+    '''
+    return {'standard_report': create_pdf('standard', {
+        'overall_counts': overall_counts,
+        'standard_scores': standard_scores,
+        'standard_responses': standard_responses,
+        'standard_demographic': standard_demographic}, region=region)}
+
+
+def symbol_report(overall_counts, symbol_responses, symbol_demographic,
+                  region=None):
+    '''
+    Render the symbol survey PDF report, so the dashboard can serve it
+    without rendering it.
+
+    Parameters
+    ----------
+    overall_counts : dictionary
+        Counts of pupils and schools
+    symbol_responses : dataframe
+        Aggregate responses
+    symbol_demographic : dataframe
+        Aggregate demographics
+    region : string
+        Key of the region (from dashboard/regions.py) - default is the
+        default region
+
+    Returns
+    -------
+    dictionary
+        PDF report
+    '''
+    return {'symbol_report': create_pdf('symbol', {
+        'overall_counts': overall_counts,
+        'symbol_responses': symbol_responses,
+        'symbol_demographic': symbol_demographic}, region=region)}
@@ -0,0 +1,4 @@
+'''
+Helpers specific to the synthetic Northern Devon public dashboard, used
+alongside the shared kailo_beewell_dashboard package.
+'''
@@ -0,0 +1,94 @@
+'''
+Chart of the topic RAG ratings of the MSOAs grouped by deprivation (Index of
+Multiple Deprivation 2019) or rurality (Rural Urban Classification 2011).
+
+The deprivation and rurality of each MSOA are joined onto the scores once by
+the data pipeline (standard_area_scores() in
+create_and_process_data/stages.py), and stored as categorical columns. When
+the scores are loaded, the number of MSOAs with each rating is counted once
+for every grouping and topic (create_area_rag_counts() in dashboard/rag.py),
+so the page only selects from these counts and does not merge or group any
+tables.
+'''
+import plotly.graph_objects as go
+
+from dashboard.heatmap import CODE_LABELS
+from dashboard.maps import RAG_MAP_COLOURS
+from dashboard.rag import RAG_CODES, SMALL
+from dashboard.timing import timed
+
+# Height of the chart for each group, and for the legend, in pixels
+BAR_HEIGHT = 40
+LEGEND_HEIGHT = 80
+
+
+def group_label(col, group, groups):
+    '''
+    Get the label for a group of MSOAs shown on the chart.
+
+    Parameters
+    ----------
+    col : string
+        Grouping, from AREA_GROUPS in dashboard/rag.py
+    group : string
+        Group
+    groups : list
+        Every group of the grouping, in order (for IMD, from the most
+        deprived, 1, to the least deprived)
+
+    Returns
+    -------
+    string
+        Label (e.g. '1 (most deprived)')
+    '''
+    if col.startswith('imd_'):
+        if group == groups[0]:
+            return f'{group} (most deprived)'
+        if group == groups[-1]:
+            return f'{group} (least deprived)'
+    return str(group)
+
+
+@timed()
+def create_area_rag_chart(counts, col):
+    '''
+    Create stacked bar chart of the number of MSOAs with each RAG rating in
+    each group, for one topic.
+
+    Parameters
+    ----------
+    counts : dataframe
+        Number of MSOAs with each rating code in each group, for the topic
+        (from create_area_rag_counts() in dashboard/rag.py)
+    col : string
+        Grouping, from AREA_GROUPS in dashboard/rag.py
+
+    Returns
+    -------
+    fig : plotly figure
+        Chart with a bar for each group with any MSOAs, with the first group
+        at the top
+    '''
+    groups = list(counts.index)
+    labels = [group_label(col, group, groups) for group in groups]
+    # Only show groups with MSOAs (e.g. there are no conurbations)
+    shown = (counts.sum(axis=1) > 0).to_numpy()
+    counts = counts[shown]
+    labels = [label for label, show in zip(labels, shown) if show]
+    fig = go.Figure()
+    # Show ratings from below to above average, then n<10
+    for code in [*RAG_CODES.values(), SMALL]:
+        rating = CODE_LABELS[code - SMALL]
+        fig.add_trace(go.Bar(
+            y=labels, x=counts[code], name=rating, orientation='h',
+            marker={'color': RAG_MAP_COLOURS[rating],
+                    'line': {'color': 'grey', 'width': 0.5}},
+            hovertemplate='%{y}<br>' + rating + ': %{x}<extra></extra>'))
+    fig.update_layout(
+        barmode='stack',
+        height=LEGEND_HEIGHT + BAR_HEIGHT * len(labels),
+        margin={'r': 0, 't': 0, 'l': 0, 'b': 0},
+        legend={'orientation': 'h', 'yanchor': 'bottom', 'y': 1.02},
+        xaxis={'title': 'Number of MSOAs', 'dtick': 1, 'fixedrange': True},
+        yaxis={'autorange': 'reversed', 'fixedrange': True})
+    return fig
@@ -0,0 +1,288 @@
+'''
+Cube of the standard survey responses by pupil characteristics, for viewing
+results for any combination of characteristics (e.g. Year 10 girls eligible
+for FSM).
+
+The aggregate responses (standard_nd_aggregate_responses) only have results
+for all pupils and for one characteristic at a time. The cube instead holds
+the number of pupils giving each response to each question for every
+combination of year group, gender, FSM and SEN, as integer arrays. Results
+for any group - a single characteristic, or the intersection of several - are
+found by summing the cells for that group, and results are hidden when fewer
+than 10 pupils responded, as in the aggregate responses. As the counts are
+not hidden in the cube itself, it is only used by the dashboard to find
+results for groups, and is not shown as it is.
+
+The cube is created by the data pipeline (create_and_process_data/stages.py)
+and saved as a compressed numpy file.
+'''
+from dataclasses import dataclass
+import re
+
+import numpy as np
+import pandas as pd
+
+from dashboard.responses import extract_nested_results
+from dashboard.timing import timed
+
+# Characteristics (the dimensions of the cube) and the groups of pupils that
+# can be chosen for each. Every characteristic has an extra last group for
+# pupils in none of these (e.g. gender 'Non-binary', or no data), so that
+# summing every group gives results for all pupils.
+CHARACTERISTICS = {
+    'year_group_lab': ['Year 8', 'Year 10'],
+    'gender_lab': ['Girl', 'Boy'],
+    'fsm_lab': ['FSM', 'Non-FSM'],
+    'sen_lab': ['SEN', 'Non-SEN']}
+
+# Results are hidden when fewer pupils than this responded to a question
+MIN_RESPONSES = 10
+
+
+@dataclass(frozen=True)
+class ResponseCube:
+    '''
+    Number of pupils giving each response to each question, for every
+    combination of characteristics. The categories of every question are
+    stored one after another along the last dimension of counts, with the
+    categories of question i from offsets[i] to offsets[i+1].
+
+    Attributes
+    ----------
+    counts : array
+        Integer array with a dimension for each characteristic (in the order
+        of CHARACTERISTICS, with a group for each of the chosen groups and
+        for other pupils) and a last dimension for the response categories
+    offsets : array
+        Position of the first category of each question in the last dimension
+        of counts, with a final value for the total number of categories
+    measure : array
+        Name of each question (e.g. 'autonomy_pressure')
+    measure_lab : array
+        Question text
+    group : array
+        Topic of each question (e.g. 'autonomy')
+    cat : array
+        Value of each response category (NaN for no response)
+    cat_lab : array
+        Label for each response category
+    '''
+    counts: np.ndarray
+    offsets: np.ndarray
+    measure: np.ndarray
+    measure_lab: np.ndarray
+    group: np.ndarray
+    cat: np.ndarray
+    cat_lab: np.ndarray
+
+
+def pupils_answering(pupils, measure):
+    '''
+    Find the pupils who were asked a question - those who branched onto it,
+    for the questions on talking to someone (as in aggregate_proportions()
+    from kailo_beewell_dashboard), or else all pupils.
+
+    Parameters
+    ----------
+    pupils : dataframe
+        Pupil-level standard survey responses
+    measure : string
+        Name of the question
+
+    Returns
+    -------
+    series
+        Boolean for each pupil
+    '''
+    if 'talk_listen' in measure or 'talk_helpful' in measure:
+        prefix = re.sub('_talk_listen|_talk_helpful', '', measure)
+        return pupils[f'{prefix}_talk'] == 1
+    if 'talk_if' in measure:
+        prefix = re.sub('_talk_if', '', measure)
+        return pupils[f'{prefix}_talk'] == 0
+    return pd.Series(True, index=pupils.index)
+
+
+def create_cube(pupils, responses):
+    '''
+    Count the pupils giving each response to each question, for every
+    combination of characteristics.
+
+    Parameters
+    ----------
+    pupils : dataframe
+        Pupil-level standard survey responses
+    responses : dataframe
+        Aggregate responses, used for the questions and response categories
+        (and their labels) - only the rows for all pupils are used
+
+    Returns
+    -------
+    dictionary
+        Arrays for each attribute of ResponseCube, to be saved with
+        numpy.savez_compressed()
+    '''
+    questions = responses[(responses[list(CHARACTERISTICS)] == 'All')
+                          .all(axis=1)]
+
+    # Find the cell of the cube for each pupil (where the last group of each
+    # characteristic is for pupils in none of the chosen groups)
+    shape = [len(groups) + 1 for groups in CHARACTERISTICS.values()]
+    cell = np.zeros(len(pupils), dtype=int)
+    for col, groups in CHARACTERISTICS.items():
+        index = pupils[col].map({lab: i for i, lab in enumerate(groups)})
+        cell = cell * (len(groups) + 1) + index.fillna(len(groups)).to_numpy(
+            dtype=int)
+
+    # Count responses to each question in each cell, matching the response
+    # categories of the aggregate responses (with NaN for no response)
+    counts = []
+    for row in questions.itertuples():
+        values = pupils[row.measure].to_numpy(dtype=float)
+        answered = pupils_answering(pupils, row.measure).to_numpy()
+        cats = np.asarray(row.cat, dtype=float)
+        for cat in cats:
+            match = np.isnan(values) if np.isnan(cat) else values == cat
+            counts.append(np.bincount(cell[match & answered],
+                                      minlength=np.prod(shape)))
+    counts = np.stack(counts, axis=-1).reshape(shape + [len(counts)])
+    n_cats = [len(cat) for cat in questions['cat']]
+
+    return {
+        'counts': counts.astype(np.int32),
+        'offsets': np.concatenate([[0], np.cumsum(n_cats)]),
+        'measure': questions['measure'].to_numpy(dtype=str),
+        'measure_lab': questions['measure_lab'].to_numpy(dtype=str),
+        'group': questions['group'].to_numpy(dtype=str),
+        'cat': np.concatenate(questions['cat'].to_list()).astype(float),
+        'cat_lab': np.concatenate(
+            questions['cat_lab'].to_list()).astype(str)}
+
+
+def load_cube(path):
+    '''
+    Load the cube saved by the data pipeline.
+
+    Parameters
+    ----------
+    path : string
+        Path to the compressed numpy file
+
+    Returns
+    -------
+    ResponseCube
+        Cube, with read-only arrays (as it is shared between sessions)
+    '''
+    with np.load(path) as npz:
+        arrays = {name: npz[name] for name in npz.files}
+    for array in arrays.values():
+        array.flags.writeable = False
+    return ResponseCube(**arrays)
+
+
+def count_responses(cube, selection):
+    '''
+    Sum the cells of the cube for a group of pupils.
+
+    Parameters
+    ----------
+    cube : ResponseCube
+        Cube of responses
+    selection : dictionary
+        Groups of pupils to include for any of the characteristics (e.g.
+        {'year_group_lab': ['Year 10'], 'gender_lab': ['Girl']}) - pupils are
+        included if they are in any of the groups given for a characteristic
+        and in all of the characteristics given. Characteristics that are not
+        given (or given an empty list) are not filtered on.
+
+    Returns
+    -------
+    array
+        Number of pupils giving each response to each question
+    '''
+    index = []
+    for col, groups in CHARACTERISTICS.items():
+        chosen = selection.get(col)
+        if chosen:
+            index.append([groups.index(lab) for lab in chosen])
+        else:
+            index.append(list(range(len(groups) + 1)))
+    cells = cube.counts[np.ix_(*index)]
+    return cells.reshape(-1, cells.shape[-1]).sum(axis=0)
+
+
+def group_responses(cube, selection, label):
+    '''
+    Get the responses to each question for a group of pupils, in the same
+    format as the aggregate responses, hiding results for questions where
+    fewer than 10 pupils responded.
+
+    Parameters
+    ----------
+    cube : ResponseCube
+        Cube of responses
+    selection : dictionary
+        Groups of pupils for each characteristic, as for count_responses()
+    label : string
+        Name of the group of pupils (e.g. 'Year 10, girl'), as shown on the
+        charts
+
+    Returns
+    -------
+    dataframe
+        Row for each question, with the results for each response category
+        stored as arrays, and the name of the group in the 'pupils' column
+    '''
+    counts = count_responses(cube, selection)
+    n_responses = np.add.reduceat(counts, cube.offsets[:-1])
+    hidden = n_responses < MIN_RESPONSES
+    rows = []
+    for i, (start, end) in enumerate(zip(cube.offsets[:-1],
+                                         cube.offsets[1:])):
+        count = counts[start:end].astype(float)
+        if hidden[i]:
+            count[:] = np.nan
+            percentage = np.full(len(count), np.nan)
+        else:
+            percentage = count / n_responses[i] * 100
+        rows.append({
+            'cat': cube.cat[start:end],
+            'cat_lab': cube.cat_lab[start:end],
+            'count': count,
+            'percentage': percentage,
+            'n_responses': np.nan if hidden[i] else float(n_responses[i])})
+    return pd.DataFrame(rows).assign(
+        measure=cube.measure, measure_lab=cube.measure_lab, group=cube.group,
+        pupils=label)
+
+
+@timed()
+def get_combined_result(chosen_variable, selection, cube):
+    '''
+    Get responses to each question in the chosen topic for pupils with a
+    combination of characteristics, alongside the responses from all pupils.
+
+    Parameters
+    ----------
+    chosen_variable : string
+        Name of the chosen topic
+    selection : dictionary
+        Chosen group for any of the characteristics (e.g. {'year_group_lab':
+        ['Year 10'], 'gender_lab': ['Girl'], 'fsm_lab': ['FSM']})
+    cube : ResponseCube
+        Cube of responses
+
+    Returns
+    -------
+    chosen_result : dataframe
+        Responses to each question in the chosen topic, in the same format as
+        get_chosen_result() from dashboard.responses
+    '''
+    chosen = [labs for labs in selection.values() if labs]
+    label = ', '.join(' or '.join(labs) for labs in chosen) or 'All'
+    groups = [group_responses(cube, {}, 'All')]
+    if chosen:
+        groups.append(group_responses(cube, selection, label))
+    chosen = pd.concat(groups, ignore_index=True)
+    chosen = chosen[chosen['group'] == chosen_variable]
+    return extract_nested_results(chosen, 'pupils')
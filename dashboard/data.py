@@ -0,0 +1,611 @@
+'''
+Shared access to the survey and area data used by the dashboard pages.
+
+Each loader is cached with st.cache_resource, so a file is read once per
+server process and the same object is returned to every session and rerun.
+The modification time of the file is part of the cache key, so a refreshed
+file is picked up without restarting the app. As the returned objects are
+shared between sessions, they must not be modified in place - use methods
+that return a new object instead (e.g. DataFrame.assign()).
+
+Each region has its own data folders (see dashboard/regions.py), and the
+loaders read the files for the region of the current session. Each cache is
+sized to hold the files of MAX_REGIONS regions, so the least recently used
+entries are dropped once users choose other regions.
+'''
+from dataclasses import dataclass
+import json
+import os
+import pickle
+from types import MappingProxyType
+
+import pandas as pd
+import streamlit as st
+
+from dashboard.cube import load_cube
+from dashboard.lookup import create_area_index
+from dashboard.rag import (
+    create_area_rag_counts, create_msoa_rag_index, create_rag_matrix)
+from dashboard.regions import MAX_REGIONS, get_region
+from dashboard.summary import create_topic_descriptions
+from dashboard.timing import timed
+
+
+@dataclass(frozen=True)
+class Paths:
+    '''Stores names of the files in the data folders of each region'''
+    overall_counts = 'nd_overall_counts.pkl'
+    standard_scores = 'standard_area_aggregate_scores_rag.csv'
+    standard_area_scores = 'standard_area_scores_imd_ruc.parquet'
+    standard_responses = 'standard_nd_aggregate_responses.parquet'
+    standard_demographic = 'standard_nd_aggregate_demographic.csv'
+    standard_cube = 'standard_nd_response_cube.npz'
+    symbol_responses = 'symbol_nd_aggregate_responses.parquet'
+    symbol_demographic = 'symbol_nd_aggregate_demographic.csv'
+    standard_report = 'standard_nd_report.pdf'
+    symbol_report = 'symbol_nd_report.pdf'
+
+    geojson = 'geojson/msoa_nd_simplified.geojson'
+
+
+paths = Paths()
+
+
+def survey_path(filename, region=None):
+    '''
+    Get path to a file in the survey data folder of a region
+
+    Parameters
+    ----------
+    filename : string
+        Name of the file (e.g. paths.standard_scores)
+    region : string
+        Key of the region (from dashboard/regions.py) - default is the
+        region of the current session
+
+    Returns
+    -------
+    string
+        Path to the file
+    '''
+    return os.path.join(get_region(region).survey_data, filename)
+
+
+def area_path(filename, region=None):
+    '''
+    Get path to a file in the area data folder of a region
+
+    Parameters
+    ----------
+    filename : string
+        Name of the file (e.g. paths.geojson)
+    region : string
+        Key of the region (from dashboard/regions.py) - default is the
+        region of the current session
+
+    Returns
+    -------
+    string
+        Path to the file
+    '''
+    return os.path.join(get_region(region).area_data, filename)
+
+
+def file_version(path):
+    '''
+    Get the version of a file, used as part of the cache key so that the
+    cached copy is replaced when the file changes.
+
+    Parameters
+    ----------
+    path : string
+        Path to the file
+
+    Returns
+    -------
+    float
+        Modification time of the file
+    '''
+    return os.path.getmtime(path)
+
+
+@st.cache_resource(show_spinner=False, max_entries=MAX_REGIONS * 3)
+@timed('read_csv')
+def _read_csv(path, version):
+    '''
+    Read CSV file (cached on path and version)
+
+    Parameters
+    ----------
+    path : string
+        Path to the CSV file
+    version : float
+        Version of the file, from file_version()
+
+    Returns
+    -------
+    dataframe
+        Contents of the CSV file
+    '''
+    return pd.read_csv(path)
+
+
+@st.cache_resource(show_spinner=False, max_entries=MAX_REGIONS * 3)
+@timed('read_parquet')
+def _read_parquet(path, version):
+    '''
+    Read parquet file (cached on path and version)
+
+    Parameters
+    ----------
+    path : string
+        Path to the parquet file
+    version : float
+        Version of the file, from file_version()
+
+    Returns
+    -------
+    dataframe
+        Contents of the parquet file, with list columns as numpy arrays
+    '''
+    return pd.read_parquet(path)
+
+
+@st.cache_resource(show_spinner=False, max_entries=MAX_REGIONS)
+@timed('read_pickle')
+def _read_pickle(path, version):
+    '''
+    Read pickled dictionary, returning a read-only view of it (cached on path
+    and version)
+
+    Parameters
+    ----------
+    path : string
+        Path to the pickle file
+    version : float
+        Version of the file, from file_version()
+
+    Returns
+    -------
+    mappingproxy
+        Read-only view of the unpickled dictionary
+    '''
+    with open(path, 'rb') as f:
+        return MappingProxyType(pickle.load(f))
+
+
+@st.cache_resource(show_spinner=False, max_entries=MAX_REGIONS)
+@timed('read_json')
+def _read_json(path, version):
+    '''
+    Read JSON file (cached on path and version)
+
+    Parameters
+    ----------
+    path : string
+        Path to the JSON file
+    version : float
+        Version of the file, from file_version()
+
+    Returns
+    -------
+    dictionary
+        Parsed contents of the JSON file
+    '''
+    with open(path) as f:
+        return json.load(f)
+
+
+@st.cache_resource(show_spinner=False, max_entries=MAX_REGIONS)
+@timed('create_msoa_rag_index')
+def _msoa_rag_index(path, version):
+    '''
+    Create the MSOA RAG index from the scores (cached on path and version)
+
+    Parameters
+    ----------
+    path : string
+        Path to the scores CSV file
+    version : float
+        Version of the file, from file_version()
+
+    Returns
+    -------
+    mappingproxy
+        Index from create_msoa_rag_index()
+    '''
+    return create_msoa_rag_index(_read_csv(path, version))
+
+
+@st.cache_resource(show_spinner=False, max_entries=MAX_REGIONS)
+@timed('create_rag_matrix')
+def _rag_matrix(path, version):
+    '''
+    Create the RAG matrix from the scores (cached on path and version)
+
+    Parameters
+    ----------
+    path : string
+        Path to the scores CSV file
+    version : float
+        Version of the file, from file_version()
+
+    Returns
+    -------
+    RagMatrix
+        Matrix from create_rag_matrix()
+    '''
+    return create_rag_matrix(_read_csv(path, version))
+
+
+@st.cache_resource(show_spinner=False, max_entries=MAX_REGIONS)
+@timed('create_area_rag_counts')
+def _area_rag_counts(path, version):
+    '''
+    Count the MSOAs with each RAG rating in each group of areas (cached on
+    path and version)
+
+    Parameters
+    ----------
+    path : string
+        Path to the parquet file of scores with area characteristics
+    version : float
+        Version of the file, from file_version()
+
+    Returns
+    -------
+    mappingproxy
+        Counts from create_area_rag_counts()
+    '''
+    return create_area_rag_counts(_read_parquet(path, version))
+
+
+@st.cache_resource(show_spinner=False, max_entries=MAX_REGIONS)
+@timed('create_topic_descriptions')
+def _topic_descriptions(path, version):
+    '''
+    Create the topic descriptions from the scores (cached on path and
+    version)
+
+    Parameters
+    ----------
+    path : string
+        Path to the scores CSV file
+    version : float
+        Version of the file, from file_version()
+
+    Returns
+    -------
+    mappingproxy
+        Descriptions from create_topic_descriptions()
+    '''
+    return create_topic_descriptions(_read_csv(path, version))
+
+
+@st.cache_resource(show_spinner=False, max_entries=MAX_REGIONS)
+@timed('create_area_index')
+def _area_index(path, version):
+    '''
+    Create the spatial index over the MSOA boundaries (cached on path and
+    version)
+
+    Parameters
+    ----------
+    path : string
+        Path to the GeoJSON file
+    version : float
+        Version of the file, from file_version()
+
+    Returns
+    -------
+    AreaIndex
+        Index from create_area_index()
+    '''
+    return create_area_index(_read_json(path, version))
+
+
+@st.cache_resource(show_spinner=False, max_entries=MAX_REGIONS)
+@timed('read_cube')
+def _read_cube(path, version):
+    '''
+    Read the cube of responses by pupil characteristics (cached on path and
+    version)
+
+    Parameters
+    ----------
+    path : string
+        Path to the compressed numpy file
+    version : float
+        Version of the file, from file_version()
+
+    Returns
+    -------
+    ResponseCube
+        Cube from dashboard.cube, with read-only arrays
+    '''
+    return load_cube(path)
+
+
+def read_csv(path):
+    '''
+    Get shared copy of a CSV file, reading it only if not already cached or
+    if the file has changed since it was cached.
+
+    Parameters
+    ----------
+    path : string
+        Path to the CSV file
+
+    Returns
+    -------
+    dataframe
+        Contents of the CSV file - must not be modified in place
+    '''
+    return _read_csv(path, file_version(path))
+
+
+def read_parquet(path):
+    '''
+    Get shared copy of a parquet file, reading it only if not already cached
+    or if the file has changed since it was cached.
+
+    Parameters
+    ----------
+    path : string
+        Path to the parquet file
+
+    Returns
+    -------
+    dataframe
+        Contents of the parquet file - must not be modified in place
+    '''
+    return _read_parquet(path, file_version(path))
+
+
+def load_overall_counts(region=None):
+    '''
+    Get the overall counts of pupils and schools for each survey.
+
+    Parameters
+    ----------
+    region : string
+        Key of the region (from dashboard/regions.py) - default is the
+        region of the current session
+
+    Returns
+    -------
+    mappingproxy
+        Read-only dictionary of counts (e.g. 'standard_pupils')
+    '''
+    path = survey_path(paths.overall_counts, region)
+    return _read_pickle(path, file_version(path))
+
+
+def load_standard_scores(region=None):
+    '''
+    Get the standard survey topic scores and RAG ratings for each MSOA.
+
+    Parameters
+    ----------
+    region : string
+        Key of the region (from dashboard/regions.py) - default is the
+        region of the current session
+
+    Returns
+    -------
+    dataframe
+        Aggregate scores with RAG ratings - must not be modified in place
+    '''
+    return read_csv(survey_path(paths.standard_scores, region))
+
+
+def load_msoa_rag_index(region=None):
+    '''
+    Get the lookup from each MSOA to its ready-to-display topic RAG ratings.
+
+    Parameters
+    ----------
+    region : string
+        Key of the region (from dashboard/regions.py) - default is the
+        region of the current session
+
+    Returns
+    -------
+    mappingproxy
+        Read-only dictionary from create_msoa_rag_index()
+    '''
+    path = survey_path(paths.standard_scores, region)
+    return _msoa_rag_index(path, file_version(path))
+
+
+def load_rag_matrix(region=None):
+    '''
+    Get the RAG rating and score for every MSOA and topic, as arrays.
+
+    Parameters
+    ----------
+    region : string
+        Key of the region (from dashboard/regions.py) - default is the
+        region of the current session
+
+    Returns
+    -------
+    RagMatrix
+        Matrix from create_rag_matrix(), with read-only arrays
+    '''
+    path = survey_path(paths.standard_scores, region)
+    return _rag_matrix(path, file_version(path))
+
+
+def load_area_rag_counts(region=None):
+    '''
+    Get the number of MSOAs with each RAG rating for every topic, in each
+    group of areas by deprivation or rurality.
+
+    Parameters
+    ----------
+    region : string
+        Key of the region (from dashboard/regions.py) - default is the
+        region of the current session
+
+    Returns
+    -------
+    mappingproxy
+        Read-only dictionary from create_area_rag_counts()
+    '''
+    path = survey_path(paths.standard_area_scores, region)
+    return _area_rag_counts(path, file_version(path))
+
+
+def load_topic_descriptions(region=None):
+    '''
+    Get the description of each standard survey topic.
+
+    Parameters
+    ----------
+    region : string
+        Key of the region (from dashboard/regions.py) - default is the
+        region of the current session
+
+    Returns
+    -------
+    mappingproxy
+        Read-only dictionary from create_topic_descriptions()
+    '''
+    path = survey_path(paths.standard_scores, region)
+    return _topic_descriptions(path, file_version(path))
+
+
+def load_standard_responses(region=None):
+    '''
+    Get the standard survey responses to each question across the region.
+
+    Parameters
+    ----------
+    region : string
+        Key of the region (from dashboard/regions.py) - default is the
+        region of the current session
+
+    Returns
+    -------
+    dataframe
+        Aggregate responses, where the responses to each question are stored
+        as arrays (for use with dashboard.responses) - must not be modified in
+        place
+    '''
+    return read_parquet(survey_path(paths.standard_responses, region))
+
+
+def load_standard_demographic(region=None):
+    '''
+    Get the standard survey responses to the demographic questions.
+
+    Parameters
+    ----------
+    region : string
+        Key of the region (from dashboard/regions.py) - default is the
+        region of the current session
+
+    Returns
+    -------
+    dataframe
+        Aggregate demographics - must not be modified in place
+    '''
+    return read_csv(survey_path(paths.standard_demographic, region))
+
+
+def load_standard_cube(region=None):
+    '''
+    Get the standard survey responses to each question for every combination
+    of pupil characteristics.
+
+    Parameters
+    ----------
+    region : string
+        Key of the region (from dashboard/regions.py) - default is the
+        region of the current session
+
+    Returns
+    -------
+    ResponseCube
+        Cube from dashboard.cube, for finding results for any group of pupils
+    '''
+    path = survey_path(paths.standard_cube, region)
+    return _read_cube(path, file_version(path))
+
+
+def load_symbol_responses(region=None):
+    '''
+    Get the symbol survey responses to each question across the region.
+
+    Parameters
+    ----------
+    region : string
+        Key of the region (from dashboard/regions.py) - default is the
+        region of the current session
+
+    Returns
+    -------
+    dataframe
+        Aggregate responses, where the responses to each question are stored
+        as arrays (for use with dashboard.responses) - must not be modified in
+        place
+    '''
+    return read_parquet(survey_path(paths.symbol_responses, region))
+
+
+def load_symbol_demographic(region=None):
+    '''
+    Get the symbol survey responses to the demographic questions.
+
+    Parameters
+    ----------
+    region : string
+        Key of the region (from dashboard/regions.py) - default is the
+        region of the current session
+
+    Returns
+    -------
+    dataframe
+        Aggregate demographics - must not be modified in place
+    '''
+    return read_csv(survey_path(paths.symbol_demographic, region))
+
+
+def load_geojson(region=None):
+    '''
+    Get the MSOA boundaries for the region.
+
+    Parameters
+    ----------
+    region : string
+        Key of the region (from dashboard/regions.py) - default is the
+        region of the current session
+
+    Returns
+    -------
+    dictionary
+        Parsed GeoJSON - must not be modified in place
+    '''
+    path = area_path(paths.geojson, region)
+    return _read_json(path, file_version(path))
+
+
+def load_area_index(region=None):
+    '''
+    Get the spatial index over the MSOA boundaries, for finding the MSOA
+    containing a point.
+
+    Parameters
+    ----------
+    region : string
+        Key of the region (from dashboard/regions.py) - default is the
+        region of the current session
+
+    Returns
+    -------
+    AreaIndex
+        Index from create_area_index(), with read-only arrays
+    '''
+    path = area_path(paths.geojson, region)
+    return _area_index(path, file_version(path))
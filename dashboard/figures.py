@@ -0,0 +1,220 @@
+'''
+Export of the figures in the PDF reports.
+
+The reports have a bar chart for each question, drawn by the same functions
+as the dashboard pages (create_bar_charts() and demographic_plots() from
+kailo_beewell_dashboard). When making a report, those functions export each
+figure to an image with kaleido as soon as it is drawn, one after another.
+Instead, the figures are collected while the report HTML is created, leaving
+a placeholder where each image goes. The images are then exported together,
+split between several processes, and embedded in the HTML.
+
+Exported images are saved to a cache on disk, named by a hash of the figure
+(its plotly JSON, which includes the data, layout and styling) and the image
+format. So an image is only exported again if its figure has changed, and
+figures shared between reports are only exported once.
+'''
+import base64
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+import hashlib
+from itertools import repeat
+import multiprocessing
+import os
+import pathlib
+import re
+import tempfile
+
+# Folder to save exported images to
+CACHE_DIR = '.cache/figures'
+
+# Format of the images in the reports - SVG images are around a third of the
+# size of PNG, and stay sharp when zoomed in
+IMAGE_FORMAT = 'svg'
+MIME_TYPES = {'svg': 'image/svg+xml', 'png': 'image/png'}
+
+# Size of the figures in the reports, as in convert_fig_to_html() from
+# kailo_beewell_dashboard
+LAYOUT = dict(height=411, width=600,
+              xaxis=dict(automargin=True), yaxis=dict(automargin=True))
+
+# Placeholders left in the report HTML for each figure
+PLACEHOLDER = '<!--figure-{}-->'
+PLACEHOLDER_PATTERN = re.compile(r'<!--figure-\d+-->')
+
+
+@contextmanager
+def collect_figures():
+    '''
+    Collect the figures drawn for a PDF report by kailo_beewell_dashboard,
+    rather than exporting each one as it is drawn. This replaces
+    convert_fig_to_html() (used by the bar chart functions) with a function
+    that returns a placeholder for the image.
+
+    Yields
+    ------
+    figures : dictionary
+        Filled with the placeholder for each figure, and a tuple with the
+        figure (as plotly JSON) and its alternative text
+    '''
+    # Imported here so that processes exporting images (which import this
+    # module) do not have to load streamlit and kailo_beewell_dashboard
+    from kailo_beewell_dashboard import bar_charts
+
+    figures = {}
+
+    def placeholder_html(fig, alt_text):
+        fig.update_layout(**LAYOUT)
+        placeholder = PLACEHOLDER.format(len(figures))
+        figures[placeholder] = (fig.to_json(), alt_text)
+        return placeholder
+
+    convert_fig_to_html = bar_charts.convert_fig_to_html
+    bar_charts.convert_fig_to_html = placeholder_html
+    try:
+        yield figures
+    finally:
+        bar_charts.convert_fig_to_html = convert_fig_to_html
+
+
+def image_path(spec, image_format=IMAGE_FORMAT):
+    '''
+    Get path to the cached image of a figure.
+
+    Parameters
+    ----------
+    spec : string
+        Figure as plotly JSON
+    image_format : string
+        Format of the image - 'svg' or 'png'
+
+    Returns
+    -------
+    string
+        Path to image (which may not have been exported yet)
+    '''
+    sha = hashlib.sha256(image_format.encode())
+    sha.update(spec.encode())
+    return os.path.join(CACHE_DIR, f'{sha.hexdigest()[:32]}.{image_format}')
+
+
+def export_image(spec, path, image_format=IMAGE_FORMAT):
+    '''
+    Export figure to an image file. This is run in the worker processes.
+
+    Parameters
+    ----------
+    spec : string
+        Figure as plotly JSON
+    path : string
+        Path to save the image to
+    image_format : string
+        Format of the image - 'svg' or 'png'
+    '''
+    import plotly.io as pio
+
+    image = pio.to_image(pio.from_json(spec, skip_invalid=True),
+                         format=image_format)
+
+    # Write to temporary file, then move into place, so a partly-written
+    # image is never used
+    fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(path),
+                                     suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(image)
+        os.chmod(temp_path, 0o644)
+        os.replace(temp_path, path)
+    except BaseException:
+        os.remove(temp_path)
+        raise
+
+
+def export_figures(figures, image_format=IMAGE_FORMAT, workers=None):
+    '''
+    Export images for the figures which are not already in the cache, with
+    the figures split between several processes.
+
+    Parameters
+    ----------
+    figures : dictionary
+        Placeholder for each figure, and a tuple with the figure (as plotly
+        JSON) and its alternative text - from collect_figures()
+    image_format : string
+        Format of the images - 'svg' or 'png'
+    workers : integer
+        Maximum number of processes exporting images - default is the number
+        of CPUs
+
+    Returns
+    -------
+    paths : dictionary
+        Path to the image for each placeholder
+    '''
+    paths = {placeholder: image_path(spec, image_format)
+             for placeholder, (spec, _) in figures.items()}
+
+    # Find figures to export (only once each, if used more than once)
+    missing = {path: figures[placeholder][0]
+               for placeholder, path in paths.items()
+               if not os.path.exists(path)}
+    if not missing:
+        return paths
+    os.makedirs(CACHE_DIR, exist_ok=True)
+
+    # Each process starts its own kaleido (which takes around a second),
+    # then exports images one at a time until all are done. New processes
+    # are spawned, as kaleido is not safe to fork.
+    workers = min(workers or os.cpu_count() or 1, len(missing))
+    with ProcessPoolExecutor(
+            max_workers=workers,
+            mp_context=multiprocessing.get_context('spawn')) as executor:
+        list(executor.map(export_image, missing.values(), missing.keys(),
+                          repeat(image_format)))
+    return paths
+
+
+def embed_figures(html, figures, image_format=IMAGE_FORMAT, workers=None,
+                  inline=True):
+    '''
+    Replace the placeholders in the report HTML with the images of each
+    figure, exporting any images that are not already in the cache.
+
+    Parameters
+    ----------
+    html : string
+        Report HTML, with placeholders from collect_figures()
+    figures : dictionary
+        Placeholder for each figure, and a tuple with the figure (as plotly
+        JSON) and its alternative text - from collect_figures()
+    image_format : string
+        Format of the images - 'svg' or 'png'
+    workers : integer
+        Maximum number of processes exporting images - default is the number
+        of CPUs
+    inline : boolean
+        Whether to embed the images in the HTML (default), or link to the
+        images in the cache - which lets weasyprint load each image once when
+        rendering several reports with the same figures
+
+    Returns
+    -------
+    string
+        Report HTML with the images embedded
+    '''
+    paths = export_figures(figures, image_format, workers)
+
+    # Create the image tags (as in convert_fig_to_html())
+    img_tags = {}
+    for placeholder, (_, alt_text) in figures.items():
+        if inline:
+            with open(paths[placeholder], 'rb') as f:
+                data_uri = base64.b64encode(f.read()).decode('utf-8')
+            src = f'data:{MIME_TYPES[image_format]};base64,{data_uri}'
+        else:
+            src = pathlib.Path(paths[placeholder]).resolve().as_uri()
+        img_tags[placeholder] = f'''
+<img src='{src}' alt='{alt_text}'>'''
+
+    return PLACEHOLDER_PATTERN.sub(lambda match: img_tags[match.group()],
+                                   html)
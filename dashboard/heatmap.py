@@ -0,0 +1,119 @@
+'''
+Heatmap of the RAG rating for every MSOA and topic.
+
+The heatmap is drawn from the RAG matrix (dashboard.rag.RagMatrix), which is
+created once when the scores are loaded. Sorting and filtering the areas
+each time the page runs only uses the arrays in the matrix, so does not
+depend on the size of the scores table.
+'''
+import numpy as np
+import plotly.graph_objects as go
+
+from dashboard.maps import RAG_MAP_COLOURS
+from dashboard.rag import RAG_CODES, SMALL
+from dashboard.timing import timed
+
+# Label for each RAG code, in order of the codes (from SMALL upwards)
+CODE_LABELS = np.array(['n<10', 'Below average', 'Average', 'Above average'])
+
+# Height of the heatmap for each MSOA, and for the topic labels, in pixels
+ROW_HEIGHT = 24
+LABEL_HEIGHT = 200
+
+
+@timed()
+def sort_areas(matrix, topic=None, ascending=False, ratings=None):
+    '''
+    Choose the MSOAs to show in the heatmap, and the order to show them in.
+
+    Parameters
+    ----------
+    matrix : RagMatrix
+        RAG rating and score for every MSOA and topic
+    topic : integer
+        Column of the topic to sort and filter by - if None (default), MSOAs
+        are sorted by name
+    ascending : boolean
+        Whether to show the lowest scores first (default False, showing the
+        highest scores first) - MSOAs with n<10 are always shown last
+    ratings : list
+        Codes of the RAG ratings to show for the topic (e.g. [0] for below
+        average) - if None (default), MSOAs with any rating are shown
+
+    Returns
+    -------
+    array
+        Rows of the matrix to show, in order
+    '''
+    rows = np.arange(len(matrix.msoas))
+    if topic is None:
+        return rows
+    if ratings is not None:
+        rows = rows[np.isin(matrix.codes[:, topic], ratings)]
+    means = matrix.means[rows, topic]
+    # Sorting puts NaN (n<10) last, so negate the scores to sort descending
+    order = np.argsort(means if ascending else -means, kind='stable')
+    return rows[order]
+
+
+def discrete_colour_scale(colours):
+    '''
+    Create plotly colour scale with a band of a single colour for each value.
+
+    Parameters
+    ----------
+    colours : list
+        Colour for each value, in order
+
+    Returns
+    -------
+    list
+        Colour scale, for use with zmin and zmax half a value below the first
+        and above the last value
+    '''
+    scale = []
+    for i, colour in enumerate(colours):
+        scale += [[i / len(colours), colour], [(i + 1) / len(colours), colour]]
+    return scale
+
+
+@timed()
+def create_rag_heatmap(matrix, rows):
+    '''
+    Create heatmap of the RAG rating for each topic in the chosen MSOAs.
+
+    Parameters
+    ----------
+    matrix : RagMatrix
+        RAG rating and score for every MSOA and topic
+    rows : array
+        Rows of the matrix to show, in order (from sort_areas())
+
+    Returns
+    -------
+    fig : plotly figure
+        Heatmap, with the score and rating of each cell shown on hover
+    '''
+    codes = matrix.codes[rows]
+    means = matrix.means[rows]
+    scores = np.where(np.isnan(means), '-', np.char.mod('%.1f', means))
+    labels = CODE_LABELS[codes - SMALL]
+
+    fig = go.Figure(go.Heatmap(
+        z=codes, x=matrix.topic_labs, y=matrix.msoas[rows],
+        customdata=np.dstack([labels, scores]),
+        hovertemplate=('%{y}<br>%{x}<br>%{customdata[0]} '
+                       '(score: %{customdata[1]})<extra></extra>'),
+        # Colour each code, with a gap between cells
+        colorscale=discrete_colour_scale(
+            [RAG_MAP_COLOURS[label] for label in CODE_LABELS]),
+        zmin=SMALL - 0.5, zmax=max(RAG_CODES.values()) + 0.5,
+        showscale=False, xgap=1, ygap=1))
+
+    fig.update_layout(
+        height=LABEL_HEIGHT + ROW_HEIGHT * len(rows),
+        margin={'r': 0, 't': 0, 'l': 0, 'b': 0},
+        xaxis={'side': 'top', 'tickangle': -45, 'fixedrange': True},
+        # Show first row at the top
+        yaxis={'autorange': 'reversed', 'fixedrange': True})
+    return fig
@@ -0,0 +1,250 @@
+'''
+Lookup of the MSOA containing a point (e.g. the location of a school), using
+a spatial index over the MSOA boundaries.
+
+The index is built once when the boundaries are loaded (see
+load_area_index() in dashboard/data.py). The area covered by the MSOAs is
+divided into a grid of cells, and each cell lists the MSOAs whose bounding box
+overlaps it. Finding the MSOA for a point then only tests the few MSOAs listed
+for the point's cell, using the edges of their boundaries, which are stored
+as arrays.
+
+The lookup uses the simplified boundaries shown on the maps (see
+create_and_process_data/simplify_geometry.py), so a point very close to the
+boundary between two MSOAs may be given the neighbouring MSOA.
+'''
+from dataclasses import dataclass
+
+import numpy as np
+
+# Number of cells along each side of the grid
+GRID_CELLS = 32
+
+# Bounds of latitude and longitude, for checking locations entered by users
+LAT_RANGE = (-90, 90)
+LON_RANGE = (-180, 180)
+
+
+@dataclass(frozen=True)
+class AreaIndex:
+    '''
+    Spatial index over the MSOA boundaries. The edges of the boundary of
+    every MSOA are stored one after another, with the edges of MSOA i from
+    edge_offsets[i] to edge_offsets[i+1], and similarly the MSOAs listed for
+    each cell of the grid (numbered along each row, from the south-west).
+
+    Attributes
+    ----------
+    msoas : array
+        Name of each MSOA
+    bounds : array
+        Bounding box of each MSOA, as minimum longitude, minimum latitude,
+        maximum longitude and maximum latitude
+    origin : array
+        Longitude and latitude of the south-west corner of the grid
+    cell_size : array
+        Width and height of each cell, in degrees of longitude and latitude
+    cells : integer
+        Number of cells along each side of the grid
+    cell_offsets : array
+        Position of the first MSOA listed for each cell in cell_areas, with a
+        final value for the length of cell_areas
+    cell_areas : array
+        MSOAs (as positions in msoas) listed for each cell
+    edge_offsets : array
+        Position of the first edge of each MSOA in edges, with a final value
+        for the total number of edges
+    edges : array
+        Longitude and latitude of the start and end of each edge
+    '''
+    msoas: np.ndarray
+    bounds: np.ndarray
+    origin: np.ndarray
+    cell_size: np.ndarray
+    cells: int
+    cell_offsets: np.ndarray
+    cell_areas: np.ndarray
+    edge_offsets: np.ndarray
+    edges: np.ndarray
+
+
+def polygon_rings(geometry):
+    '''
+    Get every ring (outer boundaries and holes) of a GeoJSON polygon or
+    multipolygon.
+
+    Parameters
+    ----------
+    geometry : dictionary
+        GeoJSON geometry
+
+    Returns
+    -------
+    list
+        Array of longitude and latitude of the points of each ring
+    '''
+    if geometry['type'] == 'Polygon':
+        polygons = [geometry['coordinates']]
+    elif geometry['type'] == 'MultiPolygon':
+        polygons = geometry['coordinates']
+    else:
+        raise ValueError(f'Unknown geometry type: {geometry["type"]}')
+    return [np.asarray(ring, dtype=float)
+            for polygon in polygons for ring in polygon]
+
+
+def create_area_index(geojson, name_col='MSOA11NM', cells=GRID_CELLS):
+    '''
+    Create spatial index over the MSOA boundaries.
+
+    Parameters
+    ----------
+    geojson : dictionary
+        Parsed GeoJSON with a feature for each MSOA
+    name_col : string
+        Property with the name of the MSOA
+    cells : integer
+        Number of cells along each side of the grid
+
+    Returns
+    -------
+    AreaIndex
+        Index with read-only arrays
+    '''
+    names = []
+    edges = []
+    for feature in geojson['features']:
+        names.append(feature['properties'][name_col])
+        # Edge from each point of a ring to the next, and from the last point
+        # back to the first (which has no length if the ring is closed)
+        edges.append(np.concatenate([
+            np.hstack([ring, np.roll(ring, -1, axis=0)])
+            for ring in polygon_rings(feature['geometry'])]))
+    bounds = np.array([
+        [*area_edges[:, :2].min(axis=0), *area_edges[:, :2].max(axis=0)]
+        for area_edges in edges])
+
+    # List each MSOA in every cell that its bounding box overlaps
+    origin = bounds[:, :2].min(axis=0)
+    cell_size = (bounds[:, 2:].max(axis=0) - origin) / cells
+    first = np.floor((bounds[:, :2] - origin) / cell_size).astype(int)
+    last = np.floor((bounds[:, 2:] - origin) / cell_size).astype(int)
+    first, last = (np.clip(corner, 0, cells - 1) for corner in (first, last))
+    cell_lists = [[] for _ in range(cells * cells)]
+    for area, ((col0, row0), (col1, row1)) in enumerate(zip(first, last)):
+        for row in range(row0, row1 + 1):
+            for col in range(col0, col1 + 1):
+                cell_lists[row * cells + col].append(area)
+
+    arrays = {
+        'msoas': np.array(names, dtype=str),
+        'bounds': bounds,
+        'origin': origin,
+        'cell_size': cell_size,
+        'cell_offsets': np.concatenate(
+            [[0], np.cumsum([len(areas) for areas in cell_lists])]),
+        'cell_areas': np.array(
+            [area for areas in cell_lists for area in areas], dtype=int),
+        'edge_offsets': np.concatenate(
+            [[0], np.cumsum([len(area_edges) for area_edges in edges])]),
+        'edges': np.concatenate(edges)}
+    for array in arrays.values():
+        array.flags.writeable = False
+    return AreaIndex(cells=cells, **arrays)
+
+
+def contains_point(edges, lon, lat):
+    '''
+    Check whether a point is inside a boundary, by counting the edges crossed
+    by a line from the point to the east (so holes, and areas made of several
+    polygons, are handled by the same count).
+
+    Parameters
+    ----------
+    edges : array
+        Longitude and latitude of the start and end of each edge of the
+        boundary
+    lon : float
+        Longitude of the point
+    lat : float
+        Latitude of the point
+
+    Returns
+    -------
+    boolean
+        Whether the point is inside
+    '''
+    # Edges with one end north of the point and one end south of it (so not
+    # horizontal edges, avoiding division by zero)
+    edges = edges[(edges[:, 1] > lat) != (edges[:, 3] > lat)]
+    lon1, lat1, lon2, lat2 = edges.T
+    crossing = lon1 + (lat - lat1) * (lon2 - lon1) / (lat2 - lat1)
+    return np.count_nonzero(lon < crossing) % 2 == 1
+
+
+def find_msoa(index, lon, lat):
+    '''
+    Find the MSOA containing a point.
+
+    Parameters
+    ----------
+    index : AreaIndex
+        Spatial index over the MSOA boundaries
+    lon : float
+        Longitude of the point
+    lat : float
+        Latitude of the point
+
+    Returns
+    -------
+    string
+        Name of the MSOA, or None if the point is not in any of the MSOAs
+    '''
+    point = np.array([lon, lat])
+    if not (np.all(point >= index.origin) and np.all(
+            point <= index.origin + index.cell_size * index.cells)):
+        return None
+    # Points on the north and east edges of the grid are in the last cells
+    col, row = np.minimum(np.floor((point - index.origin) / index.cell_size),
+                          index.cells - 1).astype(int)
+
+    cell = row * index.cells + col
+    for area in index.cell_areas[
+            index.cell_offsets[cell]:index.cell_offsets[cell + 1]]:
+        min_lon, min_lat, max_lon, max_lat = index.bounds[area]
+        if not (min_lon <= lon <= max_lon and min_lat <= lat <= max_lat):
+            continue
+        edges = index.edges[
+            index.edge_offsets[area]:index.edge_offsets[area + 1]]
+        if contains_point(edges, lon, lat):
+            return str(index.msoas[area])
+    return None
+
+
+def parse_location(text):
+    '''
+    Get the latitude and longitude of a location entered by a user, in the
+    form '<latitude>, <longitude>' (as copied from most online maps).
+
+    Parameters
+    ----------
+    text : string
+        Location entered by the user (e.g. '51.08, -4.06')
+
+    Returns
+    -------
+    lon : float
+        Longitude
+    lat : float
+        Latitude
+    '''
+    parts = text.replace(',', ' ').split()
+    try:
+        lat, lon = (float(part) for part in parts)
+    except ValueError:
+        raise ValueError('Enter the location as latitude and longitude, '
+                         'separated by a comma (e.g. 51.08, -4.06)')
+    if not (LAT_RANGE[0] <= lat <= LAT_RANGE[1] and
+            LON_RANGE[0] <= lon <= LON_RANGE[1]):
+        raise ValueError(f'{text} is not a valid latitude and longitude')
+    return lon, lat
@@ -0,0 +1,237 @@
+'''
+Choropleth maps of the MSOAs in each region.
+
+The maps are the same for every user in a region, and there are only a small
+number of topics, so each map is created once per region, topic and data
+version and then shared between sessions using st.cache_resource (holding
+the maps for at most MAX_REGIONS regions).
+'''
+from kailo_beewell_dashboard.explore_results import create_topic_dict
+import numpy as np
+import plotly.express as px
+import streamlit as st
+
+from dashboard.data import (
+    area_path, file_version, load_geojson, load_standard_scores, paths,
+    survey_path)
+from dashboard.regions import MAX_REGIONS, current_region, get_region
+from dashboard.timing import timed
+
+# Labels and colours for the RAG ratings on the area map
+RAG_LABELS = {
+    'below': 'Below average',
+    'average': 'Average',
+    'above': 'Above average',
+    np.nan: 'n<10'}
+RAG_MAP_COLOURS = {
+    'Below average': '#FFB3B3',
+    'Average': '#FFDFA6',
+    'Above average': '#7DD27D',
+    'n<10': '#F6FAFF'}
+
+# Maximum number of topics, for the number of maps cached for each region
+MAX_TOPICS = 50
+
+
+@timed()
+def create_area_map(df_scores, geojson, topic_lab, region):
+    '''
+    Create map of the RAG rating in each MSOA for the chosen topic.
+
+    Parameters
+    ----------
+    df_scores : dataframe
+        Scores with RAG ratings for each topic and MSOA
+    geojson : dictionary
+        MSOA boundaries
+    topic_lab : string
+        Label of the chosen topic (matching 'variable_lab')
+    region : Region
+        Settings for the region (used to position the map)
+
+    Returns
+    -------
+    fig : plotly figure
+        Choropleth map
+    '''
+    # Filter to chosen topic then filter to only used column (helps map speed)
+    chosen_result = df_scores[df_scores['variable_lab'] == topic_lab]
+    msoa_rag = chosen_result[['msoa', 'rag']].copy()
+    msoa_rag['rag'] = msoa_rag['rag'].map(RAG_LABELS)
+
+    # Create map
+    fig = px.choropleth_mapbox(
+        msoa_rag,
+        geojson=geojson,
+        locations='msoa',
+        featureidkey='properties.MSOA11NM',
+        # Colour rules
+        color='rag',
+        color_discrete_map=RAG_MAP_COLOURS,
+        opacity=0.75,
+        # Base map style
+        mapbox_style='carto-positron',
+        center=region.map_centre,
+        zoom=region.map_zoom,
+        labels={'rag': 'Result'},
+        # Control legend order
+        category_orders={'rag': list(RAG_MAP_COLOURS.keys())})
+
+    fig.update_layout(margin={'r': 0, 't': 0, 'l': 0, 'b': 0})
+    return fig
+
+
+@timed()
+def create_msoa_picker_map(df_scores, geojson, region):
+    '''
+    Create map with every MSOA in a single colour, which users can hover
+    over to find the name of each MSOA.
+
+    Parameters
+    ----------
+    df_scores : dataframe
+        Scores with RAG ratings, used for the list of MSOAs
+    geojson : dictionary
+        MSOA boundaries
+    region : Region
+        Settings for the region (used to position the map)
+
+    Returns
+    -------
+    fig : plotly figure
+        Choropleth map
+    '''
+    fig = px.choropleth_mapbox(
+        df_scores[['msoa']].drop_duplicates(),
+        geojson=geojson,
+        locations='msoa',
+        featureidkey='properties.MSOA11NM',
+        # Single colour for all areas
+        color_discrete_sequence=['#B0B0B0'],  # Light grey colour
+        opacity=0.75,
+        # Base map style
+        mapbox_style='carto-positron',
+        center=region.map_centre,
+        zoom=region.picker_zoom)
+
+    fig.update_layout(margin={'r': 0, 't': 0, 'l': 0, 'b': 0})
+    return fig
+
+
+def map_data_version(region):
+    '''
+    Get the version of the data used by the maps, used as part of the cache
+    key so that maps are recreated when the scores or boundaries change.
+
+    Parameters
+    ----------
+    region : string
+        Key of the region (from dashboard/regions.py)
+
+    Returns
+    -------
+    tuple
+        Versions of the scores and GeoJSON files
+    '''
+    return (file_version(survey_path(paths.standard_scores, region)),
+            file_version(area_path(paths.geojson, region)))
+
+
+@st.cache_resource(show_spinner=False, max_entries=MAX_REGIONS * MAX_TOPICS)
+def _area_map(topic_lab, region, version):
+    '''
+    Create area map for topic (cached on topic, region and data version)
+
+    Parameters
+    ----------
+    topic_lab : string
+        Label of the chosen topic
+    region : string
+        Key of the region
+    version : tuple
+        Version of the data, from map_data_version()
+
+    Returns
+    -------
+    plotly figure
+        Choropleth map from create_area_map()
+    '''
+    return create_area_map(load_standard_scores(region), load_geojson(region),
+                           topic_lab, get_region(region))
+
+
+@st.cache_resource(show_spinner=False, max_entries=MAX_REGIONS)
+def _msoa_picker_map(region, version):
+    '''
+    Create MSOA picker map (cached on region and data version)
+
+    Parameters
+    ----------
+    region : string
+        Key of the region
+    version : tuple
+        Version of the data, from map_data_version()
+
+    Returns
+    -------
+    plotly figure
+        Choropleth map from create_msoa_picker_map()
+    '''
+    return create_msoa_picker_map(load_standard_scores(region),
+                                  load_geojson(region), get_region(region))
+
+
+def load_area_map(topic_lab, region=None):
+    '''
+    Get shared map of the RAG ratings for the chosen topic.
+
+    Parameters
+    ----------
+    topic_lab : string
+        Label of the chosen topic (matching 'variable_lab')
+    region : string
+        Key of the region (from dashboard/regions.py) - default is the
+        region of the current session
+
+    Returns
+    -------
+    plotly figure
+        Choropleth map - must not be modified in place
+    '''
+    region = region or current_region()
+    return _area_map(topic_lab, region, map_data_version(region))
+
+
+def load_msoa_picker_map(region=None):
+    '''
+    Get shared map of all MSOAs in a single colour.
+
+    Parameters
+    ----------
+    region : string
+        Key of the region (from dashboard/regions.py) - default is the
+        region of the current session
+
+    Returns
+    -------
+    plotly figure
+        Choropleth map - must not be modified in place
+    '''
+    region = region or current_region()
+    return _msoa_picker_map(region, map_data_version(region))
+
+
+def warm_maps(region=None):
+    '''
+    Create and cache the map for every topic and the MSOA picker map, so
+    that no user has to wait for them to be created.
+
+    Parameters
+    ----------
+    region : string
+        Key of the region (from dashboard/regions.py) - default is the
+        region of the current session
+    '''
+    for topic_lab in create_topic_dict(load_standard_scores(region)).keys():
+        load_area_map(topic_lab, region)
+    load_msoa_picker_map(region)
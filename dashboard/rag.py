@@ -0,0 +1,198 @@
+'''
+Functions for preparing the RAG ratings (below, average, above) of each
+topic for display on the dashboard.
+'''
+from dataclasses import dataclass
+from types import MappingProxyType
+from typing import Literal, Optional
+
+import numpy as np
+import pandas as pd
+
+# Text and colours used for each RAG rating
+RAG_COLOUR_SCHEMES = {
+    'below': MappingProxyType({'rag_text': 'Below average',
+                               'bg_colour': '#FFCCCC',
+                               'font_colour': '#95444B'}),
+    'average': MappingProxyType({'rag_text': 'Average',
+                                 'bg_colour': '#FFE8BF',
+                                 'font_colour': '#AA7A18'}),
+    'above': MappingProxyType({'rag_text': 'Above average',
+                               'bg_colour': '#B6E6B6',
+                               'font_colour': '#2B7C47'}),
+    'small': MappingProxyType({'rag_text': 'n < 10',
+                               'bg_colour': '#DCE4FF',
+                               'font_colour': '#19539A'})}
+
+# Integer code for each RAG rating in the RAG matrix (with SMALL when n<10),
+# ordered from below to above average so codes can be compared
+RAG_CODES = {'below': 0, 'average': 1, 'above': 2}
+SMALL = -1
+
+# Ways of grouping the MSOAs by deprivation or rurality (columns added to the
+# scores by the data pipeline), with the name of each grouping
+AREA_GROUPS = {
+    'imd_quintile': 'Deprivation quintile',
+    'imd_decile': 'Deprivation decile',
+    'ruc_2': 'Rural or urban',
+    'ruc_class': 'Rural-urban classification'}
+
+
+def get_rag_colour_scheme(
+        rag: Optional[Literal['average', 'above', 'below']]) -> dict:
+    '''
+    Get the text and colours used to display a RAG rating. We should be using
+    this in the result-box function in the summary_rag.py
+
+    Parameters
+    ----------
+    rag : string or NaN
+        RAG rating - 'below', 'average' or 'above' - or NaN when n<10
+
+    Returns
+    -------
+    mappingproxy
+        Read-only dictionary with 'rag_text', 'bg_colour' and 'font_colour'
+    '''
+    if rag in ('below', 'average', 'above'):
+        return RAG_COLOUR_SCHEMES[rag]
+    elif pd.isnull(rag):
+        return RAG_COLOUR_SCHEMES['small']
+    else:
+        raise ValueError(f'Unknown rag value: {rag}')
+
+
+def create_msoa_rag_index(df):
+    '''
+    Create lookup from each MSOA to the records needed to display its summary
+    of topics, with the RAG colour scheme already applied. This is done once
+    when the data is loaded, so that choosing an MSOA is a dictionary lookup
+    rather than a scan of the whole table.
+
+    Parameters
+    ----------
+    df : dataframe
+        Scores with RAG ratings, with 'msoa', 'variable_lab' and 'rag' columns
+
+    Returns
+    -------
+    index : mappingproxy
+        Read-only dictionary where keys are MSOA names and values are tuples
+        of {'variable_lab', 'rag'} records, in the order they appear in df
+    '''
+    # Find colour scheme for each unique rating, rather than for every row
+    schemes = {rag: get_rag_colour_scheme(rag)
+               for rag in df['rag'].dropna().unique()}
+    small = get_rag_colour_scheme(None)
+
+    # Single pass through the table, appending records for each MSOA
+    index = {}
+    for msoa, variable_lab, rag in zip(
+            df['msoa'], df['variable_lab'], df['rag']):
+        index.setdefault(msoa, []).append(MappingProxyType({
+            'variable_lab': variable_lab,
+            'rag': schemes.get(rag, small)}))
+
+    return MappingProxyType({msoa: tuple(records)
+                             for msoa, records in index.items()})
+
+
+@dataclass(frozen=True)
+class RagMatrix:
+    '''
+    RAG rating and score for every MSOA and topic, as dense arrays with a row
+    for each MSOA and a column for each topic.
+
+    Attributes
+    ----------
+    msoas : array
+        Name of each MSOA, in alphabetical order
+    topics : array
+        Name of each topic (e.g. 'autonomy_score')
+    topic_labs : array
+        Label of each topic (e.g. 'Autonomy')
+    codes : array
+        RAG rating of each MSOA and topic, as int8 codes from RAG_CODES (or
+        SMALL when n<10)
+    means : array
+        Mean score of each MSOA and topic (NaN when n<10)
+    '''
+    msoas: np.ndarray
+    topics: np.ndarray
+    topic_labs: np.ndarray
+    codes: np.ndarray
+    means: np.ndarray
+
+
+def create_rag_matrix(df):
+    '''
+    Create matrix of the RAG rating and score for every MSOA and topic. This
+    is done once when the data is loaded, so that the matrix can then be
+    sorted and filtered using the arrays (see dashboard/heatmap.py).
+
+    Parameters
+    ----------
+    df : dataframe
+        Scores with RAG ratings, with 'msoa', 'variable', 'variable_lab',
+        'mean' and 'rag' columns
+
+    Returns
+    -------
+    RagMatrix
+        Matrix with read-only arrays, with the topics in the order they
+        appear in df (excluding those without a label, which are parts of
+        other topics)
+    '''
+    df = df[df['variable_lab'].notna()]
+    msoa_index, msoas = pd.factorize(df['msoa'], sort=True)
+    topic_index, topics = pd.factorize(df['variable'])
+    topic_labs = (df[['variable', 'variable_lab']].drop_duplicates('variable')
+                  .set_index('variable')['variable_lab'].reindex(topics))
+
+    # Fill each cell from its row of the table, leaving MSOAs without a
+    # result for a topic as n<10
+    codes = np.full((len(msoas), len(topics)), SMALL, dtype=np.int8)
+    codes[msoa_index, topic_index] = (
+        df['rag'].map(RAG_CODES).fillna(SMALL).to_numpy(np.int8))
+    means = np.full((len(msoas), len(topics)), np.nan)
+    means[msoa_index, topic_index] = df['mean'].to_numpy(float)
+
+    arrays = {'msoas': msoas.to_numpy(dtype=str),
+              'topics': topics.to_numpy(dtype=str),
+              'topic_labs': topic_labs.to_numpy(dtype=str),
+              'codes': codes, 'means': means}
+    for array in arrays.values():
+        array.flags.writeable = False
+    return RagMatrix(**arrays)
+
+
+def create_area_rag_counts(df):
+    '''
+    Count the MSOAs with each RAG rating for every topic and group of MSOAs,
+    for every grouping by deprivation or rurality. This is done once when the
+    scores are loaded, so that the page only selects from the counts (see
+    dashboard/area_groups.py).
+
+    Parameters
+    ----------
+    df : dataframe
+        Scores with RAG ratings and ordered categorical columns for each
+        grouping in AREA_GROUPS, as saved by the data pipeline
+
+    Returns
+    -------
+    mappingproxy
+        Read-only dictionary where keys are groupings and values are
+        dataframes with the number of MSOAs with each rating code (columns,
+        SMALL then RAG_CODES) for every topic and group (index) - including
+        groups without any MSOAs, in the order of the categories
+    '''
+    # Topics without a label are parts of other topics
+    df = df[df['variable_lab'].notna()]
+    codes = pd.Categorical(
+        df['rag'].map(RAG_CODES).fillna(SMALL).astype(int),
+        categories=range(SMALL, max(RAG_CODES.values()) + 1))
+    return MappingProxyType({
+        col: pd.crosstab([df['variable'], df[col]], codes, dropna=False,
+                         colnames=['rag'])
+        for col in AREA_GROUPS})
@@ -0,0 +1,168 @@
+'''
+Regions served by the dashboard, each with its own survey and area data.
+
+The data for each region is kept in its own folders, with the same files as
+created for Northern Devon by the data pipeline and simplify_geometry.py.
+The shared caches (dashboard/data.py and dashboard/maps.py) are keyed on the
+path of each file, so only the data for regions that users have chosen is
+read - and each cache holds the data for at most MAX_REGIONS regions,
+dropping the least recently used region when another is loaded.
+
+The region is chosen in the sidebar, and stored in session state. The
+loaders use the region of the current session, or the default region when
+run outside a session (e.g. by the warm-up thread or the benchmarks).
+'''
+from dataclasses import dataclass
+import os
+from types import MappingProxyType
+
+import streamlit as st
+from streamlit.runtime.scriptrunner import get_script_run_ctx
+
+
+@dataclass(frozen=True)
+class Region:
+    '''
+    Settings for a region.
+
+    Attributes
+    ----------
+    name : string
+        Name of the region, as used in the text of the pages
+    places : string
+        Description of the places in the region (e.g. the local authorities)
+    survey_data : string
+        Folder with the survey data
+    area_data : string
+        Folder with the area data (including the simplified boundaries)
+    map_centre : dictionary
+        Latitude and longitude of the centre of the maps on load
+    map_zoom : float
+        Zoom of the area map on load
+    picker_zoom : float
+        Zoom of the MSOA picker map on load (which is smaller)
+    '''
+    name: str
+    places: str
+    survey_data: str
+    area_data: str
+    map_centre: dict
+    map_zoom: float
+    picker_zoom: float
+
+    @property
+    def footer(self):
+        return f'schools in {self.name}'
+
+
+REGIONS = MappingProxyType({
+    'northern_devon': Region(
+        name='Northern Devon',
+        places='North Devon and Torridge',
+        survey_data='data/survey_data',
+        area_data='data/area_data',
+        map_centre={'lat': 50.955, 'lon': -4.1},
+        map_zoom=8.4,
+        picker_zoom=7.8),
+    'greater_manchester': Region(
+        name='Greater Manchester',
+        places='Greater Manchester',
+        survey_data='data/regions/greater_manchester/survey_data',
+        area_data='data/regions/greater_manchester/area_data',
+        map_centre={'lat': 53.505, 'lon': -2.3},
+        map_zoom=9.0,
+        picker_zoom=8.4),
+    'hips': Region(
+        name='Hampshire, Isle of Wight, Portsmouth and Southampton',
+        places='Hampshire, the Isle of Wight, Portsmouth and Southampton',
+        survey_data='data/regions/hips/survey_data',
+        area_data='data/regions/hips/area_data',
+        map_centre={'lat': 50.96, 'lon': -1.25},
+        map_zoom=8.2,
+        picker_zoom=7.6)})
+
+DEFAULT_REGION = 'northern_devon'
+
+# Number of regions whose data is held in each shared cache at once
+MAX_REGIONS = 2
+
+# Session state set from the data for one region, which is cleared when the
+# region is changed (e.g. the chosen MSOA)
+REGION_STATE = ('selected_msoa', 'msoa_location', 'msoa_location_error')
+
+
+def available_regions():
+    '''
+    Find the regions with data.
+
+    Returns
+    -------
+    list
+        Keys of the regions (from REGIONS) with a survey data folder
+    '''
+    return [key for key, region in REGIONS.items()
+            if os.path.isdir(region.survey_data)]
+
+
+def current_region():
+    '''
+    Get the region chosen in the current session.
+
+    Returns
+    -------
+    string
+        Key of the region (from REGIONS) - the default region if none has
+        been chosen, or if not run in a session
+    '''
+    if get_script_run_ctx() is None:
+        return DEFAULT_REGION
+    region = st.session_state.get('region', DEFAULT_REGION)
+    return region if region in REGIONS else DEFAULT_REGION
+
+
+def get_region(region=None):
+    '''
+    Get the settings for a region.
+
+    Parameters
+    ----------
+    region : string
+        Key of the region (from REGIONS) - default is the region of the
+        current session
+
+    Returns
+    -------
+    Region
+        Settings for the region
+    '''
+    return REGIONS[region or current_region()]
+
+
+def change_region():
+    '''
+    Store the region chosen in the sidebar, and clear the session state set
+    from the data of the previous region.
+    '''
+    st.session_state.region = st.session_state.region_select
+    for key in REGION_STATE:
+        st.session_state.pop(key, None)
+
+
+def region_selector():
+    '''
+    Show a selectbox in the sidebar for choosing the region, if there is
+    data for more than one region. The chosen region is kept in session
+    state (rather than the widget state, which is cleared when moving
+    between pages).
+    '''
+    available = available_regions()
+    if len(available) < 2:
+        return
+    region = current_region()
+    st.sidebar.selectbox(
+        label='**Region:**',
+        options=available,
+        index=available.index(region) if region in available else 0,
+        format_func=lambda key: REGIONS[key].name,
+        key='region_select',
+        on_change=change_region)
@@ -0,0 +1,700 @@
+'''
+PDF reports for the standard and symbol surveys.
+
+Rendering a report with weasyprint takes around 30 seconds, and the reports
+are the same for every user. So rather than rendering in the Streamlit
+script (which blocks that session, and repeats the work for every user),
+reports are rendered by a background process, with one queue shared by
+every session. Finished reports are saved to a cache on disk, keyed by
+report type and the version of the data (and code) they are made from, so
+each report is rendered once and then served to everyone.
+
+Usually, the reports are rendered ahead of time by the data pipeline
+(create_and_process_data/pipeline.py) and saved with the survey data, so
+the dashboard just serves those files. The queue is only used if they have
+not been created. Each region has its own reports, made from the data in
+that region's folder (see dashboard/regions.py).
+
+The figures in the reports are exported by dashboard/figures.py.
+'''
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+import glob
+import hashlib
+import importlib.metadata
+import multiprocessing
+import os
+import queue
+import tempfile
+import threading
+import time
+
+from kailo_beewell_dashboard.explore_results import (
+    create_bar_charts, create_topic_dict, write_response_section_intro,
+    write_topic_intro)
+from kailo_beewell_dashboard.static_report import (
+    illustration_html, logo_html, structure_report)
+from kailo_beewell_dashboard.who_took_part import demographic_plots
+import streamlit as st
+
+from dashboard import figures
+from dashboard.data import (
+    file_version, load_overall_counts, load_standard_demographic,
+    load_standard_responses, load_standard_scores, load_symbol_demographic,
+    load_symbol_responses, paths, survey_path)
+from dashboard.regions import current_region, get_region
+from dashboard.responses import get_chosen_result
+
+# Folder to save rendered reports to
+CACHE_DIR = '.cache/reports'
+
+# Time taken to render a report, used for progress until one has been timed
+EXPECTED_SECONDS = 30
+
+
+@dataclass(frozen=True)
+class Report:
+    '''
+    Settings for a PDF report.
+
+    Attributes
+    ----------
+    name : string
+        Name of the survey, as used in buttons
+    pdf_title : string
+        Title of the PDF document
+    heading : string
+        Heading on the title page
+    data : tuple
+        Names of the datasets that the report is made from (as in Paths)
+    file_name : string
+        Name of the downloaded file
+    prebuilt : string
+        File in the survey data folder of each region with the report
+        rendered by the data pipeline
+    '''
+    name: str
+    pdf_title: str
+    heading: str
+    data: tuple
+    file_name: str
+    prebuilt: str
+
+
+REPORTS = {
+    'standard': Report(
+        name='standard survey',
+        pdf_title='Public Dashboard Report',
+        heading='#BeeWell - The Standard Survey',
+        data=('overall_counts', 'standard_scores', 'standard_responses',
+              'standard_demographic'),
+        file_name='kailo_beewell_school_report_standard.pdf',
+        prebuilt=paths.standard_report),
+    'symbol': Report(
+        name='symbol survey',
+        pdf_title='Symbol Survey Report',
+        heading='#BeeWell - The Symbol Survey',
+        data=('overall_counts', 'symbol_responses', 'symbol_demographic'),
+        file_name='kailo_beewell_school_report_symbol.pdf',
+        prebuilt=paths.symbol_report)}
+
+# Functions to load each dataset used in the reports
+LOADERS = {
+    'overall_counts': load_overall_counts,
+    'standard_scores': load_standard_scores,
+    'standard_responses': load_standard_responses,
+    'standard_demographic': load_standard_demographic,
+    'symbol_responses': load_symbol_responses,
+    'symbol_demographic': load_symbol_demographic}
+
+
+def load_report_data(report_type, region=None):
+    '''
+    Load the datasets that a report is made from.
+
+    Parameters
+    ----------
+    report_type : string
+        Type of report - 'standard' or 'symbol'
+    region : string
+        Key of the region (from dashboard/regions.py) - default is the
+        region of the current session
+
+    Returns
+    -------
+    dictionary
+        Each dataset, by name (as in Paths) - must not be modified in place
+    '''
+    return {name: LOADERS[name](region)
+            for name in REPORTS[report_type].data}
+
+
+def explore_results_content(report_type, data, content):
+    '''
+    Add the Explore Results section of the report, with bar charts of the
+    responses to each question (for all pupils).
+
+    Parameters
+    ----------
+    report_type : string
+        Type of report - 'standard' or 'symbol'
+    data : dictionary
+        Datasets for the report, from load_report_data()
+    content : list
+        HTML for report
+
+    Returns
+    -------
+    content : list
+        HTML for report
+    '''
+    if report_type == 'standard':
+        df_scores = data['standard_scores']
+        for chosen_variable_lab, chosen_variable in create_topic_dict(
+                df_scores).items():
+            content = write_topic_intro(
+                chosen_variable, chosen_variable_lab, df_scores,
+                output='pdf', content=content)
+            content = write_response_section_intro(
+                chosen_variable_lab, output='pdf', content=content,
+                type='public')
+            chosen_result = get_chosen_result(
+                chosen_variable=chosen_variable,
+                chosen_group='For all pupils',
+                df=data['standard_responses'],
+                school=None)
+            content = create_bar_charts(
+                chosen_variable, chosen_result, output='pdf',
+                content=content)
+
+    elif report_type == 'symbol':
+        chosen_variable = 'symbol'
+        chosen_result = get_chosen_result(
+            chosen_variable=chosen_variable,
+            chosen_group='For all pupils',
+            df=data['symbol_responses'].assign(group=chosen_variable),
+            school=None,
+            survey_type='symbol')
+        content = create_bar_charts(
+            chosen_variable, chosen_result, output='pdf', content=content)
+
+    return content
+
+
+def who_took_part_content(report_type, data, content, region=None):
+    '''
+    Add the Who Took Part section of the report, with bar charts of the
+    responses to each demographic question.
+
+    Parameters
+    ----------
+    report_type : string
+        Type of report - 'standard' or 'symbol'
+    data : dictionary
+        Datasets for the report, from load_report_data()
+    content : list
+        HTML for report
+    region : string
+        Key of the region (from dashboard/regions.py) - default is the
+        region of the current session
+
+    Returns
+    -------
+    content : list
+        HTML for report
+    '''
+    dem_prop = data[f'{report_type}_demographic'].assign(
+        site=get_region(region).name)
+    if report_type == 'symbol':
+        dem_prop = dem_prop.assign(plot_group=dem_prop['measure'])
+    return demographic_plots(
+        dem_prop=dem_prop, group_lab='site', output='pdf', content=content,
+        survey_type=report_type, dashboard_type='area')
+
+
+def create_report_html(report_type, data, region=None):
+    '''
+    Create HTML for the public PDF report. Figures are exported by
+    kailo_beewell_dashboard as they are drawn (unless collected with
+    figures.collect_figures()).
+
+    Parameters
+    ----------
+    report_type : string
+        Type of report - 'standard' or 'symbol'
+    data : dictionary
+        Datasets for the report, from load_report_data()
+    region : string
+        Key of the region (from dashboard/regions.py) - default is the
+        region of the current session
+
+    Returns
+    -------
+    html_content : string
+        HTML for the report
+    '''
+    report = REPORTS[report_type]
+    content = []
+
+    # Title Page
+    content.append(logo_html())
+    title_page = f'''
+<div class='section_container'>
+    <h1 style='text-align:center;'>{report.heading}</h1>
+    <p style='text-align:center; font-weight:bold;'>Thank you for taking part in the #BeeWell survey delivered by Kailo.</p>
+    <p>The results from pupils can be explored using the interactive dashboard. This report has been downloaded from that dashboard.</p>
+</div>
+'''  # noqa: E501
+    content.append(title_page)
+    content.append(illustration_html())
+
+    # Introduction
+    content.append('<h1 style="page-break-before:always;">Introduction</h1>')
+    content.append('<h2>How to use this report</h2>')
+    content.append(
+        '<p>Explanation of how to use the report...</p>'
+    )  # Replace with actual content
+    content.append('<h2>Comparing between areas</h2>')
+    content.append(
+        '<p>Important notes on comparing data...</p>'
+    )  # Replace with actual content
+
+    # Table of Contents
+    content.append(
+        '<h1 style="page-break-before:always;">Table of Contents</h1>')
+    content.append(
+        '<ul><li><a href="#summary">Summary</a></li>'
+        '<li><a href="#explore_results">Explore results</a></li>'
+        '<li><a href="#who_took_part">Who took part</a></li></ul>'
+    )
+
+    # Summary
+    content.append(
+        '<h1 id="summary" style="page-break-before:always;">Summary</h1>')
+    content.append(
+        '<p>Summary of the results...</p>')  # Replace with actual content
+
+    # Explore Results
+    content.append(
+        '<h1 id="explore_results" style="page-break-before:always;">'
+        'Explore Results</h1>'
+    )
+    content = explore_results_content(report_type, data, content)
+
+    # Who Took Part
+    content.append(
+        '<h1 id="who_took_part" style="page-break-before:always;">'
+        'Who Took Part</h1>'
+    )
+    content = who_took_part_content(report_type, data, content, region)
+
+    # Create HTML report
+    html_content = structure_report(report.pdf_title, content)
+    return html_content
+
+
+def create_static_report(report_type, data=None, workers=None, region=None):
+    '''
+    Create HTML for the public PDF report, with the figures exported in
+    parallel (and reused from the cache where unchanged).
+
+    Parameters
+    ----------
+    report_type : string
+        Type of report - 'standard' or 'symbol'
+    data : dictionary
+        Datasets for the report - default is to load them from the survey
+        data folder with load_report_data()
+    workers : integer
+        Maximum number of processes exporting figures - default is the
+        number of CPUs
+    region : string
+        Key of the region (from dashboard/regions.py) - default is the
+        region of the current session
+
+    Returns
+    -------
+    string
+        HTML for the report
+    '''
+    if data is None:
+        data = load_report_data(report_type, region)
+    with figures.collect_figures() as report_figures:
+        html_content = create_report_html(report_type, data, region)
+    return figures.embed_figures(html_content, report_figures,
+                                 workers=workers)
+
+
+@st.cache_resource(show_spinner=False, max_entries=64)
+def _file_hash(path, version):
+    '''
+    Create hash of file content (cached on path and version)
+
+    Parameters
+    ----------
+    path : string
+        Path to file
+    version : float
+        Version of the file, from file_version()
+
+    Returns
+    -------
+    string
+        SHA-256 hash
+    '''
+    sha = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(2**20), b''):
+            sha.update(chunk)
+    return sha.hexdigest()
+
+
+def report_version(report_type, region=None):
+    '''
+    Get version of a report - a hash of the data it is made from, and of the
+    code used to make it (this module, dashboard/figures.py, and the version
+    of kailo_beewell_dashboard).
+
+    Parameters
+    ----------
+    report_type : string
+        Type of report - 'standard' or 'symbol'
+    region : string
+        Key of the region (from dashboard/regions.py) - default is the
+        region of the current session
+
+    Returns
+    -------
+    string
+        Version of the report
+    '''
+    files = [survey_path(getattr(paths, name), region)
+             for name in REPORTS[report_type].data]
+    files.extend([__file__, figures.__file__])
+    sha = hashlib.sha256(
+        importlib.metadata.version('kailo_beewell_dashboard').encode())
+    for path in files:
+        sha.update(_file_hash(path, file_version(path)).encode())
+    return sha.hexdigest()[:16]
+
+
+def report_path(report_type, region=None):
+    '''
+    Get path to the cached PDF for the current version of a report.
+
+    Parameters
+    ----------
+    report_type : string
+        Type of report - 'standard' or 'symbol'
+    region : string
+        Key of the region (from dashboard/regions.py) - default is the
+        region of the current session
+
+    Returns
+    -------
+    string
+        Path to PDF (which may not have been rendered yet)
+    '''
+    region = region or current_region()
+    version = report_version(report_type, region)
+    return os.path.join(CACHE_DIR, f'{region}-{report_type}-{version}.pdf')
+
+
+def create_pdf(report_type, data=None, region=None):
+    '''
+    Render report to PDF.
+
+    Parameters
+    ----------
+    report_type : string
+        Type of report - 'standard' or 'symbol'
+    data : dictionary
+        Datasets for the report - default is to load them from the survey
+        data folder with load_report_data()
+    region : string
+        Key of the region (from dashboard/regions.py) - default is the
+        region of the current session
+
+    Returns
+    -------
+    bytes
+        PDF report
+    '''
+    # Imported here so weasyprint is only loaded by the processes rendering
+    # reports, and not by the dashboard
+    import weasyprint
+
+    html_content = create_static_report(report_type, data, region=region)
+    return weasyprint.HTML(string=html_content).write_pdf()
+
+
+def prebuilt_path(report_type, region=None):
+    '''
+    Get path to the report rendered by the data pipeline.
+
+    Parameters
+    ----------
+    report_type : string
+        Type of report - 'standard' or 'symbol'
+    region : string
+        Key of the region (from dashboard/regions.py) - default is the
+        region of the current session
+
+    Returns
+    -------
+    string or None
+        Path to PDF, or None if it has not been created
+    '''
+    path = survey_path(REPORTS[report_type].prebuilt, region)
+    return path if os.path.exists(path) else None
+
+
+def read_report(path):
+    '''
+    Read a rendered report. This is passed to the download buttons, which only
+    call it when the button is clicked - so sessions do not hold a copy of
+    the report, and it is only read from disk when downloaded.
+
+    Parameters
+    ----------
+    path : string
+        Path to PDF
+
+    Returns
+    -------
+    bytes
+        PDF report
+    '''
+    with open(path, 'rb') as f:
+        return f.read()
+
+
+def render_report(report_type, path, region=None):
+    '''
+    Render report to PDF and save it to the cache, removing any older
+    versions of the report. This is run in a background process.
+
+    Parameters
+    ----------
+    report_type : string
+        Type of report - 'standard' or 'symbol'
+    path : string
+        Path to save the PDF to
+    region : string
+        Key of the region (from dashboard/regions.py) - default is the
+        default region, as the background process has no session
+
+    Returns
+    -------
+    float
+        Time taken to render the report in seconds
+    '''
+    start = time.perf_counter()
+    pdf = create_pdf(report_type, region=region)
+
+    # Write to temporary file, then move into place, so a partly-written
+    # report is never served
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    fd, temp_path = tempfile.mkstemp(dir=CACHE_DIR, suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(pdf)
+        # Temporary files are only readable by owner, so use usual
+        # permissions
+        os.chmod(temp_path, 0o644)
+        os.replace(temp_path, path)
+    except BaseException:
+        os.remove(temp_path)
+        raise
+
+    region = region or current_region()
+    for old_path in glob.glob(
+            os.path.join(CACHE_DIR, f'{region}-{report_type}-*.pdf')):
+        if old_path != path:
+            os.remove(old_path)
+    return time.perf_counter() - start
+
+
+@dataclass(frozen=True)
+class ReportStatus:
+    '''
+    Status of a report.
+
+    Attributes
+    ----------
+    state : string
+        'ready', 'queued', 'rendering', 'failed' or 'not started'
+    path : string
+        Path to the PDF (for the current version of the data)
+    progress : float
+        Estimated proportion of rendering complete (between 0 and 1)
+    position : integer
+        Position in the queue, if queued (1 is next)
+    error : string
+        Error message, if rendering failed
+    '''
+    state: str
+    path: str
+    progress: float = 0.0
+    position: int = None
+    error: str = None
+
+
+@dataclass
+class _Job:
+    '''Report in the queue'''
+    report_type: str
+    path: str
+    region: str
+    started: float = None
+    finished: bool = False
+    error: str = None
+
+
+class ReportQueue:
+    '''
+    Queue of reports to render in background processes, shared by every
+    session, so each report is only rendered once even if requested by
+    several users at the same time.
+    '''
+    def __init__(self, workers=1):
+        '''
+        Parameters
+        ----------
+        workers : integer
+            Number of reports rendered at the same time (each in its own
+            process)
+        '''
+        # New processes are spawned (rather than forked from the server,
+        # which is running other threads)
+        self._executor = ProcessPoolExecutor(
+            max_workers=workers,
+            mp_context=multiprocessing.get_context('spawn'))
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        # Jobs for each report path, in the order they were requested (kept
+        # once finished, until the report is requested again)
+        self._jobs = {}
+        # Time taken for the most recent render of each report type
+        self._seconds = {}
+
+        # Threads which pass reports from the queue to the processes
+        for _ in range(workers):
+            threading.Thread(target=self._work, daemon=True).start()
+
+    def _work(self):
+        '''
+        Take reports from the queue and render them, one at a time.
+        '''
+        while True:
+            job = self._queue.get()
+            with self._lock:
+                job.started = time.time()
+            # The lock is not held while rendering, so status() can be read
+            # in the meantime - the job and timings are only updated with it
+            try:
+                seconds = self._executor.submit(
+                    render_report, job.report_type, job.path,
+                    job.region).result()
+            except Exception as error:
+                with self._lock:
+                    job.error = str(error) or type(error).__name__
+                    job.finished = True
+            else:
+                with self._lock:
+                    self._seconds[job.report_type] = seconds
+                    job.finished = True
+
+    def status(self, report_type, region=None):
+        '''
+        Get status of the current version of a report.
+
+        Parameters
+        ----------
+        report_type : string
+            Type of report - 'standard' or 'symbol'
+        region : string
+            Key of the region (from dashboard/regions.py) - default is the
+            region of the current session
+
+        Returns
+        -------
+        ReportStatus
+            Status of the report
+        '''
+        path = report_path(report_type, region)
+        with self._lock:
+            job = self._jobs.get(path)
+            if job is None:
+                state = 'ready' if os.path.exists(path) else 'not started'
+                return ReportStatus(state, path)
+
+            # Finished jobs are kept (so a failed report shows its error on
+            # every run of the page) until the report is requested again
+            if job.finished:
+                if job.error is not None:
+                    return ReportStatus('failed', path, error=job.error)
+                return ReportStatus('ready', path, 1.0)
+
+            if job.started is None:
+                waiting = [other for other in self._jobs.values()
+                           if other.started is None]
+                return ReportStatus('queued', path,
+                                    position=waiting.index(job) + 1)
+
+            expected = self._seconds.get(report_type, EXPECTED_SECONDS)
+            progress = min((time.time() - job.started) / expected, 0.95)
+            return ReportStatus('rendering', path, progress)
+
+    def request(self, report_type, region=None):
+        '''
+        Add report to the queue, unless it has already been rendered or is
+        in the queue. If the report failed, the error is cleared and it is
+        rendered again.
+
+        Parameters
+        ----------
+        report_type : string
+            Type of report - 'standard' or 'symbol'
+        region : string
+            Key of the region (from dashboard/regions.py) - default is the
+            region of the current session
+
+        Returns
+        -------
+        ReportStatus
+            Status of the report
+        '''
+        region = region or current_region()
+        path = report_path(report_type, region)
+        with self._lock:
+            job = self._jobs.get(path)
+            if job is not None and job.finished:
+                del self._jobs[path]
+            if path not in self._jobs and not os.path.exists(path):
+                job = _Job(report_type, path, region)
+                self._jobs[path] = job
+                self._queue.put(job)
+        return self.status(report_type, region)
+
+    def shutdown(self):
+        '''
+        Stop the rendering processes, after any report being rendered has
+        finished (reports still waiting in the queue are not rendered). This
+        is needed before exiting a process that used the queue, which would
+        otherwise wait for the idle rendering processes to exit.
+        '''
+        self._executor.shutdown(wait=True, cancel_futures=True)
+
+
+@st.cache_resource(show_spinner=False)
+def get_report_queue():
+    '''
+    Get the report queue shared by every session.
+
+    Returns
+    -------
+    ReportQueue
+        Queue of reports to render
+    '''
+    return ReportQueue()
@@ -0,0 +1,113 @@
+'''
+Functions for extracting responses to each question from the aggregate
+responses, when these are loaded from parquet (where the responses for each
+question are stored as arrays, rather than as strings of lists in the CSV).
+
+These return the same result as get_chosen_result() and
+extract_nested_results() from kailo_beewell_dashboard, but without having to
+parse strings each time they are used.
+'''
+from kailo_beewell_dashboard.reshape_data import filter_by_group
+import numpy as np
+import pandas as pd
+
+from dashboard.timing import timed
+
+# Columns which contain arrays with a value for each response category
+NESTED_COLS = ['cat', 'cat_lab', 'percentage', 'count']
+
+
+def extract_nested_results(chosen, group_lab=None, plot_group=False):
+    '''
+    Extract arrays of results that were stored in dataframe.
+    e.g. ['Yes', 'No'], [20, 80], [2, 8] in the original data will become
+    seperate rows with [Yes, 20, 2] and [No, 80, 8]
+
+    Parameters
+    ----------
+    chosen : dataframe
+        Dataframe with the nested arrays to be extracted
+    group_lab : string
+        Name of chosen group (e.g. gender_lab, fsm_lab) - optional input,
+        default None.
+    plot_group : boolean
+        Whether there is a plot_group column to include - default False.
+
+    Returns
+    -------
+    chosen_result : dataframe
+        Dataframe with a row for each response category
+    '''
+    # Get the arrays for each row - but when n<10, we still want a bar, so
+    # use a single category labelled to indicate n<10
+    small = [[0], ['Less than 10 responses'], [100], [np.nan]]
+    nested = [
+        small if np.isnan(n_responses) else values
+        for n_responses, *values in zip(
+            chosen['n_responses'], *[chosen[col] for col in NESTED_COLS])]
+
+    # Flatten the arrays into columns, recording which row each came from
+    row = np.repeat(np.arange(len(nested)),
+                    [len(values[0]) for values in nested])
+    chosen_result = pd.DataFrame({
+        col: np.concatenate([values[i] for values in nested] or [[]])
+        for i, col in enumerate(NESTED_COLS)})
+    chosen_result = chosen_result.astype({
+        'cat': float, 'cat_lab': object, 'percentage': float, 'count': float})
+
+    # Replace NaN with max number so stays at end of sequence
+    chosen_result['cat'] = chosen_result['cat'].fillna(
+        chosen_result.groupby(row)['cat'].transform('max') + 1)
+
+    # Add the string columns (no extraction needed)
+    chosen_result['measure'] = chosen['measure'].to_numpy()[row]
+    chosen_result['measure_lab'] = chosen['measure_lab'].to_numpy()[row]
+    if group_lab is not None:
+        chosen_result['group'] = chosen[group_lab].to_numpy()[row]
+    if plot_group:
+        chosen_result['plot_group'] = chosen['plot_group'].to_numpy()[row]
+
+    return chosen_result
+
+
+@timed()
+def get_chosen_result(chosen_variable, chosen_group, df, school,
+                      survey_type='standard'):
+    '''
+    Filters the dataframe with responses to each question, to just responses
+    for the chosen topic, school and group.
+
+    Parameters
+    ----------
+    chosen_variable : string
+        Name of the chosen topic
+    chosen_group : string
+        Name of the chosen group to view results by - options are
+        'For all pupils', 'By year group', 'By gender', 'By FSM' or 'By SEN'
+    df : dataframe
+        Dataframe with responses to all the questions for all topics, as
+        loaded from parquet
+    school : string
+        Name of school to get results for
+    survey_type : string
+        Specifies whether it is 'standard' (default) or 'symbol' survey
+
+    Returns
+    ----------
+    chosen_result : dataframe
+        Contains responses to each question in the chosen topic, with the
+        results extracted so they are in seperate rows and columns (rather
+        than original format where they are nested in arrays)
+    '''
+    # Filter by the specified school and grouping
+    chosen, group_lab = filter_by_group(
+        df=df, chosen_group=chosen_group, output='explore',
+        chosen_school=school, survey_type=survey_type)
+
+    # Filter by the chosen variable
+    chosen = chosen[chosen['group'] == chosen_variable]
+
+    # Extract the nested arrays in the dataframe
+    chosen_result = extract_nested_results(chosen, group_lab)
+
+    return chosen_result
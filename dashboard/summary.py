@@ -0,0 +1,107 @@
+'''
+Functions for the text shown about each topic on the standard survey page:
+the description of each topic, and the summary of the RAG rating of every
+topic for an MSOA.
+
+These are kept separate from the page so that they can be imported without
+running it (e.g. by benchmarks/standard_page.py).
+'''
+from types import MappingProxyType
+
+import streamlit as st
+
+
+def create_topic_descriptions(df):
+    '''
+    Create lookup from each topic to its description. This is done once when
+    the scores are loaded (see dashboard/data.py), rather than each time the
+    page runs.
+
+    Parameters
+    ----------
+    df : dataframe
+        Scores, with 'variable' and 'description' columns
+
+    Returns
+    -------
+    mappingproxy
+        Read-only dictionary where keys are topics (e.g. 'autonomy_score')
+        and values are their descriptions
+    '''
+    # Keep the last description of each topic, as when setting the index and
+    # converting to a dictionary
+    topics = df[['variable', 'description']].drop_duplicates(
+        'variable', keep='last')
+    return MappingProxyType(dict(zip(topics['variable'],
+                                     topics['description'])))
+
+
+def rag_container_html(rag_text, bg_colour, font_colour):
+    '''
+    Create HTML for a box showing a RAG rating.
+
+    Parameters
+    ----------
+    rag_text : string
+        Text in the box (e.g. 'Below average')
+    bg_colour : string
+        Background colour of the box
+    font_colour : string
+        Colour of the text
+
+    Returns
+    -------
+    string
+        HTML for the box
+    '''
+    return (f'<div style="background-color:{bg_colour};color:{font_colour};'
+            'padding:10px;border-radius:5px;text-align:center;">'
+            f'{rag_text}</div>')
+
+
+def create_rag_container(rag_text, bg_colour, font_colour,
+                         output='streamlit'):
+    '''
+    Show a box with a RAG rating.
+
+    Parameters
+    ----------
+    rag_text : string
+        Text in the box (e.g. 'Below average')
+    bg_colour : string
+        Background colour of the box
+    font_colour : string
+        Colour of the text
+    output : string
+        Where to show the box - only 'streamlit' is implemented
+    '''
+    if output == 'streamlit':
+        st.markdown(rag_container_html(rag_text, bg_colour, font_colour),
+                    unsafe_allow_html=True)
+    else:
+        # Implement other output formats if needed
+        pass
+
+
+def display_rag_dict(rag_dict):
+    '''
+    Show the RAG rating of each topic for an MSOA, with the name of the topic
+    next to a box with its rating.
+
+    Parameters
+    ----------
+    rag_dict : sequence
+        Records with 'variable_lab' and 'rag' (the text and colours of the
+        rating), as in the index from create_msoa_rag_index()
+    '''
+    for entry in rag_dict:
+        rag_info = entry['rag']
+
+        col1, col2 = st.columns(2)
+
+        with col1:
+            st.write(entry['variable_lab'])
+
+        with col2:
+            create_rag_container(rag_info['rag_text'], rag_info['bg_colour'],
+                                 rag_info['font_colour'], output='streamlit')
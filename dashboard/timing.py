@@ -0,0 +1,279 @@
+'''
+Timing of each run of the dashboard pages, to find where the time is spent.
+
+Timing is turned on by setting the environment variable DASHBOARD_TIMING=1
+before starting the dashboard. Each page then calls start_run() at the start
+and end_run() at the end, and the slower steps (reading files, filtering
+results, creating and sending figures) are timed as spans - either using
+timed() as a decorator, or span() as a context manager. At the end of each
+run, the time taken by the run and by each span is:
+
+* Written as one line of JSON to a rotating log (.cache/timing/timing.log by
+default, or set by DASHBOARD_TIMING_LOG)
+* Added to the recent times shared by every session, which are shown with
+the median (p50) and 95th percentile (p95) of each span in a debug panel in
+the sidebar. The panel is only shown when DASHBOARD_TIMING_KEY is set and the
+page is opened with ?debug=<key> (e.g. for the administrator).
+
+When timing is off, timed() returns the function unchanged and span()
+returns a context manager that does nothing, so there is almost no overhead.
+Spans in cached functions are only timed when the function is run (i.e. not
+when the result is returned from the cache).
+'''
+from collections import deque
+from contextlib import contextmanager, nullcontext
+import datetime
+import functools
+import json
+import logging
+from logging.handlers import RotatingFileHandler
+import os
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+import streamlit as st
+
+ENABLED = os.environ.get('DASHBOARD_TIMING', '') not in ('', '0')
+LOG_PATH = os.environ.get('DASHBOARD_TIMING_LOG', '.cache/timing/timing.log')
+ADMIN_KEY = os.environ.get('DASHBOARD_TIMING_KEY')
+
+# Size of each log file, and number of old log files kept
+LOG_BYTES = 2**20
+LOG_BACKUPS = 5
+
+# Number of recent times kept for each span
+HISTORY = 1000
+
+# Spans of the current run of the page in each thread (each session runs the
+# page in its own thread)
+_current = threading.local()
+
+# Context manager used for every span when timing is off
+_NO_SPAN = nullcontext()
+
+
+class SpanTimes:
+    '''
+    Recent times of each span and page run, shared by every session.
+    '''
+    def __init__(self, history=HISTORY):
+        '''
+        Parameters
+        ----------
+        history : integer
+            Number of recent times kept for each span
+        '''
+        self._history = history
+        self._lock = threading.Lock()
+        self._times = {}
+
+    def add(self, name, seconds):
+        '''
+        Record time taken by a span.
+
+        Parameters
+        ----------
+        name : string
+            Name of span
+        seconds : float
+            Time taken in seconds
+        '''
+        with self._lock:
+            self._times.setdefault(
+                name, deque(maxlen=self._history)).append(seconds)
+
+    def summary(self):
+        '''
+        Summarise the recent times of each span.
+
+        Returns
+        -------
+        dataframe
+            Number of recent times, median (p50) and 95th percentile (p95)
+            in milliseconds for each span, slowest first
+        '''
+        with self._lock:
+            times = {name: np.array(values) * 1e3
+                     for name, values in self._times.items()}
+        return pd.DataFrame({
+            'span': list(times),
+            'n': [len(values) for values in times.values()],
+            'p50 ms': [np.percentile(values, 50) for values in times.values()],
+            'p95 ms': [np.percentile(values, 95) for values in times.values()],
+        }).sort_values('p95 ms', ascending=False, ignore_index=True)
+
+
+@st.cache_resource(show_spinner=False)
+def get_span_times():
+    '''
+    Get the recent times shared by every session.
+
+    Returns
+    -------
+    SpanTimes
+        Recent times of each span
+    '''
+    return SpanTimes()
+
+
+@st.cache_resource(show_spinner=False)
+def get_logger():
+    '''
+    Get the logger writing the time of each run to the rotating log.
+
+    Returns
+    -------
+    logging.Logger
+        Logger with a single rotating file handler
+    '''
+    os.makedirs(os.path.dirname(LOG_PATH) or '.', exist_ok=True)
+    handler = RotatingFileHandler(
+        LOG_PATH, maxBytes=LOG_BYTES, backupCount=LOG_BACKUPS)
+    handler.setFormatter(logging.Formatter('%(message)s'))
+    logger = logging.getLogger(__name__)
+    logger.setLevel(logging.INFO)
+    logger.propagate = False
+    logger.handlers = [handler]
+    return logger
+
+
+def record(name, seconds):
+    '''
+    Record time taken by a span, adding it to the current run of the page
+    (if there is one - e.g. not when run by the warm-up thread).
+
+    Parameters
+    ----------
+    name : string
+        Name of span
+    seconds : float
+        Time taken in seconds
+    '''
+    get_span_times().add(name, seconds)
+    spans = getattr(_current, 'spans', None)
+    if spans is not None:
+        spans.append((name, seconds))
+
+
+@contextmanager
+def _span(name):
+    '''
+    Time the code run inside the context manager.
+
+    Parameters
+    ----------
+    name : string
+        Name of span
+    '''
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        record(name, time.perf_counter() - start)
+
+
+def span(name):
+    '''
+    Get context manager timing the code run inside it (when timing is on).
+
+    Parameters
+    ----------
+    name : string
+        Name of span (e.g. 'create_bar_charts')
+
+    Returns
+    -------
+    context manager
+        Times the code inside it, or does nothing if timing is off
+    '''
+    if not ENABLED:
+        return _NO_SPAN
+    return _span(name)
+
+
+def timed(name=None):
+    '''
+    Decorator timing each call of a function (when timing is on).
+
+    Parameters
+    ----------
+    name : string
+        Name of span (default: name of the function)
+
+    Returns
+    -------
+    function
+        Decorator - which returns the function unchanged if timing is off
+    '''
+    def decorator(func):
+        if not ENABLED:
+            return func
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with _span(name or func.__name__):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def start_run(page):
+    '''
+    Start timing a run of a page. Any previous run in this thread which did
+    not finish (e.g. stopped by st.rerun()) is discarded.
+
+    Parameters
+    ----------
+    page : string
+        Name of the page
+    '''
+    if not ENABLED:
+        return
+    _current.page = page
+    _current.start = time.perf_counter()
+    _current.spans = []
+
+
+def end_run():
+    '''
+    Finish timing a run of a page, writing the times to the log and showing
+    the debug panel (if opened by the administrator).
+    '''
+    spans = getattr(_current, 'spans', None)
+    if not ENABLED or spans is None:
+        return
+    seconds = time.perf_counter() - _current.start
+    _current.spans = None
+
+    get_span_times().add(f'page: {_current.page}', seconds)
+    get_logger().info(json.dumps({
+        'time': datetime.datetime.now().isoformat(timespec='seconds'),
+        'page': _current.page,
+        'seconds': round(seconds, 6),
+        'spans': [[name, round(span_seconds, 6)]
+                  for name, span_seconds in spans]}))
+
+    if ADMIN_KEY and st.query_params.get('debug') == ADMIN_KEY:
+        debug_panel(spans, seconds)
+
+
+def debug_panel(spans, seconds):
+    '''
+    Show times for this run of the page and recent runs in the sidebar.
+
+    Parameters
+    ----------
+    spans : list
+        Name and time in seconds of each span in this run
+    seconds : float
+        Time taken by this run
+    '''
+    with st.sidebar.expander('Timing', expanded=True):
+        st.markdown(f'**This run:** {seconds * 1e3:.1f} ms')
+        st.dataframe(pd.DataFrame(
+            [(name, span_seconds * 1e3) for name, span_seconds in spans],
+            columns=['span', 'ms']), hide_index=True)
+        st.markdown('**Recent runs:**')
+        st.dataframe(get_span_times().summary(), hide_index=True)
@@ -0,0 +1,173 @@
+'''
+Warm-up of the shared caches, so they are ready before users need them.
+
+Streamlit only runs a page when a user opens it, so otherwise the first user
+to open each page waits for the data to be read, the maps to be created and
+the modules used by that page to be imported. Every page calls
+start_warm_up(), and the first call on each server process starts a
+background thread which does all of this using the same cached loaders as
+the pages - so the pages then just get the shared objects. If a page needs
+something that the thread is still creating, Streamlit waits for the thread
+to finish it rather than creating it again.
+
+If a step fails, the error is logged (and written to the timing log, if
+timing is on - see dashboard/timing.py) and the other steps are still run -
+the pages then load whatever the step did not, as they would without the
+warm-up.
+
+Only the data for the default region is warmed up (see
+dashboard/regions.py) - the data for other regions is loaded when a user
+first chooses that region, so it is only held in memory if it is used.
+
+It can also be run on its own, to see the time taken by each step:
+    python -m dashboard.warmup
+'''
+import datetime
+import json
+import logging
+import threading
+import time
+
+import streamlit as st
+
+from dashboard import timing
+from dashboard.data import (
+    load_area_index, load_area_rag_counts, load_geojson, load_msoa_rag_index,
+    load_overall_counts, load_rag_matrix, load_standard_cube,
+    load_standard_demographic, load_standard_responses, load_standard_scores,
+    load_symbol_demographic, load_symbol_responses, load_topic_descriptions)
+
+
+def load_data(region=None):
+    '''
+    Read every dataset used by the pages.
+
+    Parameters
+    ----------
+    region : string
+        Key of the region (from dashboard/regions.py) - default is the
+        region of the current session (the default region when run by the
+        warm-up thread)
+    '''
+    load_overall_counts(region)
+    load_standard_scores(region)
+    load_msoa_rag_index(region)
+    load_rag_matrix(region)
+    load_area_rag_counts(region)
+    load_topic_descriptions(region)
+    load_standard_responses(region)
+    load_standard_cube(region)
+    load_standard_demographic(region)
+    load_symbol_responses(region)
+    load_symbol_demographic(region)
+    load_geojson(region)
+    load_area_index(region)
+
+
+def warm_maps(region=None):
+    '''
+    Create the map for every topic and the MSOA picker map.
+
+    Parameters
+    ----------
+    region : string
+        Key of the region (from dashboard/regions.py)
+    '''
+    # The modules used by the pages with charts (including plotly) are
+    # imported here, in the thread, rather than by every page that calls
+    # start_warm_up()
+    from dashboard import maps
+
+    maps.warm_maps(region)
+
+
+def warm_reports(region=None):
+    '''
+    Find the version of any reports that have not been rendered ahead of time
+    (which hashes the data they are made from), as used to check whether
+    they have been rendered by the report queue.
+
+    Parameters
+    ----------
+    region : string
+        Key of the region (from dashboard/regions.py)
+    '''
+    from dashboard.reports import REPORTS, prebuilt_path, report_version
+
+    for report_type in REPORTS:
+        if prebuilt_path(report_type, region) is None:
+            report_version(report_type, region)
+
+
+# Steps of the warm-up, in order - the data used by the home page first
+STEPS = [('data', load_data),
+         ('maps', warm_maps),
+         ('reports', warm_reports)]
+
+logger = logging.getLogger(__name__)
+
+
+def log_failure(name, error):
+    '''
+    Log a step of the warm-up that failed.
+
+    Parameters
+    ----------
+    name : string
+        Name of the step (from STEPS)
+    error : exception
+        Error raised by the step
+    '''
+    logger.error('Warm-up step %r failed', name, exc_info=error)
+    if timing.ENABLED:
+        timing.get_logger().info(json.dumps({
+            'time': datetime.datetime.now().isoformat(timespec='seconds'),
+            'warm_up': name,
+            'error': repr(error)}))
+
+
+def warm_up():
+    '''
+    Fill the shared caches used by the pages.
+
+    Returns
+    -------
+    timings : dictionary
+        Time taken by each step in seconds (None for steps that failed)
+    '''
+    timings = {}
+    for name, step in STEPS:
+        start = time.perf_counter()
+        try:
+            step()
+        except Exception as error:
+            log_failure(name, error)
+            timings[name] = None
+            continue
+        timings[name] = time.perf_counter() - start
+    return timings
+
+
+@st.cache_resource(show_spinner=False)
+def start_warm_up():
+    '''
+    Start warming up the shared caches in a background thread. This is
+    cached, so the thread is only started by the first call on each server
+    process.
+
+    Returns
+    -------
+    thread
+        Thread running warm_up()
+    '''
+    thread = threading.Thread(target=warm_up, name='warm-up', daemon=True)
+    thread.start()
+    return thread
+
+
+if __name__ == '__main__':
+    for name, seconds in warm_up().items():
+        if seconds is None:
+            print(f'{name:<10}{"failed":>9}')
+        else:
+            print(f'{name:<10}{seconds:>8.2f}s')
@@ -1,8 +1,17 @@
 from kailo_beewell_dashboard.page_setup import page_setup, page_footer
 from kailo_beewell_dashboard.about_page import create_about_page
 
+from dashboard import timing
+from dashboard.regions import get_region, region_selector
+from dashboard.warmup import start_warm_up
+
+timing.start_run('About')
 page_setup('public')
+start_warm_up()
+region_selector()
+region = get_region()
 
 create_about_page('public')
 
-page_footer('schools in Northern Devon')
+page_footer(region.footer)
+timing.end_run()
@@ -1,100 +1,49 @@
-from typing import Literal, Optional
-
 import streamlit as st
-import json
-import pickle
-import numpy as np
-import pandas as pd
-import plotly.express as px
-from kailo_beewell_dashboard.explore_results import (
-    create_bar_charts,
-    create_topic_dict,
-    get_chosen_result,
+from dashboard import timing
+from dashboard.cube import CHARACTERISTICS, get_combined_result
+from dashboard.area_groups import create_area_rag_chart
+from dashboard.data import (
+    load_area_index,
+    load_area_rag_counts,
+    load_msoa_rag_index,
+    load_overall_counts,
+    load_rag_matrix,
+    load_standard_cube,
+    load_standard_responses,
+    load_standard_scores,
+    load_topic_descriptions,
 )
+from dashboard.heatmap import CODE_LABELS, create_rag_heatmap, sort_areas
+from dashboard.lookup import find_msoa, parse_location
+from dashboard.maps import load_area_map, load_msoa_picker_map
+from dashboard.rag import AREA_GROUPS, SMALL
+from dashboard.regions import get_region, region_selector
+from dashboard.responses import get_chosen_result
+from dashboard.summary import display_rag_dict
+from dashboard.warmup import start_warm_up
+from kailo_beewell_dashboard.explore_results import create_bar_charts, create_topic_dict
 from kailo_beewell_dashboard.map import rag_guide
 from kailo_beewell_dashboard.page_setup import page_setup, blank_lines, page_footer
 from kailo_beewell_dashboard.reuse_text import caution_comparing
 from kailo_beewell_dashboard.score_descriptions import score_descriptions
 
-
-def create_rag_container(
-    rag_text: str, bg_colour: str, font_colour: str, output: str = "streamlit"
-):
-    if output == "streamlit":
-        st.markdown(
-            f'<div style="background-color:{bg_colour};color:{font_colour};padding:10px;border-radius:5px;text-align:center;">{rag_text}</div>',
-            unsafe_allow_html=True,
-        )
-    else:
-        # Implement other output formats if needed
-        pass
-
-
-def display_rag_dict(rag_dict: list[dict]):
-    for entry in rag_dict:
-        variable_lab = entry["variable_lab"]
-        rag_info = entry["rag"]
-
-        col1, col2 = st.columns(2)
-
-        with col1:
-            st.write(variable_lab)
-
-        with col2:
-            create_rag_container(
-                rag_info["rag_text"],
-                rag_info["bg_colour"],
-                rag_info["font_colour"],
-                output="streamlit",
-            )
-
-
-def rag_for_msoas(dataframe: pd.DataFrame, msoa_name: str) -> list[dict]:
-    """
-    Filters the dataframe to only include rows which match the MSOA_Name as supplied as an argument.
-    Keeps only the columns we need and returns them as list of dictionaries.
-    """
-    df = dataframe.copy(deep=True)
-    # Keep the following columns (this may need to be changed to fix the n<10 issue):
-    df = df[["variable", "msoa", "variable_lab", "rag", "count"]]
-    # Filter the dataframe to only keep rows where the 'msoa' column matches the msoa_name
-    df = df[df["msoa"] == msoa_name]
-    # List like [{column -> value}, ... , {column -> value}]
-    result = df.to_dict(orient="records")
-    return result
-
-
-def get_rag_colour_scheme(rag: Optional[Literal["average", "above", "below"]]) -> dict:
-    """
-    We should be using this in the result-box function in the summary_rag.py
-    """
-    if rag == "below":
-        return {
-            "rag_text": "Below average",
-            "bg_colour": "#FFCCCC",
-            "font_colour": "#95444B",
-        }
-    elif rag == "average":
-        return {"rag_text": "Average", "bg_colour": "#FFE8BF", "font_colour": "#AA7A18"}
-    elif rag == "above":
-        return {
-            "rag_text": "Above average",
-            "bg_colour": "#B6E6B6",
-            "font_colour": "#2B7C47",
-        }
-    elif pd.isnull(rag):
-        return {"rag_text": "n < 10", "bg_colour": "#DCE4FF", "font_colour": "#19539A"}
-    else:
-        raise ValueError(f"Unknown rag value: {rag}")
+# Name of each characteristic that can be combined, with its column in the
+# cube of responses
+CHARACTERISTIC_NAMES = {
+    "Year group": "year_group_lab",
+    "Gender": "gender_lab",
+    "FSM": "fsm_lab",
+    "SEN": "sen_lab",
+}
 
 
 def render_area_tab_markup():
     st.subheader("Results by topic and area")
-    st.markdown("""
+    st.markdown(f"""
     **Introduction:**
 
     In this section, an overall score has been calculated for each topic, allowing
-    you to compare scores between different areas of Northern Devon. These scores
+    you to compare scores between different areas of {region.name}. These scores
     are based just on responses from young people who completed all of the
     questions for a given topic.
 
@@ -121,45 +70,9 @@ def render_area_tab_markup():
     This topic is about **{topic_descrip}**, with higher scores
     indicating {score_descriptions[chosen_variable1][1]}.""")
 
-    # Filter to chosen topic then filter to only used column (helps map speed)
-    chosen_result = df_scores[df_scores["variable_lab"] == chosen_variable_lab1]
-    msoa_rag = chosen_result[["msoa", "rag"]].copy()
-    msoa_rag["rag"] = msoa_rag["rag"].map(
-        {
-            "below": "Below average",
-            "average": "Average",
-            "above": "Above average",
-            np.nan: "n<10",
-        }
-    )
-
-    # Create map
-    fig = px.choropleth_mapbox(
-        msoa_rag,
-        geojson=st.session_state.geojson_nd,
-        locations="msoa",
-        featureidkey="properties.MSOA11NM",
-        # Colour rules
-        color="rag",
-        color_discrete_map={
-            "Below average": "#FFB3B3",
-            "Average": "#FFDFA6",
-            "Above average": "#7DD27D",
-            "n<10": "#F6FAFF",
-        },
-        opacity=0.75,
-        # Base map style
-        mapbox_style="carto-positron",
-        # Positioning of map on load
-        center={"lat": 50.955, "lon": -4.1},
-        zoom=8.4,
-        labels={"rag": "Result"},
-        # Control legend order
-        category_orders={"rag": ["Below average", "Average", "Above average", "n<10"]},
-    )
-
-    fig.update_layout(margin={"r": 0, "t": 0, "l": 0, "b": 0})
-    st.plotly_chart(fig)
+    # Get map for chosen topic (shared between all users)
+    with timing.span("plotly_chart: area map"):
+        st.plotly_chart(load_area_map(chosen_variable_lab1))
     blank_lines(1)
 
     # Add caveat for interpretation
@@ -169,16 +82,17 @@ def render_area_tab_markup():
 
 def render_characteristic_tab_markup():
     st.subheader("Results by pupil characteristics")
-    st.markdown("""
+    st.markdown(f"""
 **Introduction:**
 
-In this section, you can see how young people from across Northern Devon
+In this section, you can see how young people from across {region.name}
 responded to each of the questions in the survey. You can view results:
 * For all pupils
 * By year group
 * By gender
 * By free school meal (FSM) eligibility
-* By whether pupils have special educational needs (SEN)""")
+* By whether pupils have special educational needs (SEN)
+* For a combination of these (e.g. Year 10 girls eligible for FSM)""")
 
     # Create selectbox to get chosen topic
     chosen_variable_lab2 = st.selectbox(
@@ -189,8 +103,29 @@ responded to each of the questions in the survey. You can view results:
     # Select pupils to view results for
     chosen_group = st.selectbox(
         label="**Choose a group**:",
-        options=["For all pupils", "By year group", "By gender", "By FSM", "By SEN"],
+        options=[
+            "For all pupils",
+            "By year group",
+            "By gender",
+            "By FSM",
+            "By SEN",
+            "By combination of characteristics",
+        ],
     )
+
+    # Choose a group for any of the characteristics, to combine
+    if chosen_group == "By combination of characteristics":
+        selection = {}
+        cols = st.columns(len(CHARACTERISTIC_NAMES))
+        for i, (name, characteristic) in enumerate(CHARACTERISTIC_NAMES.items()):
+            with cols[i]:
+                chosen = st.selectbox(
+                    label=f"**{name}:**",
+                    options=["Any"] + CHARACTERISTICS[characteristic],
+                    key=f"combine_{characteristic}",
+                )
+            if chosen != "Any":
+                selection[characteristic] = [chosen]
     blank_lines(2)
 
     # Add topic description
@@ -202,25 +137,55 @@ responded to each of the questions in the survey. You can view results:
 The questions below relate to the topic of '**{topic_name}**'. This topic is
 about **{topic_descrip}**.""")
 
-    # Get dataframe with results for the chosen variable and group
-    chosen_result = get_chosen_result(
-        chosen_variable=chosen_variable2,
-        chosen_group=chosen_group,
-        df=df_prop,
-        school=None,
-        survey_type="standard",
-    )
+    # Get dataframe with results for the chosen variable and group - for a
+    # combination of characteristics, these are found from the cube of
+    # responses and shown alongside the results for all pupils
+    if chosen_group == "By combination of characteristics":
+        chosen_result = get_combined_result(
+            chosen_variable=chosen_variable2,
+            selection=selection,
+            cube=load_standard_cube(),
+        )
+    else:
+        chosen_result = get_chosen_result(
+            chosen_variable=chosen_variable2,
+            chosen_group=chosen_group,
+            df=df_prop,
+            school=None,
+            survey_type="standard",
+        )
 
     # Produce bar charts with accompanying chart section descriptions and titles
-    create_bar_charts(chosen_variable2, chosen_result)
+    with timing.span("create_bar_charts"):
+        create_bar_charts(chosen_variable2, chosen_result)
+
+
+def find_location_msoa():
+    # Choose the MSOA containing the location entered by the user (run
+    # before the page, so the MSOA is chosen when the select box is created)
+    st.session_state.pop("msoa_location_error", None)
+    location = st.session_state.msoa_location.strip()
+    if not location:
+        return
+    try:
+        msoa = find_msoa(load_area_index(), *parse_location(location))
+    except ValueError as error:
+        st.session_state.msoa_location_error = str(error)
+        return
+    if msoa is None:
+        st.session_state.msoa_location_error = (
+            f"{location} is not in any of the MSOAs in {region.name}"
+        )
+    else:
+        st.session_state.selected_msoa = msoa
 
 
 def render_msoa_markup():
     st.subheader("Results by MSOA and all topics")
-    st.markdown("""
+    st.markdown(f"""
 **Introduction:**
 
-In this section, you can see survey results for each topic within individual Middle Layer Super Output Areas (MSOAs) in Northern Devon. MSOAs are geographic areas designed to improve the reporting of small area statistics. An overall score has been calculated for each topic, allowing you to compare scores within a specific area across different topics. These scores are based solely on responses from young people who completed all the questions for a given topic. """)
+In this section, you can see survey results for each topic within individual Middle Layer Super Output Areas (MSOAs) in {region.name}. MSOAs are geographic areas designed to improve the reporting of small area statistics. An overall score has been calculated for each topic, allowing you to compare scores within a specific area across different topics. These scores are based solely on responses from young people who completed all the questions for a given topic. """)
 
     # RAG guide
     st.markdown("**Guide to the map:**")
@@ -228,53 +193,43 @@ In this section, you can see survey results for each topic within individual Mid
 
     st.markdown("**Explore results**")
     st.markdown(
-        "Choose an MSOA from the drop-down menu to see a summary of results by topic for that area. You can hover over the MSOAs on the map to see their names."
+        "Choose an MSOA from the drop-down menu, or find the MSOA containing a location, to see a summary of results by topic for that area. You can hover over the MSOAs on the map to see their names."
     )
 
     # Create a two-column layout
     select_and_map_cols = st.columns(2)
 
-    # Put the select box in the first column
+    # Put the select box in the first column, with the option to find the
+    # MSOA for a location instead
     with select_and_map_cols[0]:
         selected_msoa = st.selectbox(
-            "Select MSOA:", st.session_state.msoa_df["msoa"].unique()
+            "Select MSOA:", df_scores["msoa"].unique(), key="selected_msoa"
         )
+        st.text_input(
+            "Or find the MSOA containing a location (e.g. your school), by "
+            "entering its latitude and longitude:",
+            key="msoa_location",
+            placeholder="e.g. 51.08, -4.06",
+            help="You can copy the latitude and longitude of a place from "
+            "most online maps (e.g. by right-clicking on it).",
+            on_change=find_location_msoa,
+        )
+        if "msoa_location_error" in st.session_state:
+            st.warning(st.session_state.msoa_location_error)
 
     # Map in the second column
     with select_and_map_cols[1]:
-        fig = px.choropleth_mapbox(
-            st.session_state.msoa_df,
-            geojson=st.session_state.geojson_nd,
-            locations="msoa",
-            featureidkey="properties.MSOA11NM",
-            # Single colour for all areas
-            color_discrete_sequence=["#B0B0B0"],  # Light grey colour
-            opacity=0.75,
-            # Base map style
-            mapbox_style="carto-positron",
-            # Positioning of map on load
-            center={"lat": 50.955, "lon": -4.1},
-            zoom=7.8,
-            labels={"rag": "Result"},
-        )
-
-        fig.update_layout(margin={"r": 0, "t": 0, "l": 0, "b": 0})
-        st.plotly_chart(fig)
+        with timing.span("plotly_chart: MSOA picker map"):
+            st.plotly_chart(load_msoa_picker_map())
 
     # Import data
 
     # Display detailed information for the selected MSOA
     st.subheader(f"Summary of topics for {selected_msoa}")
 
-    # selected_data = msoa_data[msoa_data["msoa"] == selected_msoa]
-    rag_df = pd.read_csv("data/survey_data/standard_area_aggregate_scores_rag.csv")
-
-    rag_dict = rag_for_msoas(rag_df, selected_msoa)
-
-    # Replace the RAG keys with our data structure which contains the button text, text colour and
-    # the background colour
-    for dict in rag_dict:
-        dict["rag"] = get_rag_colour_scheme(dict["rag"])
+    # Look up the topics for the MSOA, which already contain the button text,
+    # text colour and background colour for each RAG rating
+    rag_dict = load_msoa_rag_index()[selected_msoa]
 
     display_rag_dict(rag_dict)
 
@@ -285,43 +240,124 @@ In this section, you can see survey results for each topic within individual Mid
     st.markdown(caution_comparing("area"))
 
 
-page_setup("public")
+def render_matrix_markup():
+    st.subheader("Results by topic for all areas")
+    st.markdown(f"""
+**Introduction:**
 
-# Import data to session state if not already (this will later be done
-# upon opening app on first page, with CSV data in TIDB Cloud)
-if "scores_rag" not in st.session_state:
-    st.session_state.scores_rag = pd.read_csv(
-        "data/survey_data/standard_area_aggregate_scores_rag.csv"
-    )
-if "geojson_nd" not in st.session_state:
-    f = open("data/area_data/geojson/combined_nd.geojson")
-    st.session_state.geojson_nd = json.load(f)
-if "msoa_df" not in st.session_state:
-    st.session_state.msoa_df = pd.read_csv(
-        "data/survey_data/standard_area_aggregate_scores_rag.csv"
+In this section, you can compare the results for every topic across all of the Middle Layer Super Output Areas (MSOAs) in {region.name} at once. Each row is an MSOA and each column is a topic, coloured by how the overall score for that topic compares with other areas. You can hover over each cell to see the score.""")
+
+    # RAG guide
+    st.markdown("**Guide to the heatmap:**")
+    rag_guide()
+
+    matrix = load_rag_matrix()
+
+    # Choose how to sort and filter the areas
+    sort_cols = st.columns(3)
+    with sort_cols[0]:
+        sort_lab = st.selectbox(
+            "**Sort areas by:**",
+            options=["Name"] + list(matrix.topic_labs),
+            key="matrix_sort",
+        )
+    topic = None if sort_lab == "Name" else list(matrix.topic_labs).index(sort_lab)
+    with sort_cols[1]:
+        order = st.selectbox(
+            "**Order:**",
+            options=["Highest score first", "Lowest score first"],
+            key="matrix_order",
+            disabled=topic is None,
+        )
+    with sort_cols[2]:
+        shown = st.multiselect(
+            "**Show areas rated:**",
+            options=list(CODE_LABELS),
+            default=list(CODE_LABELS),
+            key="matrix_ratings",
+            disabled=topic is None,
+        )
+
+    # Find the areas to show (using the arrays in the matrix, not the scores)
+    rows = sort_areas(
+        matrix,
+        topic=topic,
+        ascending=order == "Lowest score first",
+        ratings=[CODE_LABELS.tolist().index(lab) + SMALL for lab in shown],
     )
+    if len(rows) == 0:
+        st.markdown("No areas have the chosen ratings for this topic.")
+    else:
+        fig = create_rag_heatmap(matrix, rows)
+        with timing.span("plotly_chart: heatmap"):
+            st.plotly_chart(fig)
+    blank_lines(1)
+
+    # Add caveat for interpretation
+    st.markdown("**Comparing between areas:**")
+    st.markdown(caution_comparing("area"))
+
+
+def render_area_groups_markup():
+    st.subheader("Results by deprivation and rurality")
+    st.markdown(f"""
+    **Introduction:**
+
+    In this section, the areas of {region.name} are grouped by how deprived
+    they are (using the Index of Multiple Deprivation 2019) or by how rural
+    they are (using the Rural Urban Classification 2011). For each group, the
+    chart shows how many Middle Layer Super Output Areas (MSOAs) had scores
+    above, similar to or below the average for each topic.""")
+    blank_lines(1)
+
+    # Add key to RAG
+    st.markdown("**Guide to the chart:**")
+    rag_guide()
+
+    # Create selectboxes to get chosen grouping and topic
+    select_cols = st.columns(2)
+    with select_cols[0]:
+        chosen_group = st.selectbox(
+            label="**Group areas by:**",
+            options=AREA_GROUPS.keys(),
+            format_func=AREA_GROUPS.get,
+            key="area_group",
+        )
+    with select_cols[1]:
+        chosen_variable_lab = st.selectbox(
+            label="**Topic:**", options=topic_dict.keys(), key="topic_area_group"
+        )
+    chosen_variable = f"{topic_dict[chosen_variable_lab]}_score"
+
+    # Select counts for the topic (counted once when the scores are loaded)
+    counts = load_area_rag_counts()[chosen_group].loc[chosen_variable]
+    with timing.span("plotly_chart: area groups"):
+        st.plotly_chart(create_area_rag_chart(counts, chosen_group))
+    blank_lines(1)
+
+    # Add caveat for interpretation
+    st.markdown("**Comparing between areas:**")
+    st.markdown(caution_comparing("area"))
 
 
-# Import data
-with open("data/survey_data/nd_overall_counts.pkl", "rb") as f:
-    school_counts = pickle.load(f)
-df_prop = pd.read_csv("data/survey_data/standard_nd_aggregate_responses.csv")
+timing.start_run("Standard survey")
+page_setup("public")
+start_warm_up()
+region_selector()
+region = get_region()
 
-# As we play around this one, import it from session state
-df_scores = st.session_state.scores_rag
+# Import data (shared between all sessions, so not copied into session state)
+school_counts = load_overall_counts()
+df_prop = load_standard_responses()
+df_scores = load_standard_scores()
 
 # Create topic dictionary and convert to list. Get index of autonomy (default).
 topic_dict = create_topic_dict(df_scores)
 topic_list = list(topic_dict.keys())
 
-# Create dictionary where key is topic name and value is topic description
+# Dictionary where key is topic name and value is topic description
 # (Duplication with explore_results.write_topic_intro())
-description = (
-    df_scores[["variable", "description"]]
-    .drop_duplicates()
-    .set_index("variable")
-    .to_dict()["description"]
-)
+description = load_topic_descriptions()
 
 # Page title and introduction
 st.title("Standard #BeeWell survey")
@@ -346,24 +382,44 @@ msoa_button_label = (
     if st.session_state.get("standard_page") == "msoa"
     else "By MSOA"
 )
+matrix_button_label = (
+    "**All topics and areas**"
+    if st.session_state.get("standard_page") == "matrix"
+    else "All topics and areas"
+)
+area_groups_button_label = (
+    "**By deprivation and rurality**"
+    if st.session_state.get("standard_page") == "area_groups"
+    else "By deprivation and rurality"
+)
 
 st.divider()
 st.markdown(f"""
 The standard #BeeWell survey was completed by {school_counts['standard_pupils']} pupils in Years 8 and 10 at {school_counts['standard_schools']} mainstream schools. You can view results either:""")
 
-cols = st.columns(3)
+cols = st.columns(5)
 with cols[0]:
     if st.button(btn_area_label, key="btn_area", use_container_width=True):
         st.session_state.standard_page = "area"
-        st.experimental_rerun()
+        st.rerun()
 with cols[1]:
     if st.button(msoa_button_label, key="btn_msoa", use_container_width=True):
         st.session_state.standard_page = "msoa"
-        st.experimental_rerun()
+        st.rerun()
 with cols[2]:
     if st.button(btn_char_label, key="btn_char", use_container_width=True):
         st.session_state.standard_page = "char"
-        st.experimental_rerun()
+        st.rerun()
+with cols[3]:
+    if st.button(matrix_button_label, key="btn_matrix", use_container_width=True):
+        st.session_state.standard_page = "matrix"
+        st.rerun()
+with cols[4]:
+    if st.button(
+        area_groups_button_label, key="btn_area_groups", use_container_width=True
+    ):
+        st.session_state.standard_page = "area_groups"
+        st.rerun()
 
 st.divider()
 blank_lines(2)
@@ -375,8 +431,13 @@ elif st.session_state.standard_page == "char":
     render_characteristic_tab_markup()
 elif st.session_state.standard_page == "msoa":
     render_msoa_markup()
+elif st.session_state.standard_page == "matrix":
+    render_matrix_markup()
+elif st.session_state.standard_page == "area_groups":
+    render_area_groups_markup()
 
-page_footer("schools in Northern Devon")
+page_footer(region.footer)
+timing.end_run()
 
 
 # def show_msoa_topic_summary(msoa: str, msoa_agg_rag_dict: dict):
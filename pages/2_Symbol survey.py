@@ -1,25 +1,28 @@
-from kailo_beewell_dashboard.explore_results import (
-    get_chosen_result,
-    create_bar_charts)
+from dashboard import timing
+from dashboard.data import load_overall_counts, load_symbol_responses
+from dashboard.regions import get_region, region_selector
+from dashboard.responses import get_chosen_result
+from dashboard.warmup import start_warm_up
+from kailo_beewell_dashboard.explore_results import create_bar_charts
 from kailo_beewell_dashboard.page_setup import (
     blank_lines, page_footer, page_setup)
-import pandas as pd
-import pickle
 import streamlit as st
 
+timing.start_run('Symbol survey')
 page_setup('public')
+start_warm_up()
+region_selector()
+region = get_region()
 
 # Import data
-with open('data/survey_data/nd_overall_counts.pkl', 'rb') as f:
-    school_counts = pickle.load(f)
-df_prop = pd.read_csv('data/survey_data/symbol_nd_aggregate_responses.csv')
+school_counts = load_overall_counts()
 
 # Title and introduction
 st.title('Symbol #BeeWell Survey')
 st.markdown(f'''
 The symbol #BeeWell survey was completed by {school_counts['symbol_pupils']}
 pupils Years 7 to 11 at {school_counts['symbol_schools']} non-mainstream
-schools. On this page, you can see how young people from across Northern Devon
+schools. On this page, you can see how young people from across {region.name}
 responded to each of the questions in the survey. You can view results:
 * For all pupils
 * By year group
@@ -39,7 +42,7 @@ blank_lines(2)
 # this for simplicity in compatability with the bar chart functions
 # used across the standard and symbol survey dashboards)
 chosen_variable = 'symbol'
-df_prop['group'] = chosen_variable
+df_prop = load_symbol_responses().assign(group=chosen_variable)
 
 # Extract results for the chosen school and group
 chosen_result = get_chosen_result(
@@ -50,6 +53,8 @@ chosen_result = get_chosen_result(
     survey_type='symbol')
 
 # Produce bar charts w/ accompanying chart section descriptions and titles
-create_bar_charts(chosen_variable, chosen_result)
+with timing.span('create_bar_charts'):
+    create_bar_charts(chosen_variable, chosen_result)
 
-page_footer('schools in Northern Devon')
+page_footer(region.footer)
+timing.end_run()
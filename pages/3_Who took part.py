@@ -1,18 +1,22 @@
+from dashboard import timing
+from dashboard.data import (
+    load_overall_counts, load_standard_demographic, load_symbol_demographic)
+from dashboard.regions import get_region, region_selector
+from dashboard.warmup import start_warm_up
 from kailo_beewell_dashboard.page_setup import (
     blank_lines, page_footer, page_setup)
 from kailo_beewell_dashboard.who_took_part import (
     demographic_plots)
-import pandas as pd
-import pickle
 import streamlit as st
 
+timing.start_run('Who took part')
 page_setup('public')
+start_warm_up()
+region_selector()
+region = get_region()
 
 # Import data
-with open('data/survey_data/nd_overall_counts.pkl', 'rb') as f:
-    school_counts = pickle.load(f)
-sta_dem = pd.read_csv('data/survey_data/standard_nd_aggregate_demographic.csv')
-sym_dem = pd.read_csv('data/survey_data/symbol_nd_aggregate_demographic.csv')
+school_counts = load_overall_counts()
 
 st.title('Who took part?')
 
@@ -51,14 +55,15 @@ The standard #BeeWell survey was completed by
 {school_counts['standard_schools']} mainstream schools. This page describes the
 sample of young people who completed the standard survey.''')
     # Create the figures (with their titles and descriptions)
-    sta_dem['site'] = 'Northern Devon'
-    demographic_plots(
-        dem_prop=sta_dem,
-        chosen_school=None,
-        chosen_group=None,
-        group_lab='site',
-        survey_type='standard',
-        dashboard_type='area')
+    sta_dem = load_standard_demographic().assign(site=region.name)
+    with timing.span('demographic_plots'):
+        demographic_plots(
+            dem_prop=sta_dem,
+            chosen_school=None,
+            chosen_group=None,
+            group_lab='site',
+            survey_type='standard',
+            dashboard_type='area')
 
 
 if st.session_state.sample_page == 'sym':
@@ -70,14 +75,17 @@ pupils Years 7 to 11 at {school_counts['symbol_schools']} non-mainstream
 schools. This page describes the sample of young people who completed the
 symbol survey.''')
     # Create the figures (with their titles and descriptions)
-    sym_dem['plot_group'] = sym_dem['measure']
-    sym_dem['site'] = 'Northern Devon'
-    demographic_plots(
-        dem_prop=sym_dem,
-        chosen_school=None,
-        chosen_group=None,
-        group_lab='site',
-        survey_type='symbol',
-        dashboard_type='area')
+    sym_dem = load_symbol_demographic()
+    sym_dem = sym_dem.assign(plot_group=sym_dem['measure'],
+                             site=region.name)
+    with timing.span('demographic_plots'):
+        demographic_plots(
+            dem_prop=sym_dem,
+            chosen_school=None,
+            chosen_group=None,
+            group_lab='site',
+            survey_type='symbol',
+            dashboard_type='area')
 
-page_footer('schools in Northern Devon')
+page_footer(region.footer)
+timing.end_run()
@@ -0,0 +1,35 @@
+'''
+Tests for the reports for each area (create_and_process_data/area_reports.py).
+
+Run from the root of the repository:
+    python -m pytest tests
+'''
+import re
+
+from kailo_beewell_dashboard.topic_labels import topic_name_dict
+import pandas as pd
+import pytest
+
+from create_and_process_data.area_reports import area_summary
+from dashboard.data import paths, survey_path
+
+
+@pytest.fixture(scope='module')
+def scores():
+    '''Scores with RAG ratings, as shipped in the survey data folder'''
+    return pd.read_csv(survey_path(paths.standard_scores))
+
+
+def test_area_summary_lists_topics(scores):
+    msoa = 'North Devon 001'
+    msoa_scores = scores[scores['msoa'] == msoa]
+    html = area_summary(msoa, msoa_scores, 'Northern Devon')
+
+    # Topic in the first column of each row of the summary
+    topics = re.findall(
+        r"<hr>\s*<div class='row'>\s*<div class='column3'>\s*"
+        r"<p style='text-align:center;'>(.*?)</p>", html)
+    assert topics == [topic_name_dict[variable]
+                      for variable in msoa_scores['variable']
+                      if variable in topic_name_dict]
+    assert 'nan' not in topics
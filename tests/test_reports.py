@@ -0,0 +1,82 @@
+'''
+Tests for the report queue (dashboard/reports.py) and the Download PDF
+reports page.
+
+Run from the root of the repository:
+    python -m pytest tests
+'''
+import os
+import time
+
+import pytest
+from streamlit.testing.v1 import AppTest
+
+from dashboard import reports
+
+PAGE = os.path.abspath('pages/4_Download PDF reports.py')
+
+
+def failing_render(report_type, path, region=None):
+    '''Stand-in for render_report(), run in the rendering process'''
+    time.sleep(0.5)
+    raise RuntimeError('render failed')
+
+
+@pytest.fixture
+def failing_queue(monkeypatch, tmp_path):
+    '''
+    Report queue whose reports always fail to render, with no reports
+    rendered by the data pipeline or saved to the cache.
+    '''
+    monkeypatch.setattr(reports, 'render_report', failing_render)
+    monkeypatch.setattr(reports, 'prebuilt_path', lambda *args: None)
+    monkeypatch.setattr(reports, 'CACHE_DIR', str(tmp_path))
+    reports.get_report_queue.clear()
+    queue = reports.get_report_queue()
+    yield queue
+    queue.shutdown()
+    reports.get_report_queue.clear()
+
+
+def wait_until_finished(queue, report_type, timeout=60):
+    '''Wait until a report has left the queue'''
+    end = time.time() + timeout
+    while queue.status(report_type).state in ('queued', 'rendering'):
+        assert time.time() < end, 'report did not finish rendering'
+        time.sleep(0.1)
+    return queue.status(report_type)
+
+
+def test_status_keeps_failed_report(failing_queue):
+    failing_queue.request('standard')
+    assert wait_until_finished(failing_queue, 'standard').state == 'failed'
+
+    # Checking the status again does not clear the error
+    status = failing_queue.status('standard')
+    assert status.state == 'failed'
+    assert status.error == 'render failed'
+
+    # Requesting the report again clears the error and renders it again
+    assert failing_queue.request('standard').state in ('queued', 'rendering')
+    assert wait_until_finished(failing_queue, 'standard').state == 'failed'
+
+
+def test_page_shows_render_error(failing_queue):
+    at = AppTest.from_file(PAGE, default_timeout=120).run()
+    assert not at.exception
+    assert not at.error
+
+    at.button(key='generate_standard').click().run()
+    assert not at.exception
+    wait_until_finished(failing_queue, 'standard')
+
+    # The error is shown on every run of the page (e.g. the rerun after the
+    # progress bar sees the report has finished), with the button to try
+    # again
+    for _ in range(2):
+        at.run()
+        assert not at.exception
+        assert len(at.error) == 1
+        assert at.error[0].value == (
+            'Unable to generate standard survey report: render failed')
+        assert at.button(key='generate_standard')
@@ -0,0 +1,47 @@
+'''
+Tests for the stages of the data pipeline (create_and_process_data/stages.py).
+
+Run from the root of the repository:
+    python -m pytest tests
+'''
+import pandas as pd
+import pytest
+
+from create_and_process_data import stages
+from create_and_process_data.pipeline import load_dataset
+from dashboard.data import paths, survey_path
+
+
+@pytest.fixture(scope='module')
+def inputs():
+    '''Inputs to standard_area_scores(), as loaded by the pipeline'''
+    return {'standard_scores': pd.read_csv(
+                survey_path(paths.standard_scores)),
+            'shp_nd': load_dataset('shp_nd', None),
+            'imd': load_dataset('imd', None),
+            'ruc': load_dataset('ruc', None)}
+
+
+def test_area_scores_match_on_code(inputs):
+    expected = stages.standard_area_scores(**inputs)['standard_area_scores']
+
+    # Renaming an MSOA in 2021 (keeping its code) gives the same result
+    shp = inputs['shp_nd'].copy()
+    renamed = shp['MSOA21NM'] == 'North Devon 001'
+    shp.loc[renamed, 'MSOA21NM'] = 'Renamed 001'
+    scores = inputs['standard_scores'].replace(
+        {'msoa': {'North Devon 001': 'Renamed 001'}})
+    result = stages.standard_area_scores(
+        **{**inputs, 'standard_scores': scores, 'shp_nd': shp}
+    )['standard_area_scores']
+    pd.testing.assert_frame_equal(
+        result.drop(columns='msoa'), expected.drop(columns='msoa'))
+
+
+def test_area_scores_changed_msoa(inputs):
+    # An MSOA with a new code in 2021 (e.g. split) has no 2011 MSOA
+    shp = inputs['shp_nd'].copy()
+    shp.loc[shp['MSOA21NM'] == 'Torridge 001', 'MSOA21CD'] = 'E02006999'
+    with pytest.raises(ValueError, match='Torridge 001'):
+        stages.standard_area_scores(**{**inputs, 'shp_nd': shp})
+
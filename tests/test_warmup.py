@@ -0,0 +1,29 @@
+'''
+Tests for the warm-up of the shared caches (dashboard/warmup.py).
+
+Run from the root of the repository:
+    python -m pytest tests
+'''
+import logging
+
+from dashboard import warmup
+
+
+def test_failed_step_does_not_stop_warm_up(monkeypatch, caplog):
+    run = []
+
+    def failing_step():
+        raise OSError('data not found')
+
+    monkeypatch.setattr(warmup, 'STEPS', [
+        ('data', failing_step),
+        ('maps', lambda: run.append('maps')),
+        ('reports', lambda: run.append('reports'))])
+    with caplog.at_level(logging.ERROR, logger=warmup.__name__):
+        timings = warmup.warm_up()
+
+    assert run == ['maps', 'reports']
+    assert timings['data'] is None
+    assert timings['maps'] is not None and timings['reports'] is not None
+    assert "Warm-up step 'data' failed" in caplog.text
+    assert 'data not found' in caplog.text